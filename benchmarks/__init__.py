@@ -0,0 +1,4 @@
+"""
+效能基準測試 (Benchmarks)
+用合成資料衡量排班引擎在不同規模下的速度、記憶體與排班品質。
+"""
@@ -0,0 +1,176 @@
+"""
+排班引擎效能基準測試 (Scheduler Benchmark)
+分別計時 Scheduler 的各個階段，記錄記憶體峰值與排班品質，並輸出成 JSON 以便跨版本比較。
+
+使用方式:
+    python -m benchmarks.bench_scheduler --employees 10,100,500 --months 1,3 --density 0.2,0.8
+    python -m benchmarks.bench_scheduler --output new.json --compare old.json
+    python -m benchmarks.bench_scheduler --engine pattern
+"""
+import argparse
+import datetime
+import json
+import platform
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from core.logging_config import configure_logging
+from core.scheduler import ENGINES, Scheduler, get_scheduler_class
+from core.store_manager import StaticCatalog
+from .workload import generate_workload, horizon_dates
+
+def _measure_quality(result: Dict, scheduler: Scheduler) -> Dict:
+    """計算排班品質：未排定格子數、每月最低工時達成率"""
+    shift_durations = scheduler.shift_durations
+    employee_ids = list(scheduler.assignments["employees"].keys())
+
+    unfilled = sum(row.count("未排定") for row in result["data"])
+    hours = defaultdict(float)
+    for row in result["data"]:
+        month_key = row[0][:7]
+        for emp_id, shift_name in zip(employee_ids, row[1:]):
+            hours[(emp_id, month_key)] += shift_durations.get(shift_name, 0)
+
+    targets, met = 0, 0
+    month_keys = sorted({row[0][:7] for row in result["data"]})
+    for emp_id in employee_ids:
+        minimums = [rule.params["hours"] for rule in scheduler.employee_rules.get(emp_id, [])
+                    if rule.rule_type == "MIN_MONTHLY_HOURS"]
+        if not minimums:
+            continue
+        for month_key in month_keys:
+            targets += 1
+            met += hours[(emp_id, month_key)] >= max(minimums)
+
+    cells = len(result["data"]) * len(employee_ids)
+    return {
+        "cells": cells,
+        "unfilled": unfilled,
+        "unfilled_ratio": unfilled / cells if cells else 0.0,
+        "hour_targets": targets,
+        "hour_targets_met_ratio": met / targets if targets else 1.0,
+    }
+
+
+def run_case(num_employees: int, months: int, density: float, seed: int, measure_memory: bool = True,
+             profile: List[str] = (), engine: str = "greedy") -> Dict:
+    """執行單一個基準測試案例；各階段耗時取自 Scheduler 回傳的量測結果"""
+    scheduler_cls = get_scheduler_class(engine)
+    employees, rules, assignments = generate_workload(seed, num_employees, months=months, rule_density=density)
+    dates = horizon_dates(2025, 1, months)
+    catalog = StaticCatalog(employees, rules)
+
+    def solve(modes):
+        start = time.perf_counter()
+        scheduler = scheduler_cls(catalog, catalog, assignments, profile=modes, seed=seed)
+        setup = time.perf_counter() - start
+        result = scheduler.generate_range(dates[0], dates[-1])
+        return scheduler, result, setup
+
+    start = time.perf_counter()
+    scheduler, result, setup = solve(list(profile))
+    total = time.perf_counter() - start
+    stats = result["stats"]
+    if stats.profile_text:
+        print(stats.profile_text)
+
+    peak_kib = None
+    if measure_memory:
+        # 記憶體量測會拖慢執行，因此另外再跑一次，不影響上面的計時
+        peak_kib = solve(["tracemalloc"])[1]["stats"].peak_memory_kib
+
+    case = f"emp={num_employees}/months={months}/density={density:g}"
+    return {
+        "case": case if engine == Scheduler.engine else f"{case}/engine={engine}",
+        "engine": engine,
+        "employees": num_employees,
+        "months": months,
+        "rule_density": density,
+        "rules": len(rules),
+        "seed": seed,
+        "total_seconds": total,
+        "phases": {"setup": setup, **stats.phase_seconds},
+        "counters": dict(stats.counters),
+        "rule_checks": dict(stats.rule_checks),
+        "peak_memory_kib": peak_kib,
+        "quality": _measure_quality(result, scheduler),
+    }
+
+
+def compare(old: Dict, new: Dict) -> List[str]:
+    """比較兩份結果檔，回傳每個案例的總時間與各階段變化"""
+    old_cases = {r["case"]: r for r in old["results"]}
+    lines = []
+    for record in new["results"]:
+        before = old_cases.get(record["case"])
+        if before is None:
+            lines.append(f"{record['case']}: (新案例)")
+            continue
+        ratio = record["total_seconds"] / before["total_seconds"] if before["total_seconds"] else float("inf")
+        phases = ", ".join(
+            f"{phase} {before['phases'].get(phase, 0):.3f}s→{seconds:.3f}s"
+            for phase, seconds in record["phases"].items()
+        )
+        lines.append(f"{record['case']}: {before['total_seconds']:.3f}s → {record['total_seconds']:.3f}s "
+                     f"(x{ratio:.2f}) [{phases}]")
+    return lines
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x]
+
+
+def _float_list(text: str) -> List[float]:
+    return [float(x) for x in text.split(",") if x]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="排班引擎效能基準測試")
+    parser.add_argument("--employees", type=_int_list, default=[10, 100, 500], help="員工人數，以逗號分隔")
+    parser.add_argument("--months", type=_int_list, default=[1, 3], help="排班月數，以逗號分隔")
+    parser.add_argument("--density", type=_float_list, default=[0.5], help="規則密度 (0~1)，以逗號分隔")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true", help="不量測記憶體峰值（較快）")
+    parser.add_argument("--profile", type=lambda text: text.split(","), default=[],
+                        help="在計時執行中開啟規則檢查計數或剖析 (例如 counters、cprofile)")
+    parser.add_argument("--output", default="bench_results.json", help="結果輸出檔 (JSON)")
+    parser.add_argument("--compare", help="與先前的結果檔比較")
+    parser.add_argument("--engine", choices=list(ENGINES), default=Scheduler.engine, help="排班引擎")
+    args = parser.parse_args(argv)
+    # 合成資料會觸發大量衝突警告，基準測試只需要錯誤訊息
+    configure_logging("WARNING", module_levels={"core": "ERROR"})
+
+    results = []
+    for num_employees in args.employees:
+        for months in args.months:
+            for density in args.density:
+                record = run_case(num_employees, months, density, args.seed, not args.no_memory, args.profile,
+                                  args.engine)
+                results.append(record)
+                memory = f"{record['peak_memory_kib']:.0f} KiB" if record["peak_memory_kib"] is not None else "-"
+                print(f"{record['case']:<40} {record['total_seconds']:8.3f}s  peak {memory:>12}  "
+                      f"未排定 {record['quality']['unfilled']}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"結果已寫入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old_report = json.load(f)
+        print("\n--- 與先前結果比較 ---")
+        for line in compare(old_report, report):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+合成工作負載產生器 (Synthetic Workload Generator)
+依照種子 (seed) 產生可重現的員工、規則庫與規則指派，用於效能基準測試。
+"""
+import datetime
+import random
+from calendar import monthrange
+from typing import Dict, List, Tuple
+
+from core.models import Employee, Rule
+from core.scheduler import SHIFTS
+
+LEVELS = ["吧檯手", "門職", "時薪人員"]
+LEVEL_WEIGHTS = [0.6, 0.2, 0.2]
+LATE_SHIFTS = ["10.5-19", "10.5-20.5", "13-21.5", "14-22"]
+
+
+def horizon_dates(year: int, month: int, months: int) -> List[datetime.date]:
+    """從指定月份開始連續 months 個月的所有日期"""
+    dates = []
+    for _ in range(months):
+        for day in range(1, monthrange(year, month)[1] + 1):
+            dates.append(datetime.date(year, month, day))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return dates
+
+
+def generate_workload(seed: int, num_employees: int, year: int = 2025, month: int = 1,
+                      months: int = 1, rule_density: float = 0.5) -> Tuple[List[Employee], List[Rule], Dict]:
+    """
+    產生一組合成資料。
+    rule_density 介於 0 ~ 1，決定有多少比例的員工拿到個人規則，以及每人規則的數量。
+    回傳 (員工列表, 規則列表, 規則指派)。
+    """
+    rng = random.Random(seed)
+    dates = horizon_dates(year, month, months)
+    work_shifts = [s.name for s in SHIFTS if s.name not in ["休", "例休"]]
+
+    employees = [
+        Employee(name=f"員工{i:04d}", level=rng.choices(LEVELS, LEVEL_WEIGHTS)[0], id=f"emp-{seed}-{i:05d}")
+        for i in range(num_employees)
+    ]
+
+    rules: List[Rule] = []
+
+    def new_rule(name, rule_type, params) -> Rule:
+        rule = Rule(name=name, rule_type=rule_type, params=params, id=f"rule-{seed}-{len(rules):06d}")
+        rules.append(rule)
+        return rule
+
+    # 全域規則：晚接早、班別連動、少量級別限制
+    global_ids = [
+        new_rule("晚接早", "LATE_SHIFT_THEN_EARLY_SHIFT", {"late_shifts": LATE_SHIFTS, "early_shift": "9-17.5"}).id,
+        new_rule("班別連動", "SHIFT_INTERDEPENDENCE", {}).id,
+        new_rule("9.5-18 限吧檯手", "REQUIRED_LEVEL_FOR_SHIFT", {"level": "吧檯手", "shift_name": "9.5-18"}).id,
+    ]
+    full_time_hours = new_rule("正職總工時", "MIN_MONTHLY_HOURS", {"hours": 160})
+    part_time_hours = new_rule("兼職工時", "MIN_MONTHLY_HOURS", {"hours": 120})
+
+    assignments = {"global": global_ids, "employees": {}}
+    rules_per_employee = max(1, int(round(rule_density * 8)))
+    for emp in employees:
+        emp_rules = [part_time_hours.id if emp.level == "時薪人員" else full_time_hours.id]
+        if rng.random() < rule_density:
+            for _ in range(rules_per_employee):
+                if rng.random() < 0.7:
+                    off_days = sorted(rng.sample(dates, k=min(len(dates), 2 * months)))
+                    rule = new_rule(f"{emp.name} 休假", "ASSIGN_FIXED_OFF_DAYS", {
+                        "dates": [d.isoformat() for d in off_days],
+                        "shift_name": rng.choice(["休", "例休"]),
+                    })
+                else:
+                    rule = new_rule(f"{emp.name} 指定班", "ASSIGN_SPECIFIC_SHIFT", {
+                        "date": rng.choice(dates).isoformat(),
+                        "shift_name": rng.choice(work_shifts),
+                    })
+                emp_rules.append(rule.id)
+        assignments["employees"][emp.id] = emp_rules
+
+    return employees, rules, assignments
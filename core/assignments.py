@@ -0,0 +1,95 @@
+"""
+新增檔案：規則指派 (Rule Assignments)
+定義「哪些規則套用在哪些人身上」的資料格式與批次操作 API。
+
+指派格式:
+    {
+        "global":    [rule_id, ...],                          # 所有人
+        "levels":    {"吧檯手": [rule_id, ...], ...},          # 某個級別的所有人
+        "groups":    {"晚班組": {"members": [emp_id, ...],     # 自訂群組
+                                "rules": [rule_id, ...]}},
+        "employees": {emp_id: [rule_id, ...], ...},           # 個人；同時決定誰要排班
+    }
+級別與群組的規則只存一份，由排班引擎在編譯時展開，不會複製到每位員工身上。
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from .models import Employee
+
+EMPLOYEE_LEVELS = ["吧檯手", "門職", "時薪人員"]
+
+
+def new_assignments() -> Dict:
+    """建立一份空的規則指派"""
+    return {"global": [], "levels": {}, "groups": {}, "employees": {}}
+
+
+def _extend_unique(target: List[str], rule_ids: Iterable[str]):
+    existing = set(target)
+    for rule_id in rule_ids:
+        if rule_id not in existing:
+            target.append(rule_id)
+            existing.add(rule_id)
+
+
+def define_group(assignments: Dict, name: str, member_ids: Iterable[str]) -> Dict:
+    """建立或覆寫一個自訂群組的成員（保留原有的規則）"""
+    group = assignments.setdefault("groups", {}).setdefault(name, {"members": [], "rules": []})
+    group["members"] = list(dict.fromkeys(member_ids))
+    return group
+
+
+def bulk_assign(assignments: Dict, rule_ids: Iterable[str], *, employee_ids: Iterable[str] = (),
+                levels: Iterable[str] = (), groups: Iterable[str] = (), to_global: bool = False) -> Dict:
+    """
+    一次把多條規則指派給多個目標 (個人、級別、群組或全域)，重複的指派會被忽略。
+    直接修改並回傳 assignments。
+    """
+    rule_ids = list(rule_ids)
+    if to_global:
+        _extend_unique(assignments.setdefault("global", []), rule_ids)
+    for level in levels:
+        _extend_unique(assignments.setdefault("levels", {}).setdefault(level, []), rule_ids)
+    for name in groups:
+        group = assignments.setdefault("groups", {}).setdefault(name, {"members": [], "rules": []})
+        _extend_unique(group["rules"], rule_ids)
+    for emp_id in employee_ids:
+        _extend_unique(assignments.setdefault("employees", {}).setdefault(emp_id, []), rule_ids)
+    return assignments
+
+
+def bulk_unassign(assignments: Dict, rule_ids: Iterable[str]) -> Dict:
+    """從所有目標中移除指定的規則"""
+    removed = set(rule_ids)
+
+    def strip(ids: List[str]) -> List[str]:
+        return [rid for rid in ids if rid not in removed]
+
+    assignments["global"] = strip(assignments.get("global", []))
+    for level, ids in assignments.get("levels", {}).items():
+        assignments["levels"][level] = strip(ids)
+    for group in assignments.get("groups", {}).values():
+        group["rules"] = strip(group["rules"])
+    for emp_id, ids in assignments.get("employees", {}).items():
+        assignments["employees"][emp_id] = strip(ids)
+    return assignments
+
+
+def compile_assignments(assignments: Dict, employees: Dict[str, Employee]) -> Dict[str, Tuple[str, ...]]:
+    """
+    把全域、級別、群組與個人指派展開成「每位員工的規則 ID 序列」。
+    順序固定為 全域 → 級別 → 群組 → 個人，並去除重複，讓排班結果不受雜湊順序影響。
+    """
+    global_ids = assignments.get("global", [])
+    level_ids = assignments.get("levels", {})
+    memberships: Dict[str, List[str]] = {}
+    for group in assignments.get("groups", {}).values():
+        for emp_id in group.get("members", []):
+            memberships.setdefault(emp_id, []).extend(group.get("rules", []))
+
+    compiled = {}
+    for emp_id, own_ids in assignments.get("employees", {}).items():
+        employee = employees.get(emp_id)
+        by_level = level_ids.get(employee.level, []) if employee else []
+        compiled[emp_id] = tuple(dict.fromkeys([*global_ids, *by_level, *memberships.get(emp_id, []), *own_ids]))
+    return compiled
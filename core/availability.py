@@ -0,0 +1,157 @@
+"""
+新增檔案：可上班時段索引 (Availability Index)
+把「員工可上班時段」與「班別偏好」規則 (可依星期重複、可限定日期區間)
+編譯成每位員工的區間索引，回答「X 在 D 日能不能上 S 班」只需一次二分搜尋加一次位元運算。
+
+每位員工的時間軸依規則的起迄日切成數段，每一段預先算好「星期一 ~ 星期日」各自可上的班別位元遮罩；
+排班時直接以遮罩刪去不可能的班別，不必在填格子時逐條規則檢查。
+"""
+import bisect
+import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .models import Rule
+
+AVAILABILITY = "EMPLOYEE_AVAILABILITY"
+SHIFT_PREFERENCE = "SHIFT_PREFERENCE"
+
+ONLY = "只能上"        # 符合的日子只能上列出的班別 (或休息)
+EXCLUDE = "不能上"     # 符合的日子不能上列出的班別；未列班別代表整天不能上班
+
+WEEKDAY_NAMES = ["週一", "週二", "週三", "週四", "週五", "週六", "週日"]
+
+_MIN_ORDINAL = datetime.date.min.toordinal()
+_MAX_ORDINAL = datetime.date.max.toordinal()
+
+
+def _ordinal(date_str, default: int) -> int:
+    if not date_str:
+        return default
+    try:
+        return datetime.date.fromisoformat(date_str).toordinal()
+    except (TypeError, ValueError):
+        return default
+
+
+def _weekday_mask(weekdays) -> int:
+    """未指定星期代表每天"""
+    mask = 0
+    for weekday in weekdays or range(7):
+        try:
+            weekday = int(weekday)
+        except (TypeError, ValueError):
+            continue
+        if 0 <= weekday < 7:
+            mask |= 1 << weekday
+    return mask
+
+
+class _Timeline:
+    """
+    一位員工的區間索引: boundaries 為各段的起始日序數 (遞增)，
+    masks[段][星期] 為該段該星期的班別遮罩。
+    """
+    __slots__ = ("boundaries", "masks")
+
+    def __init__(self, entries: List[Tuple[int, int, int, int, str]], full_mask: int, combine: str):
+        points = sorted({start for start, _, _, _, _ in entries} | {end + 1 for _, end, _, _, _ in entries})
+        self.boundaries = [_MIN_ORDINAL] + [p for p in points if p > _MIN_ORDINAL]
+        self.masks = []
+        for segment_start in self.boundaries:
+            active = [entry for entry in entries if entry[0] <= segment_start <= entry[1]]
+            weekly = []
+            for weekday in range(7):
+                mask = full_mask if combine == "intersect" else 0
+                for _, _, weekdays, shifts, mode in active:
+                    if not weekdays >> weekday & 1:
+                        continue
+                    if combine == "union":
+                        mask |= shifts
+                    elif mode == ONLY:
+                        mask &= shifts
+                    else:
+                        mask &= ~shifts
+                weekly.append(mask)
+            self.masks.append(tuple(weekly))
+
+    def mask(self, ordinal: int, weekday: int) -> int:
+        return self.masks[bisect.bisect_right(self.boundaries, ordinal) - 1][weekday]
+
+
+class AvailabilityIndex:
+    """
+    所有員工的可上班時段與班別偏好索引。
+    shift_names 決定每個班別在遮罩中的位元位置 (通常是 SHIFTS 的順序)。
+    """
+    def __init__(self, employee_rules: Dict[str, Sequence[Rule]], shift_names: Iterable[str],
+                 rest_shifts: Iterable[str] = ("休", "例休")):
+        self.bits = {name: 1 << position for position, name in enumerate(shift_names)}
+        self.full_mask = sum(self.bits.values())
+        self.rest_mask = sum(self.bits.get(name, 0) for name in rest_shifts)
+        self._availability: Dict[str, _Timeline] = {}
+        self._preference: Dict[str, _Timeline] = {}
+
+        for emp_id, rules in employee_rules.items():
+            available, preferred = [], []
+            for rule in rules:
+                if rule.rule_type not in (AVAILABILITY, SHIFT_PREFERENCE):
+                    continue
+                params = rule.params if isinstance(rule.params, dict) else {}
+                mode = params.get("mode", ONLY)
+                shifts = self.shift_mask(params.get("shifts", []))
+                if mode == EXCLUDE and not shifts:
+                    shifts = self.full_mask & ~self.rest_mask
+                entry = (
+                    _ordinal(params.get("start_date"), _MIN_ORDINAL),
+                    _ordinal(params.get("end_date"), _MAX_ORDINAL),
+                    _weekday_mask(params.get("weekdays")),
+                    shifts,
+                    mode,
+                )
+                (available if rule.rule_type == AVAILABILITY else preferred).append(entry)
+            if available:
+                self._availability[emp_id] = _Timeline(available, self.full_mask, "intersect")
+            if preferred:
+                self._preference[emp_id] = _Timeline(preferred, self.full_mask, "union")
+
+    def shift_mask(self, shift_names: Iterable[str]) -> int:
+        mask = 0
+        for name in shift_names:
+            mask |= self.bits.get(name, 0)
+        return mask
+
+    def has_rules(self, emp_id: str) -> bool:
+        return emp_id in self._availability or emp_id in self._preference
+
+    def allowed_mask(self, emp_id: str, day: datetime.date) -> int:
+        """某人某天可以排的班別遮罩 (休息類班別永遠可排)"""
+        timeline = self._availability.get(emp_id)
+        if timeline is None:
+            return self.full_mask
+        return timeline.mask(day.toordinal(), day.weekday()) | self.rest_mask
+
+    def can_work(self, emp_id: str, shift_name: str, day: datetime.date) -> bool:
+        return bool(self.allowed_mask(emp_id, day) & self.bits.get(shift_name, 0))
+
+    def preferred_mask(self, emp_id: str, day: datetime.date) -> int:
+        """某人某天偏好的班別遮罩；0 表示沒有偏好"""
+        timeline = self._preference.get(emp_id)
+        if timeline is None:
+            return 0
+        return timeline.mask(day.toordinal(), day.weekday())
+
+
+def describe_availability(params: Dict, rule_type: str = AVAILABILITY) -> Optional[str]:
+    """規則列表顯示用的文字"""
+    weekdays = params.get("weekdays") or []
+    days = "、".join(WEEKDAY_NAMES[int(d)] for d in sorted(int(d) for d in weekdays)) if weekdays else "每天"
+    shifts = ", ".join(params.get("shifts") or [])
+    period = ""
+    if params.get("start_date") or params.get("end_date"):
+        period = f" ({params.get('start_date') or '不限'} ~ {params.get('end_date') or '不限'})"
+    if rule_type == SHIFT_PREFERENCE:
+        return f"{days}{period} 優先排 [{shifts or '?'}]"
+    mode = params.get("mode", ONLY)
+    if not shifts:
+        return f"{days}{period} {'只能休息' if mode == ONLY else '整天不能上班'}"
+    return f"{days}{period} {mode} [{shifts}]"
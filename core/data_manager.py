@@ -1,10 +1,28 @@
 """
 新增檔案：資料管理器 (Data Manager)
 負責所有檔案的讀取與寫入，讓核心邏輯與「如何存檔」這件事分離。
+
+資料夾可能放在共用磁碟上、同時被好幾台電腦開啟，因此每次讀寫都會記下檔案的「指紋」
+(修改時間、大小、內容雜湊)：
+- has_changed() 平時只做一次 stat，時間與大小都沒變就直接判定沒變；
+  有變才讀檔比對雜湊，排除只是被 touch 的情況。
+- save_data() 採樂觀並行控制：若檔案在上次讀寫之後被別人改過，拋出 ConcurrentModificationError，
+  由呼叫端先合併對方的變動再重存 (最多 SAVE_ATTEMPTS 次)，而不是直接覆蓋。
 """
+import hashlib
 import json
 import os
-from typing import List, Dict, Any
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# 控制器「合併後重存」最多嘗試的次數；每次重存前都可能又被別人搶先存檔
+SAVE_ATTEMPTS = 3
+
+
+class ConcurrentModificationError(Exception):
+    """存檔時發現檔案在上次讀寫之後已被其他人修改"""
+
 
 class DataManager:
     """處理 JSON 檔案的讀取和儲存"""
@@ -12,18 +30,92 @@ class DataManager:
         self.filepath = filepath
         # 如果檔案所在的目錄不存在，則建立它
         os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+        # 上次讀寫時的 (修改時間, 大小) 與內容雜湊；_known 表示是否讀寫過這個檔案
+        self._stat: Optional[Tuple[int, int]] = None
+        self._digest: Optional[str] = None
+        self._known = False
+
+    def _stat_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.filepath)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _remember(self, content: Optional[bytes], stat: Optional[Tuple[int, int]]):
+        self._known = True
+        self._stat = stat
+        self._digest = hashlib.sha256(content).hexdigest() if content is not None else None
 
     def load_data(self) -> List[Dict[str, Any]]:
         """從 JSON 檔案載入資料"""
-        if not os.path.exists(self.filepath):
+        stat = self._stat_signature()
+        try:
+            with open(self.filepath, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            self._remember(None, None)
             return []
+        self._remember(content, stat)
         try:
-            with open(self.filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
+            return json.loads(content.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
             return []
 
-    def save_data(self, data: List[Dict[str, Any]]):
-        """將資料儲存到 JSON 檔案"""
-        with open(self.filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+    def has_changed(self) -> bool:
+        """檔案在上次讀寫之後是否被其他人修改過"""
+        stat = self._stat_signature()
+        if stat == self._stat:
+            return False
+        if stat is None:
+            return self._digest is not None  # 檔案被刪除
+        try:
+            with open(self.filepath, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            return self._digest is not None
+        if digest == self._digest:
+            self._stat = stat  # 內容沒變 (例如只是被 touch 或複製)，之後只需比對新的 stat
+            return False
+        return True
+
+    def save_data(self, data: List[Dict[str, Any]], force: bool = False):
+        """
+        將資料儲存到 JSON 檔案。
+        先寫到同一個資料夾的暫存檔再取代，其他人不會讀到寫到一半的檔案。
+        force=False 時若檔案已被其他人修改，拋出 ConcurrentModificationError。
+        """
+        if not force and self._known and self.has_changed():
+            raise ConcurrentModificationError(f"'{self.filepath}' 已被其他人修改")
+        content = json.dumps(data, indent=4, ensure_ascii=False).encode('utf-8')
+        directory = os.path.dirname(self.filepath) or "."
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, self.filepath)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._remember(content, self._stat_signature())
+
+
+def merge_by_id(local: List[Dict[str, Any]], remote: List[Dict[str, Any]],
+                keep_ids=(), new_ids=()) -> List[Dict[str, Any]]:
+    """
+    以檔案上的最新內容為準合併記錄 (依 id)，但 keep_ids 中的記錄保留本機版本
+    (本機修改的保留、剛刪除的不會被加回來)。檔案上已不存在的記錄只有在 new_ids 中
+    (本機剛新增) 才保留，否則視為已被其他人刪除。順序以檔案為主，本機新增的接在後面。
+    """
+    local_by_id = {record["id"]: record for record in local}
+    merged = []
+    for record in remote:
+        if record["id"] in keep_ids:
+            if record["id"] in local_by_id:
+                merged.append(local_by_id[record["id"]])
+        else:
+            merged.append(record)
+    remote_ids = {record["id"] for record in remote}
+    merged.extend(record for record in local if record["id"] in new_ids and record["id"] not in remote_ids)
+    return merged
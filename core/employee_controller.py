@@ -2,39 +2,107 @@
 新增檔案：員工控制器 (Employee Controller)
 這是專門用來處理所有「員工相關操作」的商業邏輯中心。
 """
-from typing import List, Optional
+import logging
+from dataclasses import asdict
+from typing import Dict, Iterable, List, Optional
+from PyQt6.QtCore import QObject, pyqtSignal
 from .models import Employee
-from .data_manager import DataManager
+from .data_manager import SAVE_ATTEMPTS, ConcurrentModificationError, DataManager
 
-class EmployeeController:
+logger = logging.getLogger(__name__)
+
+class EmployeeController(QObject):
     """
     封裝了所有員工資料的增、刪、改、查 (CRUD) 操作。
+    每次變動都會發出帶有員工 ID 的細粒度信號。
     """
+    employee_added = pyqtSignal(str)
+    employee_updated = pyqtSignal(str)
+    employee_removed = pyqtSignal(str)
+
     def __init__(self, data_path: str = "data/employees.json"):
-        # 加入診斷訊息
-        print(f"\n--- 正在初始化 EmployeeController ---")
-        print(f"  - 目標資料檔案: '{data_path}'")
+        super().__init__()
         self.manager = DataManager(data_path)
         self.employees: List[Employee] = self._load_employees()
-        print(f"  - 從檔案成功載入 {len(self.employees)} 位員工資料。")
-        print(f"--- EmployeeController 初始化完畢 ---")
+        logger.debug("EmployeeController 已從 '%s' 載入 %d 位員工資料", data_path, len(self.employees))
 
     def _load_employees(self) -> List[Employee]:
         """從檔案載入員工資料並轉換成 Employee 物件列表"""
         data = self.manager.load_data()
         return [Employee(**emp_data) for emp_data in data]
 
-    def _save_employees(self):
-        """將目前的員工物件列表轉換成字典並存檔"""
-        data_to_save = [emp.__dict__ for emp in self.employees]
-        self.manager.save_data(data_to_save)
+    def _save_employees(self, changed_id: Optional[str] = None, is_new: bool = False):
+        """
+        將目前的員工物件列表轉換成字典並存檔。
+        若檔案已被其他人修改，先合併對方的變動再重存：changed_id 這位員工保留本機版本，
+        但只有本次新增的員工 (is_new) 才會在檔案上找不到時被加回去。
+        連續 SAVE_ATTEMPTS 次都被搶先存檔時，放棄本機這次的變動 (與檔案同步) 並拋出 ConcurrentModificationError。
+        """
+        for _ in range(SAVE_ATTEMPTS):
+            try:
+                self.manager.save_data([asdict(emp) for emp in self.employees])
+                return
+            except ConcurrentModificationError:
+                logger.info("員工資料已被其他人修改，合併後重新存檔")
+                self._apply_records(self.manager.load_data(), keep_ids=(changed_id,),
+                                    new_ids=(changed_id,) if is_new else ())
+        self._apply_records(self.manager.load_data())
+        raise ConcurrentModificationError(f"員工資料持續被其他人修改，已放棄本次變更 ({SAVE_ATTEMPTS} 次重試)")
+
+    def _apply_records(self, records: List[Dict], keep_ids: Iterable[str] = (),
+                       new_ids: Iterable[str] = ()) -> int:
+        """
+        依 ID 把檔案上的員工資料合併進目前的列表，只對真正變動的員工發出信號。
+        既有的 Employee 物件透過 update() 就地更新，其他地方持有的參照仍然有效。
+        keep_ids 的員工保留本機版本 (本機已刪除的不會被加回來)；其中檔案上已不存在的，
+        只有在 new_ids 中 (本機剛新增) 才保留，否則視為已被其他人刪除。回傳變動的筆數。
+        """
+        keep_ids, new_ids = set(keep_ids), set(new_ids)
+        current = {emp.id: emp for emp in self.employees}
+        remote_ids = {data["id"] for data in records}
+        merged, added, updated = [], [], []
+        for data in records:
+            employee = current.get(data["id"])
+            if data["id"] in keep_ids:
+                if employee is not None:
+                    merged.append(employee)
+            elif employee is None:
+                employee = Employee(**data)
+                merged.append(employee)
+                added.append(employee.id)
+            else:
+                if employee != Employee(**data):
+                    employee.update(**data)
+                    updated.append(employee.id)
+                merged.append(employee)
+        merged.extend(emp for emp in self.employees if emp.id in new_ids and emp.id not in remote_ids)
+        merged_ids = {emp.id for emp in merged}
+        removed = [emp.id for emp in self.employees if emp.id not in merged_ids]
+        self.employees[:] = merged
+
+        for employee_id in removed:
+            self.employee_removed.emit(employee_id)
+        for employee_id in updated:
+            self.employee_updated.emit(employee_id)
+        for employee_id in added:
+            self.employee_added.emit(employee_id)
+        return len(removed) + len(updated) + len(added)
+
+    def reload_if_changed(self) -> int:
+        """檔案被其他人修改時，增量合併對方的變動；平時只花一次 stat。回傳變動的筆數"""
+        if not self.manager.has_changed():
+            return 0
+        changes = self._apply_records(self.manager.load_data())
+        logger.debug("員工資料檔已被外部修改，合併了 %d 筆變動", changes)
+        return changes
 
     def add_employee(self, name: str, level: str) -> Employee:
         """新增一位員工"""
         new_employee = Employee(name=name, level=level)
         self.employees.append(new_employee)
-        self._save_employees()
-        print(f"  ✅ 已新增員工: {name} (級別: {level})")
+        self._save_employees(new_employee.id, is_new=True)
+        self.employee_added.emit(new_employee.id)
+        logger.debug("已新增員工: %s (級別: %s)", name, level)
         return new_employee
 
     def get_employee_by_id(self, employee_id: str) -> Optional[Employee]:
@@ -48,12 +116,15 @@ class EmployeeController:
         """更新員工資訊"""
         employee = self.get_employee_by_id(employee_id)
         if employee:
-            employee.name = new_name
-            employee.level = new_level
-            self._save_employees()
-            print(f"  🔄️  已更新員工 ID {employee_id[:6]}... 為: {new_name}, {new_level}")
+            employee.update(name=new_name, level=new_level)
+            self._save_employees(employee_id)
+            if self.get_employee_by_id(employee_id) is None:
+                logger.warning("更新失敗: 員工 ID %s 已被其他人刪除，捨棄本機的修改", employee_id)
+                return False
+            self.employee_updated.emit(employee_id)
+            logger.debug("已更新員工 ID %s 為: %s, %s", employee_id, new_name, new_level)
             return True
-        print(f"  ❌ 更新失敗: 找不到員工 ID {employee_id[:6]}...")
+        logger.warning("更新失敗: 找不到員工 ID %s", employee_id)
         return False
 
     def delete_employee(self, employee_id: str) -> bool:
@@ -61,10 +132,11 @@ class EmployeeController:
         employee = self.get_employee_by_id(employee_id)
         if employee:
             self.employees.remove(employee)
-            self._save_employees()
-            print(f"  🗑️  已刪除員工: {employee.name}")
+            self._save_employees(employee_id)
+            self.employee_removed.emit(employee_id)
+            logger.debug("已刪除員工: %s", employee.name)
             return True
-        print(f"  ❌ 刪除失敗: 找不到員工 ID {employee_id[:6]}...")
+        logger.warning("刪除失敗: 找不到員工 ID %s", employee_id)
         return False
 
     def get_all_employees(self) -> List[Employee]:
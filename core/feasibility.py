@@ -0,0 +1,250 @@
+"""
+新增檔案：可行性分析器 (Feasibility Analyzer)
+在真正排班之前，對「規則指派」做一次靜態檢查，
+提早找出互相矛盾、無人可排、或工時根本達不到的設定，並指出是哪幾條規則造成的。
+"""
+import datetime
+from calendar import monthrange
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .models import Employee, Rule
+from .assignments import compile_assignments
+from .availability import AVAILABILITY, AvailabilityIndex
+
+# 衝突類型
+CONTRADICTION = "CONTRADICTION"              # 兩條規則要求同一格排不同班
+INFEASIBLE_COVERAGE = "INFEASIBLE_COVERAGE"  # 某班別在某天沒有任何人能上
+IMPOSSIBLE_HOURS = "IMPOSSIBLE_HOURS"        # 就算每天都排最長的班也達不到工時
+INVALID_RULE = "INVALID_RULE"                # 規則參數本身有問題
+
+REST_SHIFTS = ("休", "例休")
+# 跨店支援的員工在「不屬於這間店」的日子會被指定成這個班別：人在他店上班，
+# 本店不排班、不計工時，但連續上班天數要算進去，每月工時目標也只按本店負責的天數折算
+FLOAT_AWAY_SHIFT = "支援他店"
+
+
+@dataclass
+class Conflict:
+    """一筆衝突：類型、說明文字，以及造成衝突的最小規則集合"""
+    kind: str
+    message: str
+    rule_ids: List[str] = field(default_factory=list)
+    employee_id: Optional[str] = None
+    date: Optional[str] = None
+
+
+def _parse_date(date_str) -> Optional[datetime.date]:
+    try:
+        return datetime.date.fromisoformat(date_str)
+    except (TypeError, ValueError):
+        return None
+
+
+class FeasibilityAnalyzer:
+    """
+    對員工、規則與指派關係做靜態分析。
+    只看規則本身，不跑排班，所以即使是大型規則庫也只需要幾毫秒。
+    """
+    def __init__(self, employees: Dict[str, Employee], rules: Dict[str, Rule],
+                 assignments: Dict, shift_durations: Dict[str, float]):
+        self.employees = employees
+        self.rules = rules
+        self.assignments = assignments
+        self.shift_durations = shift_durations
+        self.compiled = compile_assignments(assignments, employees)
+
+    def _rules_of(self, rule_ids) -> List[Rule]:
+        return [self.rules[rid] for rid in dict.fromkeys(rule_ids) if rid in self.rules]
+
+    def analyze(self, year: int, month: int) -> List[Conflict]:
+        num_days = monthrange(year, month)[1]
+        month_start = datetime.date(year, month, 1)
+        month_end = datetime.date(year, month, num_days)
+
+        conflicts: List[Conflict] = []
+        employee_ids = [eid for eid in self.compiled if eid in self.employees]
+        emp_rules = {eid: self._rules_of(self.compiled[eid]) for eid in employee_ids}
+
+        # 每位員工當月被硬規則釘住的格子: {emp_id: {date: [(shift_name, rule_id), ...]}}
+        # 依規則順序排列；排班引擎依序套用，最後一筆才是實際排定的班別 (見 _effective_pin)
+        pins: Dict[str, Dict[datetime.date, List]] = {}
+        # 每位員工適用的級別限制: {emp_id: {shift_name: [rule, ...]}}
+        level_rules: Dict[str, Dict[str, List[Rule]]] = {}
+
+        for emp_id in employee_ids:
+            emp_pins = defaultdict(list)
+            for rule in emp_rules[emp_id]:
+                params = rule.params if isinstance(rule.params, dict) else {}
+                if rule.rule_type == "ASSIGN_FIXED_OFF_DAYS":
+                    for date_str in params.get("dates", []):
+                        day = _parse_date(date_str)
+                        if day is None:
+                            conflicts.append(Conflict(INVALID_RULE, f"規則【{rule.name}】含有無法辨識的日期 '{date_str}'", [rule.id], emp_id))
+                        elif month_start <= day <= month_end:
+                            emp_pins[day].append((params.get("shift_name", "休"), rule.id))
+                elif rule.rule_type == "ASSIGN_SPECIFIC_SHIFT":
+                    day = _parse_date(params.get("date"))
+                    if day is None:
+                        conflicts.append(Conflict(INVALID_RULE, f"規則【{rule.name}】沒有設定有效的日期", [rule.id], emp_id))
+                    elif month_start <= day <= month_end and params.get("shift_name") is not None:
+                        emp_pins[day].append((params.get("shift_name"), rule.id))
+            pins[emp_id] = emp_pins
+
+            emp_level_rules = defaultdict(list)
+            for rule in emp_rules[emp_id]:
+                if rule.rule_type == "REQUIRED_LEVEL_FOR_SHIFT":
+                    emp_level_rules[rule.params.get("shift_name")].append(rule)
+            level_rules[emp_id] = emp_level_rules
+
+        availability = AvailabilityIndex(emp_rules, [*self.shift_durations, *REST_SHIFTS], REST_SHIFTS)
+        for emp_id in employee_ids:
+            conflicts.extend(self._check_pins(emp_id, pins[emp_id], level_rules[emp_id]))
+            if availability.has_rules(emp_id):
+                conflicts.extend(self._check_availability(emp_id, pins[emp_id], availability, emp_rules[emp_id]))
+        conflicts.extend(self._check_coverage(employee_ids, pins, level_rules, month_start, num_days))
+        for emp_id in employee_ids:
+            conflicts.extend(self._check_hours(emp_id, emp_rules[emp_id], pins[emp_id], level_rules[emp_id], num_days))
+        return conflicts
+
+    def _allowed(self, employee: Employee, shift_name: str, emp_level_rules) -> Optional[Rule]:
+        """若級別限制不允許該員工上此班，回傳擋住他的那條規則"""
+        for rule in emp_level_rules.get(shift_name, []):
+            if employee.level != rule.params.get("level"):
+                return rule
+        return None
+
+    @staticmethod
+    def _effective_pin(entries) -> tuple:
+        """同一格被多條規則指定時，排班引擎依規則順序套用，最後一條為準: (班別, 規則 ID)"""
+        return entries[-1]
+
+    def _check_pins(self, emp_id, emp_pins, emp_level_rules) -> List[Conflict]:
+        employee = self.employees[emp_id]
+        conflicts = []
+        for day in sorted(emp_pins):
+            entries = emp_pins[day]
+            effective_shift, effective_rule = self._effective_pin(entries)
+            for shift_name, rule_id in entries[:-1]:
+                if shift_name != effective_shift:
+                    conflicts.append(Conflict(
+                        CONTRADICTION,
+                        f"{employee.name} 在 {day.isoformat()} 同時被指定為 '{shift_name}' 與 '{effective_shift}'"
+                        f" (實際排定 '{effective_shift}')",
+                        [rule_id, effective_rule], emp_id, day.isoformat()))
+                    break
+            for shift_name, rule_id in entries:
+                blocker = self._allowed(employee, shift_name, emp_level_rules)
+                if blocker:
+                    conflicts.append(Conflict(
+                        CONTRADICTION,
+                        f"{employee.name} ({employee.level}) 在 {day.isoformat()} 被指定上 '{shift_name}'，"
+                        f"但該班別必須由 '{blocker.params.get('level')}' 擔任",
+                        [rule_id, blocker.id], emp_id, day.isoformat()))
+        return conflicts
+
+    def _check_availability(self, emp_id, emp_pins, availability, rules) -> List[Conflict]:
+        """指定的班別落在員工不可上班的時段"""
+        employee = self.employees[emp_id]
+        blockers = [rule.id for rule in rules if rule.rule_type == AVAILABILITY]
+        conflicts = []
+        for day in sorted(emp_pins):
+            shift_name, rule_id = self._effective_pin(emp_pins[day])
+            if shift_name in self.shift_durations and not availability.can_work(emp_id, shift_name, day):
+                conflicts.append(Conflict(
+                    CONTRADICTION,
+                    f"{employee.name} 在 {day.isoformat()} 被指定上 '{shift_name}'，但該時段設定為不可上此班",
+                    [rule_id, *blockers], emp_id, day.isoformat()))
+        return conflicts
+
+    def _check_coverage(self, employee_ids, pins, level_rules, month_start, num_days) -> List[Conflict]:
+        """檢查每條級別限制所管的班別，是否每天都至少有一個人能上"""
+        conflicts = []
+        seen = set()
+        for emp_id in employee_ids:
+            for shift_name, rules in level_rules[emp_id].items():
+                for rule in rules:
+                    if rule.id in seen:
+                        continue
+                    seen.add(rule.id)
+                    holders = [eid for eid in employee_ids if rule in level_rules[eid].get(shift_name, [])]
+                    eligible = [eid for eid in holders
+                                if not self._allowed(self.employees[eid], shift_name, level_rules[eid])]
+                    if not eligible:
+                        # 最小解釋：只有這條規則（或加上同班別另一條級別不同的規則）
+                        explanation = [rule.id] + [
+                            r.id for eid in holders for r in level_rules[eid][shift_name]
+                            if r.id != rule.id and r.params.get("level") != rule.params.get("level")
+                        ][:1]
+                        conflicts.append(Conflict(
+                            INFEASIBLE_COVERAGE,
+                            f"班別 '{shift_name}' 必須由 '{rule.params.get('level')}' 擔任，但適用此規則的員工中沒有人符合",
+                            explanation))
+                        continue
+                    blocked_days = []
+                    for offset in range(num_days):
+                        day = month_start + datetime.timedelta(days=offset)
+                        if all(pins[eid].get(day) and self._effective_pin(pins[eid][day])[0] != shift_name
+                               for eid in eligible):
+                            blocked_days.append(day)
+                    if blocked_days:
+                        pin_rules = list(dict.fromkeys(self._effective_pin(pins[eid][blocked_days[0]])[1]
+                                                       for eid in eligible))
+                        conflicts.append(Conflict(
+                            INFEASIBLE_COVERAGE,
+                            f"班別 '{shift_name}' 在 {', '.join(d.isoformat() for d in blocked_days)} "
+                            f"沒有任何 '{rule.params.get('level')}' 可以上班",
+                            [rule.id] + pin_rules, date=blocked_days[0].isoformat()))
+        return conflicts
+
+    def _check_hours(self, emp_id, rules, emp_pins, emp_level_rules, num_days) -> List[Conflict]:
+        """若每天都排可上的最長班仍達不到每月最低工時，就是不可能的目標"""
+        employee = self.employees[emp_id]
+        hour_rules = [r for r in rules if r.rule_type == "MIN_MONTHLY_HOURS"]
+        if not hour_rules:
+            return []
+
+        longest = max([d for name, d in self.shift_durations.items()
+                       if not self._allowed(employee, name, emp_level_rules)] or [0])
+        effective = [self._effective_pin(entries) for entries in emp_pins.values()]
+        pinned_hours = sum(self.shift_durations.get(shift_name, 0) for shift_name, _ in effective)
+        max_hours = pinned_hours + (num_days - len(emp_pins)) * longest
+
+        # 跨店支援的日子由他店負責工時，本店的目標按其餘天數折算
+        away_days = sum(1 for shift_name, _ in effective if shift_name == FLOAT_AWAY_SHIFT)
+        conflicts = []
+        for rule in hour_rules:
+            target = rule.params.get("hours", 0) * (num_days - away_days) / num_days
+            if max_hours >= target:
+                continue
+            # 最小解釋：依照「吃掉的工時」由多到少加入休假規則，直到單靠這些規則就已經不可行
+            lost_by_rule = defaultdict(float)
+            for shift_name, rule_id in effective:
+                lost_by_rule[rule_id] += longest - self.shift_durations.get(shift_name, 0)
+            explanation, reachable = [rule.id], num_days * longest
+            for rule_id, lost in sorted(lost_by_rule.items(), key=lambda kv: kv[1], reverse=True):
+                if reachable < target:
+                    break
+                explanation.append(rule_id)
+                reachable -= lost
+            conflicts.append(Conflict(
+                IMPOSSIBLE_HOURS,
+                f"{employee.name} 本月最多只能排到 {max_hours:g} 小時，達不到【{rule.name}】要求的 {target:g} 小時",
+                explanation, emp_id))
+        return conflicts
+
+
+def analyze_feasibility(employees: Dict[str, Employee], rules: Dict[str, Rule], assignments: Dict,
+                        shift_durations: Dict[str, float], year: int, month: int) -> List[Conflict]:
+    """便利函式：建立分析器並分析指定月份"""
+    return FeasibilityAnalyzer(employees, rules, assignments, shift_durations).analyze(year, month)
+
+
+def format_conflicts(conflicts: List[Conflict], rules: Dict[str, Rule]) -> str:
+    """將衝突列表轉成給使用者看的多行文字"""
+    lines = []
+    for conflict in conflicts:
+        names = "、".join(f"【{rules[rid].name}】" for rid in conflict.rule_ids if rid in rules)
+        lines.append(f"• {conflict.message}" + (f"\n    相關規則: {names}" if names else ""))
+    return "\n".join(lines)
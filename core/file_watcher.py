@@ -0,0 +1,75 @@
+"""
+新增檔案：資料檔監看器 (Data File Watcher)
+資料夾放在共用磁碟時，別台電腦存檔後這台要能即時看到，但又不能每隔幾秒就整份重新載入、重建畫面。
+
+- 能收到檔案系統通知時 (QFileSystemWatcher，Linux 上即 inotify) 以通知為主；
+  網路磁碟常常收不到通知，所以另外以計時器輪詢，每次只對每個檔案做一次 stat。
+- 偵測到變動後稍等一下 (去抖動) 再呼叫各控制器的 reload_if_changed()，
+  由控制器依 ID 增量合併並只對變動的記錄發出信號。
+"""
+import logging
+import os
+from typing import List
+
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+
+class DataFileWatcher(QObject):
+    """
+    監看控制器的資料檔 (控制器需提供 manager.filepath 與 reload_if_changed())。
+    poll_interval_ms 為輪詢間隔，0 表示只靠檔案系統通知。
+    """
+    # 合併了外部變動後發出，參數為變動的記錄總數
+    external_changes_applied = pyqtSignal(int)
+
+    def __init__(self, controllers: List, poll_interval_ms: int = 3000, debounce_ms: int = 300, parent=None):
+        super().__init__(parent)
+        self.controllers = list(controllers)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._watcher.directoryChanged.connect(self._on_file_changed)
+        self._watch_paths()
+
+        # 存檔常是「寫暫存檔再取代」，短時間內會連續觸發好幾次通知，合併成一次檢查
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(debounce_ms)
+        self._debounce.timeout.connect(self.check_now)
+
+        self._poll = QTimer(self)
+        self._poll.timeout.connect(self.check_now)
+        if poll_interval_ms > 0:
+            self._poll.start(poll_interval_ms)
+
+    def _watch_paths(self):
+        """檔案被取代後舊的監看會失效，每次都重新加入 (已在監看中的路徑不會重複加入)"""
+        watched = set(self._watcher.files()) | set(self._watcher.directories())
+        for controller in self.controllers:
+            path = controller.manager.filepath
+            directory = os.path.dirname(path) or "."
+            for target in (path, directory):
+                if target not in watched and os.path.exists(target):
+                    self._watcher.addPath(target)
+
+    def _on_file_changed(self, _path: str):
+        self._debounce.start()
+
+    def check_now(self) -> int:
+        """立即檢查所有資料檔並合併外部變動；回傳變動的記錄總數"""
+        self._watch_paths()
+        changes = 0
+        for controller in self.controllers:
+            try:
+                changes += controller.reload_if_changed()
+            except (OSError, ValueError, TypeError, KeyError):
+                # 對方可能還在寫檔或檔案內容不完整，下次檢查再試
+                logger.warning("無法合併 '%s' 的外部變動", controller.manager.filepath, exc_info=True)
+        if changes:
+            self.external_changes_applied.emit(changes)
+        return changes
+
+    def stop(self):
+        self._poll.stop()
+        self._debounce.stop()
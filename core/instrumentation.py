@@ -0,0 +1,106 @@
+"""
+新增檔案：排班引擎量測工具 (Instrumentation)
+提供低負擔的階段計時器與計數器，以及可選的 cProfile / tracemalloc 剖析。
+逐條規則的檢查次數 ("counters") 只在需要時才統計，平常不增加排班迴圈的負擔。
+這些功能可用環境變數 AUTO_SCHEDULE_PROFILE (例如 "counters,cprofile") 或命令列參數開啟。
+"""
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Set
+
+PROFILE_ENV_VAR = "AUTO_SCHEDULE_PROFILE"
+PROFILE_MODES = ("counters", "cprofile", "tracemalloc")
+
+
+def profile_modes_from_env() -> Set[str]:
+    """從環境變數讀取要開啟的剖析模式"""
+    value = os.environ.get(PROFILE_ENV_VAR, "")
+    return parse_profile_modes(value.split(","))
+
+
+def parse_profile_modes(modes: Iterable[str]) -> Set[str]:
+    """正規化剖析模式名稱；"all" 代表全部開啟，未知名稱會被忽略"""
+    result = set()
+    for mode in modes:
+        mode = mode.strip().lower()
+        if mode == "all":
+            result.update(PROFILE_MODES)
+        elif mode in PROFILE_MODES:
+            result.add(mode)
+    return result
+
+
+@dataclass
+class SchedulerStats:
+    """
+    一次排班的量測結果，會跟班表一起回傳。
+    - phase_seconds: 各階段耗時
+    - counters: 填入的格子、無解格子 (dead end)、工時補足次數等；
+      開啟 "counters" 模式時另外統計實際評估的候選班別與規則檢查次數
+    - rule_checks: 依規則類型統計實際執行的檢查次數 ("counters" 模式)，用來找出「是哪一種規則拖慢了」
+    """
+    phase_seconds: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    counters: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    rule_checks: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    profile_text: Optional[str] = None
+    peak_memory_kib: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """計時一個階段；同名階段會累加"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[name] += time.perf_counter() - start
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.phase_seconds.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            "phase_seconds": dict(self.phase_seconds),
+            "counters": dict(self.counters),
+            "rule_checks": dict(self.rule_checks),
+            "peak_memory_kib": self.peak_memory_kib,
+        }
+
+    def summary(self) -> str:
+        """一行式摘要，方便直接印出"""
+        phases = ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in self.phase_seconds.items())
+        counters = ", ".join(f"{name}={value}" for name, value in self.counters.items())
+        text = f"總計 {self.total_seconds * 1000:.1f}ms [{phases}] {counters}"
+        if self.peak_memory_kib is not None:
+            text += f" 記憶體峰值 {self.peak_memory_kib:.0f} KiB"
+        return text
+
+
+@contextmanager
+def capture_profile(stats: SchedulerStats, modes: Set[str], top: int = 25):
+    """依照 modes 開啟 cProfile / tracemalloc，結束時把結果寫入 stats"""
+    profiler = cProfile.Profile() if "cprofile" in modes else None
+    started_tracemalloc = "tracemalloc" in modes and not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            buffer = io.StringIO()
+            pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(top)
+            stats.profile_text = buffer.getvalue()
+        if "tracemalloc" in modes and tracemalloc.is_tracing():
+            stats.peak_memory_kib = tracemalloc.get_traced_memory()[1] / 1024
+            if started_tracemalloc:
+                tracemalloc.stop()
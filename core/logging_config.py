@@ -0,0 +1,84 @@
+"""
+新增檔案：日誌設定 (Logging Configuration)
+統一設定整個應用程式的 logging：全域等級、各模組等級，以及可選的 JSON 輸出格式。
+各模組只需要 `logger = logging.getLogger(__name__)`，訊息一律使用延遲格式化 (%s)，
+未開啟的等級不會產生任何字串格式化成本。
+
+環境變數:
+    AUTO_SCHEDULE_LOG_LEVEL   全域等級，例如 INFO、DEBUG (預設 INFO)
+    AUTO_SCHEDULE_LOG_LEVELS  各模組等級，例如 "core.scheduler=DEBUG,gui=WARNING"
+    AUTO_SCHEDULE_LOG_JSON    設為 1 時改用 JSON 格式輸出
+"""
+import json
+import logging
+import os
+import sys
+from typing import Dict, Optional
+
+LOG_LEVEL_ENV_VAR = "AUTO_SCHEDULE_LOG_LEVEL"
+LOG_LEVELS_ENV_VAR = "AUTO_SCHEDULE_LOG_LEVELS"
+LOG_JSON_ENV_VAR = "AUTO_SCHEDULE_LOG_JSON"
+
+# LogRecord 的內建屬性；不在這裡面的屬性就是呼叫端用 extra= 傳進來的欄位
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    每筆日誌輸出成一行 JSON。
+    除了基本欄位，還包含自程式啟動以來的毫秒數 (elapsed_ms)，
+    以及呼叫端用 extra= 附加的欄位 (例如 duration_ms)。
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "elapsed_ms": round(record.relativeCreated, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def parse_module_levels(text: str) -> Dict[str, str]:
+    """解析 "core.scheduler=DEBUG,gui=WARNING" 這種格式"""
+    levels = {}
+    for item in text.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: Optional[str] = None, json_output: Optional[bool] = None,
+                      module_levels: Optional[Dict[str, str]] = None, stream=None):
+    """
+    設定根 logger。未指定的參數會從環境變數讀取。
+    可重複呼叫：每次呼叫都會取代先前由本函式安裝的 handler。
+    """
+    level = (level or os.environ.get(LOG_LEVEL_ENV_VAR) or "INFO").upper()
+    if json_output is None:
+        json_output = os.environ.get(LOG_JSON_ENV_VAR, "") not in ("", "0", "false")
+    levels = parse_module_levels(os.environ.get(LOG_LEVELS_ENV_VAR, ""))
+    levels.update(module_levels or {})
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler._auto_schedule = True
+    if json_output:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s", "%H:%M:%S"))
+
+    root = logging.getLogger()
+    for old in [h for h in root.handlers if getattr(h, "_auto_schedule", False)]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    for name, module_level in levels.items():
+        logging.getLogger(name).setLevel(module_level)
@@ -1,27 +1,56 @@
 """
 核心資料模型 (Core Data Models)
 定義專案中所有核心物件的結構，例如：員工、班別、規則。
+所有模型都使用 __slots__，不為每個實例配置 __dict__；
+ID、級別、規則類型與規則參數中的字串會被 intern，大量資料中重複的字串只保留一份，比對時也只需比較指標。
+建立物件與之後用 update() 修改欄位都會經過同一個 intern 流程。
 """
+import sys
 import uuid
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import Any, Dict
 
-@dataclass
+
+def intern_value(value: Any) -> Any:
+    """把 (巢狀) 參數中的字串 intern；dict/list 會複製一份，其餘型別原樣回傳"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, dict):
+        return {intern_value(key): intern_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [intern_value(item) for item in value]
+    return value
+
+
+@dataclass(slots=True)
 class Employee:
     """定義一位員工的資料模型"""
     name: str
     level: str  # e.g., "吧檯手", "門職人員"
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
-@dataclass
+    def __post_init__(self):
+        self._intern()
+
+    def _intern(self):
+        self.id = sys.intern(self.id)
+        self.level = sys.intern(self.level)
+
+    def update(self, **changes):
+        """就地修改欄位 (其他地方持有的參照仍然有效)，字串與建構時一樣會被 intern"""
+        for name, value in changes.items():
+            setattr(self, name, value)
+        self._intern()
+
+@dataclass(slots=True, frozen=True)
 class Shift:
-    """定義一個班別的資料模型"""
+    """定義一個班別的資料模型 (班別表是固定的，因此不可變更)"""
     name: str
     start_time: str
     end_time: str
     color: str # 用於在 GUI 中顯示的顏色
 
-@dataclass
+@dataclass(slots=True)
 class Rule:
     """
     定義一條排班規則的資料模型
@@ -32,3 +61,16 @@ class Rule:
     params: Dict   # 規則的具體參數, e.g., {"hours": 40, "level": "吧檯手"}
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
+    def __post_init__(self):
+        self._intern()
+
+    def _intern(self):
+        self.id = sys.intern(self.id)
+        self.rule_type = sys.intern(self.rule_type)
+        self.params = intern_value(self.params)
+
+    def update(self, **changes):
+        """就地修改欄位 (其他地方持有的參照仍然有效)，字串與建構時一樣會被 intern"""
+        for name, value in changes.items():
+            setattr(self, name, value)
+        self._intern()
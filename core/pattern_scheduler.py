@@ -0,0 +1,387 @@
+"""
+新增檔案：週班型排班引擎 (Weekly Pattern Scheduler)
+預設引擎逐格 (員工, 日期) 填班，週休、晚接早、每週工時都只是「碰巧」形成的結果。
+這個引擎改以「一週的班型」為單位：先把班別分成早 (E)、日 (D)、晚 (L)、休 (R) 四類，
+適用晚接早規則的員工以規則本身分類 (規則列出的晚班為 L、指定的早班為 E)，其他人依上班時間分類；
+為每一種員工類別 (可上的班別類型 + 適用的晚接早規則) 預先列舉所有合法的 7 天班型並快取，
+排班時每位員工每週只需從班型庫挑一個「覆蓋與工時最好」的班型，再把每天的類型落實成具體班別。
+
+班型本身就滿足休假天數、連續上班上限與晚班隔天只能早班或休息，
+搜尋空間從每格 9 種班別的組合縮小為數百個班型。
+"""
+import datetime
+import functools
+import logging
+import operator
+from calendar import monthrange
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from .feasibility import FLOAT_AWAY_SHIFT, REST_SHIFTS
+from .models import Shift
+from .scheduler import MAX_CONSECUTIVE_WORK_DAYS, SHIFTS, Scheduler
+
+logger = logging.getLogger(__name__)
+
+EARLY, DAY, LATE, REST = "E", "D", "L", "R"
+FLEX = "W"  # 班型中的「早班或日班皆可」，落實時依當天的覆蓋情形決定
+SYMBOLS = (FLEX, EARLY, LATE, REST)
+_SYMBOL_INDEX = {symbol: i for i, symbol in enumerate(SYMBOLS)}
+
+MIN_REST_DAYS = 1   # 每 7 日至少 1 日例假
+MAX_REST_DAYS = 2   # 一例一休
+DEFAULT_WORK_DAYS = 5
+
+# 評分權重
+_IMPOSSIBLE = 1e6          # 當天無法上這類班 (級別、可上班時段、指定班別)
+_SHORTFALL_WEIGHT = 1.0    # 每週工時每少 1 小時
+_EXCESS_WEIGHT = 0.25      # 每週工時每多 1 小時
+_PREFERENCE_BONUS = 0.5    # 班別偏好
+_HINT_BONUS = 50.0         # 沿用既有班別 (增量重排)：只要仍合法就幾乎一定沿用
+
+
+def shift_category(shift: Shift) -> str:
+    """依上班時間分類：10 點前為早班、13 點 (含) 後為晚班、其餘為日班；沒有時間的是休假"""
+    if not shift.start_time:
+        return REST
+    hour = int(shift.start_time.split(":")[0])
+    if hour < 10:
+        return EARLY
+    if hour >= 13:
+        return LATE
+    return DAY
+
+
+SHIFT_CATEGORIES: Dict[str, str] = {shift.name: shift_category(shift) for shift in SHIFTS}
+
+LateRules = FrozenSet[Tuple[FrozenSet[str], str]]  # 晚接早規則: {(晚班集合, 隔天的早班), ...}
+
+
+def employee_shift_categories(shift_names, late_rules: LateRules) -> Dict[str, str]:
+    """
+    依員工適用的晚接早規則分類班別：任一條規則列出的晚班為 L；
+    所有規則都接受的早班才是 E (晚班隔天能上的只有它)；其餘的班別一律為 D。
+    沒有晚接早規則時依上班時間分類。
+    """
+    if not late_rules:
+        return {name: SHIFT_CATEGORIES[name] for name in shift_names}
+    late = frozenset().union(*(late_shifts for late_shifts, _ in late_rules))
+    early = {early_shift for _, early_shift in late_rules}
+    categories = {}
+    for name in shift_names:
+        if name in late:
+            categories[name] = LATE
+        elif len(early) == 1 and name in early:
+            categories[name] = EARLY
+        else:
+            categories[name] = DAY
+    return categories
+
+
+@dataclass(slots=True, frozen=True)
+class WeekPattern:
+    """一個合法的班型"""
+    symbols: Tuple[str, ...]
+    work_days: int
+    leading_run: int   # 開頭連續上班天數 (銜接上一週用)
+
+
+class PatternLibrary:
+    """
+    某一員工類別的班型庫。
+    每個班型預先轉成 (天 * 4 + 符號) 的查表索引，評分時以 itemgetter 一次取出 7 天的成本相加。
+    """
+    def __init__(self, patterns: List[WeekPattern]):
+        self.patterns = tuple(patterns)
+        self.work_days = [pattern.work_days for pattern in patterns]
+        self.leading_runs = [pattern.leading_run for pattern in patterns]
+        self.indexes = [tuple(day * 4 + _SYMBOL_INDEX[symbol] for day, symbol in enumerate(pattern.symbols))
+                        for pattern in patterns]
+        self.getters = [operator.itemgetter(*indexes) if len(indexes) > 1
+                        else (lambda costs, get=operator.itemgetter(*indexes): (get(costs),))
+                        for indexes in self.indexes]
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def scores(self, costs: List[float], hour_penalty: List[float], max_leading_run: int) -> List[float]:
+        """每個班型的總成本 = 每天的類型成本 + 工時偏差 (+ 與上一週接起來超過連續上班上限的懲罰)"""
+        if len(costs) == 28:
+            # 完整一週是最常見的情況，直接展開 7 天的索引相加 (比 itemgetter + sum 快一倍)
+            c = costs
+            totals = [c[d0] + c[d1] + c[d2] + c[d3] + c[d4] + c[d5] + c[d6] + hour_penalty[work_days]
+                      for (d0, d1, d2, d3, d4, d5, d6), work_days in zip(self.indexes, self.work_days)]
+        else:
+            totals = [sum(getter(costs)) + hour_penalty[work_days]
+                      for getter, work_days in zip(self.getters, self.work_days)]
+        if max_leading_run < len(costs) // 4:
+            for i, run in enumerate(self.leading_runs):
+                if run > max_leading_run:
+                    totals[i] += _IMPOSSIBLE
+        return totals
+
+
+@functools.lru_cache(maxsize=None)
+def weekly_patterns(categories: FrozenSet[str], late_rules: LateRules = frozenset(), length: int = 7,
+                    max_rest: int = MAX_REST_DAYS) -> PatternLibrary:
+    """
+    列舉某一員工類別所有合法的班型 (結果會快取，同類別的員工共用)。
+    categories: 該類別可上的班別類型 (E/D/L，見 employee_shift_categories)；
+    late_rules: 適用的晚接早規則，有規則時晚班隔天只能上早班或休息。
+    length < 7 用於區間最後不足一週的部分，此時不要求最少休假天數 (由跨週的連續上班上限把關)。
+    max_rest: 當週有被指定的休假時放寬休假天數上限。
+    """
+    flex_ok = EARLY in categories or DAY in categories
+    min_rest = MIN_REST_DAYS if length == 7 else 0
+    patterns = []
+
+    def extend(prefix: List[str], rest_days: int, run: int):
+        if len(prefix) == length:
+            if rest_days >= min_rest:
+                leading = next((i for i, symbol in enumerate(prefix) if symbol == REST), length)
+                patterns.append(WeekPattern(tuple(prefix), length - rest_days, leading))
+            return
+        if late_rules and prefix and prefix[-1] == LATE:
+            options = [EARLY] if EARLY in categories else []
+        else:
+            options = ([FLEX] if flex_ok else []) + ([LATE] if LATE in categories else [])
+        if run < MAX_CONSECUTIVE_WORK_DAYS:
+            for symbol in options:
+                extend(prefix + [symbol], rest_days, run + 1)
+        if rest_days < max_rest:
+            extend(prefix + [REST], rest_days + 1, 0)
+
+    extend([], 0, 0)
+    logger.debug("班型庫 %s (晚接早=%s, %d 天, 最多休 %d 天): %d 個班型",
+                 sorted(categories), bool(late_rules), length, max_rest, len(patterns))
+    return PatternLibrary(patterns)
+
+
+@dataclass
+class _EmployeeProfile:
+    """一位員工排班時不變的資料"""
+    forbidden_mask: int                 # 級別限制不可上的班別
+    shift_categories: Dict[str, str]    # 可上的班別 -> 類型 (依這位員工的晚接早規則)
+    categories: FrozenSet[str]
+    category_shifts: Dict[str, Tuple[str, ...]]
+    category_bits: Dict[str, int]
+    late_rules: LateRules
+    late_shifts: FrozenSet[str]         # 任一條晚接早規則列出的晚班
+    avg_hours: float
+    monthly_target: Optional[float]
+
+
+class PatternScheduler(Scheduler):
+    """以週班型為單位排班的引擎；硬規則、工時補足與輸出格式都沿用 Scheduler"""
+    engine = "pattern"
+    counter_names = Scheduler.counter_names + ("pattern_weeks", "patterns_scored", "pattern_fallbacks")
+
+    def _profile(self, emp_id: str) -> _EmployeeProfile:
+        employee = self.all_employees[emp_id]
+        rules = self._get_employee_rules(emp_id)
+        bits = self.availability.bits
+        forbidden = 0
+        late_rules = set()
+        targets = []
+        for rule in rules:
+            if rule.rule_type == "REQUIRED_LEVEL_FOR_SHIFT" and employee.level != rule.params.get("level"):
+                forbidden |= bits.get(rule.params.get("shift_name"), 0)
+            elif rule.rule_type == "LATE_SHIFT_THEN_EARLY_SHIFT":
+                late_rules.add((frozenset(rule.params.get("late_shifts", [])), rule.params.get("early_shift")))
+            elif rule.rule_type == "MIN_MONTHLY_HOURS":
+                targets.append(rule.params.get("hours", 0))
+        usable = [s for s in self.work_shifts if not forbidden & bits[s.name]]
+        late_rules = frozenset(late_rules)
+        shift_categories = employee_shift_categories([s.name for s in usable], late_rules)
+        category_shifts = {category: tuple(name for name, c in shift_categories.items() if c == category)
+                           for category in (EARLY, DAY, LATE)}
+        return _EmployeeProfile(
+            forbidden_mask=forbidden,
+            shift_categories=shift_categories,
+            categories=frozenset(shift_categories.values()),
+            category_shifts=category_shifts,
+            category_bits={category: self.availability.shift_mask(names)
+                           for category, names in category_shifts.items()},
+            late_rules=late_rules,
+            late_shifts=frozenset().union(*(late_shifts for late_shifts, _ in late_rules)),
+            avg_hours=sum(self.shift_durations[s.name] for s in usable) / len(usable) if usable else 0,
+            monthly_target=max(targets) if targets else None,
+        )
+
+    def _fill_schedule(self, schedule, dates, employee_ids, carry_over):
+        """逐週、逐人挑選班型並落實成具體班別"""
+        counters = self.stats.counters
+        self._rest_weight = len(self.work_shifts) * MAX_REST_DAYS / DEFAULT_WORK_DAYS
+
+        # 每天各班別的人數 (含硬規則排定的格子)；類型的人數依各員工自己的分類加總
+        self._shift_cover = {day: defaultdict(int) for day in dates}
+        for emp_id in employee_ids:
+            for day in dates:
+                if schedule[emp_id][day] is not None:
+                    self._count(day, schedule[emp_id][day])
+
+        profiles = {emp_id: self._profile(emp_id) for emp_id in employee_ids}
+        continuing = carry_over.end_date == dates[0] - datetime.timedelta(days=1)
+        trailing = {emp_id: carry_over.streaks.get(emp_id, 0) if continuing else 0 for emp_id in employee_ids}
+
+        for start in range(0, len(dates), 7):
+            week = dates[start:start + 7]
+            order = list(employee_ids)
+            self.rng.shuffle(order)
+            for emp_id in order:
+                profile = profiles[emp_id]
+                pattern = self._select_pattern(emp_id, profile, week, schedule, carry_over, trailing[emp_id])
+                self._apply_pattern(emp_id, profile, pattern, week, schedule, carry_over)
+                counters["pattern_weeks"] += 1
+
+                run = 0
+                for day in reversed(week):
+                    if schedule[emp_id][day] in self.work_day_shifts:
+                        run += 1
+                    else:
+                        break
+                trailing[emp_id] = run + trailing[emp_id] if run == len(week) else run
+
+    def _count(self, day, shift_name: str, delta: int = 1):
+        self._shift_cover[day][shift_name] += delta
+
+    def _category_load(self, day, profile: _EmployeeProfile, category: str) -> float:
+        """當天這一類型 (依這位員工的分類) 已排的人數，除以類型中的班別數"""
+        counts = self._shift_cover[day]
+        if category == REST:
+            return sum(counts[name] for name in REST_SHIFTS) / self._rest_weight
+        names = profile.category_shifts[category]
+        return sum(counts[name] for name in names) / max(1, len(names))
+
+    def _select_pattern(self, emp_id, profile: _EmployeeProfile, week, schedule, carry_over, trailing) -> Optional[WeekPattern]:
+        """為一位員工的一週挑出成本最低的班型"""
+        counters = self.stats.counters
+        hints = self.hints.get(emp_id, {}) if self.hints else {}
+        costs = []
+        for offset, day in enumerate(week):
+            pinned = schedule[emp_id][day]
+            if pinned == FLOAT_AWAY_SHIFT:
+                # 人在他店上班：班型中這天必須是上班 (連續上班與每週休假才會算對)，但不計本店工時
+                category_costs = {EARLY: 0, DAY: 0, LATE: 0, REST: _IMPOSSIBLE}
+            elif pinned is not None:
+                pinned_category = REST if pinned in REST_SHIFTS else profile.shift_categories.get(pinned)
+                category_costs = {category: 0 if pinned_category in (None, category) else _IMPOSSIBLE
+                                  for category in (EARLY, DAY, LATE, REST)}
+            else:
+                allowed = self.availability.allowed_mask(emp_id, day) & ~profile.forbidden_mask
+                preferred = self.availability.preferred_mask(emp_id, day)
+                hinted = profile.shift_categories.get(hints.get(day))
+                category_costs = {}
+                for category in (EARLY, DAY, LATE, REST):
+                    if category != REST and not allowed & profile.category_bits[category]:
+                        category_costs[category] = _IMPOSSIBLE
+                        continue
+                    cost = self._category_load(day, profile, category)
+                    if category != REST and preferred & profile.category_bits[category]:
+                        cost -= _PREFERENCE_BONUS
+                    if category == hinted:
+                        cost -= _HINT_BONUS
+                    category_costs[category] = cost
+            if offset == 0 and profile.late_rules:
+                previous = self._get_previous_shift(emp_id, day, schedule, carry_over)
+                if previous in profile.late_shifts:
+                    category_costs[DAY] = category_costs[LATE] = _IMPOSSIBLE
+            costs.extend((min(category_costs[EARLY], category_costs[DAY]), category_costs[EARLY],
+                          category_costs[LATE], category_costs[REST]))
+
+        # 工時：以可上班別的平均時數估算，目標按本週由本店負責的天數 (扣除跨店支援) 由每月目標折算
+        days_in_month = monthrange(week[0].year, week[0].month)[1]
+        away = sum(1 for day in week if schedule[emp_id][day] == FLOAT_AWAY_SHIFT)
+        owned = len(week) - away
+        if profile.monthly_target is not None:
+            target = profile.monthly_target * owned / days_in_month
+        else:
+            target = profile.avg_hours * DEFAULT_WORK_DAYS * owned / 7
+        hour_penalty = [max(0.0, target - max(0, n - away) * profile.avg_hours) * _SHORTFALL_WEIGHT +
+                        max(0.0, max(0, n - away) * profile.avg_hours - target) * _EXCESS_WEIGHT
+                        for n in range(len(week) + 1)]
+
+        # 被指定的休假會佔掉休假天數，多留一天給銜接上一週所需的休息
+        pinned_rest = sum(1 for day in week if schedule[emp_id][day] in REST_SHIFTS)
+        max_rest = min(len(week), max(MAX_REST_DAYS, pinned_rest + 1)) if pinned_rest else MAX_REST_DAYS
+        library = weekly_patterns(profile.categories, profile.late_rules, len(week), max_rest)
+        if not len(library):
+            return None
+        counters["patterns_scored"] += len(library)
+        scores = library.scores(costs, hour_penalty, MAX_CONSECUTIVE_WORK_DAYS - trailing)
+        best = min(scores)
+        # 同分的班型隨機挑一個，避免每個人都排成同一種
+        return library.patterns[self.rng.choice([i for i, score in enumerate(scores) if score == best])]
+
+    def _apply_pattern(self, emp_id, profile: _EmployeeProfile, pattern: Optional[WeekPattern], week, schedule, carry_over):
+        """把班型的每一天落實成具體班別 (硬規則排定的格子保持不變)"""
+        counters = self.stats.counters
+        employee = self.all_employees[emp_id]
+        rules = self._get_employee_rules(emp_id)
+        hints = self.hints.get(emp_id, {}) if self.hints else {}
+        for offset, day in enumerate(week):
+            if schedule[emp_id][day] is not None:
+                continue
+            counters["cells_filled"] += 1
+            symbol = pattern.symbols[offset] if pattern is not None else REST
+            if symbol == REST:
+                schedule[emp_id][day] = "休"
+                self._count(day, "休")
+                continue
+
+            previous_shift = self._get_previous_shift(emp_id, day, schedule, carry_over)
+            late_count = self._shift_cover[day]["13-21.5"]
+            valid_shifts = self._get_valid_shifts_for_employee_on_day(employee, day, previous_shift, rules, late_count)
+            if symbol == FLEX:
+                wanted = sorted((EARLY, DAY), key=lambda category: self._category_load(day, profile, category))
+                if previous_shift in profile.late_shifts:
+                    wanted = [EARLY, DAY]  # 前一天是晚班 (例如指定的班別)，優先落實成早班
+                hinted = profile.shift_categories.get(hints.get(day))
+                if hinted in wanted:
+                    wanted.sort(key=lambda category: category != hinted)
+            else:
+                wanted = [symbol]
+            candidates = []
+            for category in wanted:
+                candidates = [s for s in valid_shifts if profile.shift_categories.get(s.name) == category
+                              and not self._breaks_interdependence(day, s.name)]
+                if candidates:
+                    break
+            if not candidates:
+                # 班型中的這一天實際上排不了 (例如班別連動已滿)，改為休息，交給工時補足處理
+                counters["pattern_fallbacks"] += 1
+                schedule[emp_id][day] = "休"
+                self._count(day, "休")
+                continue
+
+            chosen = self._pick_shift(emp_id, profile, day, previous_shift, candidates, hints.get(day))
+            schedule[emp_id][day] = chosen.name
+            self._count(day, chosen.name)
+
+    def _breaks_interdependence(self, day, shift_name: str) -> bool:
+        """規則 6: 新增一位 13-21.5 不可讓當天已排的 10.5-20.5 變成違規"""
+        counts = self._shift_cover[day]
+        return shift_name == "13-21.5" and counts["13-21.5"] + 1 >= 2 and counts["10.5-20.5"] > 0
+
+    def _pick_shift(self, emp_id, profile: _EmployeeProfile, day, previous_shift, candidates, hint) -> Shift:
+        """
+        同一類型中挑具體班別：沿用提示 > 晚接早 > 班別偏好 > 當天人數最少的班別。
+        會觸發晚接早的班別都歸在晚班 (L)，班型已保證隔天是早班或休息，這裡不必再避開。
+        """
+        if hint:
+            hinted = next((s for s in candidates if s.name == hint), None)
+            if hinted is not None:
+                return hinted
+        for late_shifts, early_shift in profile.late_rules:
+            if previous_shift in late_shifts:
+                early = next((s for s in candidates if s.name == early_shift), None)
+                if early is not None:
+                    return early
+        preferred_mask = self.availability.preferred_mask(emp_id, day)
+        if preferred_mask:
+            preferred = [s for s in candidates if preferred_mask & self.availability.bits[s.name]]
+            candidates = preferred or candidates
+        counts = self._shift_cover[day]
+        fewest = min(counts[s.name] for s in candidates)
+        return self.rng.choice([s for s in candidates if counts[s.name] == fewest])
@@ -0,0 +1,106 @@
+"""
+新增檔案：排班重現 (Reproducible Replay)
+排班引擎以 record_replay=True 建立時，每次排班都會附上一份「重現紀錄」：
+亂數種子、日期區間、邊界狀態，以及輸入資料與結果的雜湊值。
+之後只要拿同樣的輸入與這份紀錄，就能一模一樣地重新產生班表，並驗證結果完全相同。
+"""
+import datetime
+import hashlib
+import json
+from dataclasses import asdict
+from typing import Dict, Optional
+
+
+class ReplayMismatchError(Exception):
+    """重現時輸入資料或產生的結果與紀錄不符"""
+
+
+def _digest(payload) -> str:
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hints_to_dict(hints: Dict) -> Dict[str, Dict[str, str]]:
+    """把沿用提示 {員工 ID: {日期: 班別}} 轉成可序列化的 {員工 ID: {"YYYY-MM-DD": 班別}}"""
+    return {emp_id: {day.isoformat(): shift_name for day, shift_name in days.items()}
+            for emp_id, days in hints.items()}
+
+
+def hints_from_dict(data: Optional[Dict]) -> Dict:
+    return {emp_id: {datetime.date.fromisoformat(day): shift_name for day, shift_name in days.items()}
+            for emp_id, days in (data or {}).items()}
+
+
+def input_fingerprint(scheduler) -> str:
+    """排班輸入 (員工、規則、指派、班別表，以及有設定時的沿用提示) 的雜湊值"""
+    from .scheduler import SHIFTS
+    payload = {
+        "employees": [asdict(emp) for emp in scheduler.all_employees.values()],
+        "rules": [asdict(rule) for rule in scheduler.all_rules.values()],
+        "assignments": scheduler.assignments,
+        "shifts": [asdict(shift) for shift in SHIFTS],
+    }
+    if scheduler.hints:
+        payload["hints"] = hints_to_dict(scheduler.hints)
+    return _digest(payload)
+
+
+def result_digest(result: Dict) -> str:
+    """排班結果 (表頭與每一格) 的雜湊值"""
+    return _digest({"headers": result["headers"], "data": result["data"]})
+
+
+def make_record(scheduler, start_date: datetime.date, end_date: datetime.date,
+                carry_over, result: Dict, fingerprint: Optional[str] = None) -> Dict:
+    """建立一份可序列化成 JSON 的重現紀錄；fingerprint 為事先算好的輸入雜湊 (可省略)"""
+    record = {
+        "engine": scheduler.engine,
+        "seed": scheduler.seed,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "carry_over": carry_over_to_dict(carry_over),
+        "input_fingerprint": fingerprint if fingerprint is not None else input_fingerprint(scheduler),
+        "result_digest": result_digest(result),
+    }
+    if scheduler.hints:
+        record["hints"] = hints_to_dict(scheduler.hints)
+    return record
+
+
+def carry_over_to_dict(carry_over) -> Optional[Dict]:
+    if carry_over is None or carry_over.end_date is None:
+        return None
+    data = asdict(carry_over)
+    data["end_date"] = carry_over.end_date.isoformat()
+    return data
+
+
+def carry_over_from_dict(data: Optional[Dict]):
+    from .scheduler import CarryOverState
+    if not data:
+        return None
+    data = dict(data)
+    data["end_date"] = datetime.date.fromisoformat(data["end_date"])
+    return CarryOverState(**data)
+
+
+def replay(record: Dict, emp_controller, rule_controller, assignments, verify: bool = True) -> Dict:
+    """
+    依照重現紀錄重新產生班表。
+    verify=True 時，若輸入資料已變動或結果與紀錄不同，會拋出 ReplayMismatchError。
+    """
+    from .scheduler import get_scheduler_class
+    scheduler_cls = get_scheduler_class(record.get("engine"))
+    scheduler = scheduler_cls(emp_controller, rule_controller, assignments, seed=record["seed"])
+    scheduler.hints = hints_from_dict(record.get("hints"))
+    if verify and input_fingerprint(scheduler) != record["input_fingerprint"]:
+        raise ReplayMismatchError("排班輸入資料與紀錄不同，無法完整重現")
+
+    result = scheduler.generate_range(
+        datetime.date.fromisoformat(record["start_date"]),
+        datetime.date.fromisoformat(record["end_date"]),
+        carry_over_from_dict(record.get("carry_over")),
+    )
+    if verify and result_digest(result) != record["result_digest"]:
+        raise ReplayMismatchError("重新產生的班表與紀錄不同")
+    return result
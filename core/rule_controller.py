@@ -2,11 +2,17 @@
 新增檔案：規則控制器 (Rule Controller)
 專門處理所有「排班規則」的商業 logique 中心。
 """
-from typing import List, Optional, Dict
+import logging
+from dataclasses import asdict
+from typing import Iterable, List, Optional, Dict
 # --- 修正點 1: 匯入 PyQt 的信號機制 ---
 from PyQt6.QtCore import QObject, pyqtSignal
 from .models import Rule
-from .data_manager import DataManager
+from .data_manager import SAVE_ATTEMPTS, ConcurrentModificationError, DataManager
+from .rule_engine import get_rule_display_text
+from .rule_index import RuleSearchIndex
+
+logger = logging.getLogger(__name__)
 
 # --- 修正點 2: 讓 Controller 繼承 QObject 才能使用信號 ---
 class RuleController(QObject):
@@ -15,61 +21,171 @@ class RuleController(QObject):
     """
     # --- 修正點 3: 定義一個信號，當規則庫有變動時發出 ---
     rules_changed = pyqtSignal()
+    # 細粒度信號：只帶有變動的規則 ID，讓畫面只更新受影響的那一列
+    rule_added = pyqtSignal(str)
+    rule_updated = pyqtSignal(str)
+    rule_removed = pyqtSignal(str)
 
     def __init__(self, data_path: str = "data/rules_library.json"):
         super().__init__() # <-- QObject 的初始化
-        print(f"\n--- 正在初始化 RuleController ---")
-        print(f"  - 目標資料檔案: '{data_path}'")
         self.manager = DataManager(data_path)
         self.rules: List[Rule] = self._load_rules()
-        print(f"  - 從檔案成功載入 {len(self.rules)} 條規則。")
-        print(f"--- RuleController 初始化完畢 ---")
+        self._rules_by_id: Dict[str, Rule] = {rule.id: rule for rule in self.rules}
+        # 每條規則的版本號，每次更新 +1；顯示文字依版本快取
+        self._versions: Dict[str, int] = {}
+        self._display_cache: Dict[str, tuple] = {}
+        self.search_index = RuleSearchIndex(self.rules)
+        logger.debug("RuleController 已從 '%s' 載入 %d 條規則", data_path, len(self.rules))
 
     def _load_rules(self) -> List[Rule]:
         data = self.manager.load_data()
         return [Rule(**rule_data) for rule_data in data]
 
-    def _save_rules_and_notify(self):
+    def _save_rules_and_notify(self, signal=None, rule_id: str = None, is_new: bool = False) -> bool:
         """
         一個新的內部函式，負責存檔並發出變更信號。
+        若規則庫已被其他人修改，先合併對方的變動 (本次操作的規則保留本機版本) 再重存；
+        本機修改的規則若已被其他人刪除，捨棄本機的修改並回傳 False。
+        連續 SAVE_ATTEMPTS 次都被搶先存檔時，放棄本機這次的變動 (與檔案同步) 並拋出 ConcurrentModificationError。
         """
-        data_to_save = [rule.__dict__ for rule in self.rules]
-        self.manager.save_data(data_to_save)
+        existed = rule_id in self._rules_by_id
+        for _ in range(SAVE_ATTEMPTS):
+            try:
+                self.manager.save_data([asdict(rule) for rule in self.rules])
+                break
+            except ConcurrentModificationError:
+                logger.info("規則庫已被其他人修改，合併後重新存檔")
+                self._apply_records(self.manager.load_data(), keep_ids=(rule_id,),
+                                    new_ids=(rule_id,) if is_new else ())
+        else:
+            self._apply_records(self.manager.load_data())
+            raise ConcurrentModificationError(f"規則庫持續被其他人修改，已放棄本次變更 ({SAVE_ATTEMPTS} 次重試)")
+        if existed and rule_id not in self._rules_by_id:
+            return False
         # --- 修正點 4: 在每次存檔後，發射信號通知所有監聽者 ---
+        if signal is not None:
+            signal.emit(rule_id)
         self.rules_changed.emit()
+        return True
+
+    def _apply_records(self, records: List[Dict], keep_ids: Iterable[str] = (),
+                       new_ids: Iterable[str] = ()) -> int:
+        """
+        依 ID 把檔案上的規則合併進規則庫，同步更新索引、版本號與顯示快取，
+        只對真正變動的規則發出細粒度信號 (最後再發一次 rules_changed)。
+        既有的 Rule 物件透過 update() 就地更新 (與載入時一樣 intern)。
+        keep_ids 的規則保留本機版本；其中檔案上已不存在的，只有在 new_ids 中 (本機剛新增) 才保留。
+        回傳變動的筆數。
+        """
+        keep_ids, new_ids = set(keep_ids), set(new_ids)
+        remote_ids = {data["id"] for data in records}
+        merged, added, updated = [], [], []
+        for data in records:
+            rule = self._rules_by_id.get(data["id"])
+            if data["id"] in keep_ids:
+                if rule is not None:
+                    merged.append(rule)
+            elif rule is None:
+                rule = Rule(**data)
+                merged.append(rule)
+                added.append(rule)
+            else:
+                if rule != Rule(**data):
+                    rule.update(**data)
+                    updated.append(rule)
+                merged.append(rule)
+        merged.extend(rule for rule in self.rules if rule.id in new_ids and rule.id not in remote_ids)
+        merged_ids = {rule.id for rule in merged}
+        removed = [rule.id for rule in self.rules if rule.id not in merged_ids]
+        self.rules[:] = merged
+
+        for rule_id in removed:
+            del self._rules_by_id[rule_id]
+            self.search_index.remove(rule_id)
+            self._versions.pop(rule_id, None)
+            self._display_cache.pop(rule_id, None)
+        for rule in updated:
+            self._versions[rule.id] = self._versions.get(rule.id, 0) + 1
+            self.search_index.update(rule)
+        for rule in added:
+            self._rules_by_id[rule.id] = rule
+            self.search_index.add(rule)
+
+        for rule_id in removed:
+            self.rule_removed.emit(rule_id)
+        for rule in updated:
+            self.rule_updated.emit(rule.id)
+        for rule in added:
+            self.rule_added.emit(rule.id)
+        changes = len(removed) + len(updated) + len(added)
+        if changes:
+            self.rules_changed.emit()
+        return changes
+
+    def reload_if_changed(self) -> int:
+        """檔案被其他人修改時，增量合併對方的變動；平時只花一次 stat。回傳變動的筆數"""
+        if not self.manager.has_changed():
+            return 0
+        changes = self._apply_records(self.manager.load_data())
+        logger.debug("規則庫已被外部修改，合併了 %d 筆變動", changes)
+        return changes
 
     def add_rule(self, name: str, rule_type: str, params: Dict) -> Rule:
         new_rule = Rule(name=name, rule_type=rule_type, params=params)
         self.rules.append(new_rule)
-        self._save_rules_and_notify() # 使用新函式
-        print(f"  ✅ 已新增規則: {name}")
+        self._rules_by_id[new_rule.id] = new_rule
+        self.search_index.add(new_rule)
+        self._save_rules_and_notify(self.rule_added, new_rule.id, is_new=True)
+        logger.debug("已新增規則: %s", name)
         return new_rule
 
     def get_rule_by_id(self, rule_id: str) -> Optional[Rule]:
-        return next((rule for rule in self.rules if rule.id == rule_id), None)
+        return self._rules_by_id.get(rule_id)
+
+    def get_rule_version(self, rule_id: str) -> int:
+        return self._versions.get(rule_id, 0)
+
+    def get_display_text(self, rule_id: str) -> str:
+        """取得規則的顯示文字；同一版本只會計算一次"""
+        version = self._versions.get(rule_id, 0)
+        cached = self._display_cache.get(rule_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        text = get_rule_display_text(self._rules_by_id[rule_id])
+        self._display_cache[rule_id] = (version, text)
+        return text
 
     def update_rule(self, rule_id: str, new_name: str, new_type: str, new_params: Dict) -> bool:
         rule = self.get_rule_by_id(rule_id)
         if rule:
-            rule.name = new_name
-            rule.rule_type = new_type
-            rule.params = new_params
-            self._save_rules_and_notify() # 使用新函式
-            print(f"  🔄️ 已更新規則 ID {rule_id[:6]}...")
+            rule.update(name=new_name, rule_type=new_type, params=new_params)
+            self._versions[rule_id] = self._versions.get(rule_id, 0) + 1
+            self.search_index.update(rule)
+            if not self._save_rules_and_notify(self.rule_updated, rule_id):
+                logger.warning("更新失敗: 規則 ID %s 已被其他人刪除，捨棄本機的修改", rule_id)
+                return False
+            logger.debug("已更新規則 ID %s", rule_id)
             return True
-        print(f"  ❌ 更新失敗: 找不到規則 ID {rule_id[:6]}...")
+        logger.warning("更新失敗: 找不到規則 ID %s", rule_id)
         return False
 
     def delete_rule(self, rule_id: str) -> bool:
         rule = self.get_rule_by_id(rule_id)
         if rule:
             self.rules.remove(rule)
-            self._save_rules_and_notify() # 使用新函式
-            print(f"  🗑️ 已刪除規則: {rule.name}")
+            del self._rules_by_id[rule_id]
+            self.search_index.remove(rule_id)
+            self._versions.pop(rule_id, None)
+            self._display_cache.pop(rule_id, None)
+            self._save_rules_and_notify(self.rule_removed, rule_id)
+            logger.debug("已刪除規則: %s", rule.name)
             return True
-        print(f"  ❌ 刪除失敗: 找不到規則 ID {rule_id[:6]}...")
+        logger.warning("刪除失敗: 找不到規則 ID %s", rule_id)
         return False
 
+    def search_rules(self, query: str, within=None) -> List[str]:
+        """以關鍵字搜尋規則 (名稱、類型、日期、班別、級別…)，回傳規則 ID 列表"""
+        return self.search_index.search(query, within)
+
     def get_all_rules(self) -> List[Rule]:
         return self.rules
-
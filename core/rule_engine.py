@@ -3,6 +3,7 @@
 負責定義、解釋、翻譯所有排班規則的核心模組。
 """
 from core.models import Rule
+from core.availability import describe_availability
 
 # --- 規則定義層 (翻譯機) ---
 # 將所有排班邏輯，定義成使用者看得懂的選項和輸入框
@@ -49,6 +50,27 @@ RULE_DEFINITIONS = {
         "type": "SHIFT_INTERDEPENDENCE",
         "params": {}, # 此規則為硬編碼邏輯，無需參數
         "description": "系統會自動處理 '10.5-19' 和 '10.5-20.5' 之間的連動關係。"
+    },
+    "員工可上班時段": {
+        "type": "EMPLOYEE_AVAILABILITY",
+        "params": {
+            "mode": ("限制方式", ["只能上", "不能上"]),
+            "weekdays": ("星期 (可多選，不選代表每天)", "weekdays"),
+            "shifts": ("班別 (可多選；'不能上' 未選代表整天不能上班)", "multi_work_shift_options"),
+            "start_date": ("起始日期", "optional_date"),
+            "end_date": ("結束日期", "optional_date")
+        },
+        "description": "設定員工每週固定可上或不可上的班別，可限定日期區間；排班時直接排除不可上的班別。"
+    },
+    "班別偏好": {
+        "type": "SHIFT_PREFERENCE",
+        "params": {
+            "weekdays": ("星期 (可多選，不選代表每天)", "weekdays"),
+            "shifts": ("偏好的班別 (可多選)", "multi_work_shift_options"),
+            "start_date": ("起始日期", "optional_date"),
+            "end_date": ("結束日期", "optional_date")
+        },
+        "description": "員工在指定的日子要上班時，優先安排偏好的班別 (軟性規則)。"
     }
 }
 
@@ -86,6 +108,9 @@ def get_rule_display_text(rule: Rule) -> str:
         elif rule.rule_type == "SHIFT_INTERDEPENDENCE":
             description += "自動處理 '10.5-19' 與 '10.5-20.5' 的連動"
 
+        elif rule.rule_type in ("EMPLOYEE_AVAILABILITY", "SHIFT_PREFERENCE"):
+            description += describe_availability(params, rule.rule_type)
+
         else:
             description += f"未知規則類型 ({rule.rule_type})"
     except Exception:
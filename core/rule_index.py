@@ -0,0 +1,106 @@
+"""
+新增檔案：規則搜尋索引 (Rule Search Index)
+在記憶體中為規則庫建立倒排索引，支援邊打字邊搜尋。
+中文名稱沒有空白可以斷詞，所以索引以「單一字元」為單位：
+先用查詢字串的每個字元取交集縮小候選，再確認整段字串確實出現在規則內容中。
+"""
+from typing import Dict, Iterable, List, Optional, Set
+
+from .models import Rule
+from .rule_engine import RULE_DEFINITIONS
+
+# 規則類型 -> 使用者看到的規則名稱，例如 "ASSIGN_FIXED_OFF_DAYS" -> "指定多個休息日"
+_TYPE_DISPLAY_NAMES = {definition["type"]: name for name, definition in RULE_DEFINITIONS.items()}
+
+
+def _flatten(value) -> Iterable[str]:
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _flatten(item)
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            yield from _flatten(item)
+    elif value is not None:
+        yield str(value)
+
+
+def rule_search_text(rule: Rule) -> str:
+    """組出一條規則可被搜尋的文字：名稱、類型、參數 (日期、班別、級別…)"""
+    parts = [rule.name, rule.rule_type, _TYPE_DISPLAY_NAMES.get(rule.rule_type, "")]
+    parts.extend(_flatten(rule.params if isinstance(rule.params, dict) else {}))
+    return "\n".join(parts).lower()
+
+
+class RuleSearchIndex:
+    """規則庫的倒排索引：字元 -> 含有該字元的規則 ID 集合"""
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self._texts: Dict[str, str] = {}
+        self._order: Dict[str, int] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._counter = 0
+        for rule in rules:
+            self.add(rule)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, rule: Rule):
+        text = rule_search_text(rule)
+        self._texts[rule.id] = text
+        if rule.id not in self._order:
+            self._order[rule.id] = self._counter
+            self._counter += 1
+        for char in set(text):
+            self._postings.setdefault(char, set()).add(rule.id)
+
+    def remove(self, rule_id: str):
+        text = self._texts.pop(rule_id, None)
+        self._order.pop(rule_id, None)
+        if text is None:
+            return
+        for char in set(text):
+            ids = self._postings.get(char)
+            if ids is not None:
+                ids.discard(rule_id)
+                if not ids:
+                    del self._postings[char]
+
+    def update(self, rule: Rule):
+        order = self._order.get(rule.id)
+        self.remove(rule.id)
+        self.add(rule)
+        if order is not None:
+            self._order[rule.id] = order
+
+    def matches(self, rule_id: str, query: str) -> bool:
+        text = self._texts.get(rule_id)
+        return text is not None and all(term in text for term in query.lower().split())
+
+    def search(self, query: str, within: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        回傳符合查詢的規則 ID (依加入規則庫的順序)。
+        空白分隔的多個關鍵字須全部符合。
+        within: 若提供，只在這些 ID 中搜尋 —— 使用者持續輸入時，
+                新的查詢只會讓結果變少，所以可以直接從上一次的結果繼續過濾。
+        """
+        terms = query.lower().split()
+        if not terms:
+            ids = self._texts.keys() if within is None else within
+            return sorted((rid for rid in ids if rid in self._texts), key=self._order.__getitem__)
+
+        if within is not None:
+            candidates = set(within)
+        else:
+            candidates = None
+            # 先用出現次數最少的字元取交集，讓候選集合儘快縮小
+            for char in sorted(set("".join(terms)), key=lambda c: len(self._postings.get(c, ()))):
+                ids = self._postings.get(char)
+                if not ids:
+                    return []
+                candidates = set(ids) if candidates is None else candidates & ids
+                if not candidates:
+                    return []
+
+        texts = self._texts
+        hits = [rid for rid in candidates if rid in texts and all(term in texts[rid] for term in terms)]
+        return sorted(hits, key=self._order.__getitem__)
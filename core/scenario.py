@@ -0,0 +1,300 @@
+"""
+新增檔案：假設情境沙盒 (What-if Scenario Sandbox)
+讓主管試算「如果芳琪 17 號請假」、「如果多一位時薪人員」之類的情境，
+完全在記憶體中進行，不會動到控制器每次變動都會重寫的資料檔。
+
+每個情境的員工、規則、規則指派與班表都是一層「寫入時複製」的覆蓋層 (類似 ChainMap)：
+只記錄與上一層不同的項目，刪除以墓碑標記。分支 (fork) 時不複製任何資料，
+因此建立幾十個情境所需的記憶體只與各自的變動量成正比。
+"""
+import dataclasses
+import datetime
+import itertools
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .assignments import new_assignments
+from .models import Employee, Rule
+from .schedule_diff import ScheduleDiff, diff_schedules, schedule_grid
+from .store_manager import StaticCatalog
+from .validator import ScheduleValidator
+
+_TOMBSTONE = object()
+
+
+class Overlay:
+    """
+    寫入時複製的對應表：本層只存放變動，讀取時依序往上層查找。
+    分支後原本這一層會被凍結，雙方各自在新的空白層上寫入，彼此互不影響。
+    """
+    def __init__(self, base: Optional[Dict] = None, parent: Optional["Overlay"] = None):
+        self.local: Dict = base if base is not None else {}
+        self.parent = parent
+
+    def __getitem__(self, key):
+        layer = self
+        while layer is not None:
+            if key in layer.local:
+                value = layer.local[key]
+                if value is _TOMBSTONE:
+                    break
+                return value
+            layer = layer.parent
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _TOMBSTONE) is not _TOMBSTONE
+
+    def __setitem__(self, key, value):
+        self.local[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.local[key] = _TOMBSTONE
+
+    def _layers(self) -> List["Overlay"]:
+        layers, layer = [], self
+        while layer is not None:
+            layers.append(layer)
+            layer = layer.parent
+        return layers[::-1]
+
+    def to_dict(self) -> Dict:
+        """合併所有層 (保持最早加入的順序)"""
+        merged = {}
+        for layer in self._layers():
+            for key, value in layer.local.items():
+                if value is _TOMBSTONE:
+                    merged.pop(key, None)
+                else:
+                    merged[key] = value
+        return merged
+
+    def __iter__(self) -> Iterator:
+        return iter(self.to_dict())
+
+    def values(self):
+        return self.to_dict().values()
+
+    def items(self):
+        return self.to_dict().items()
+
+    @property
+    def delta_size(self) -> int:
+        """本層記錄了幾筆變動"""
+        return len(self.local)
+
+    def branch(self) -> "Overlay":
+        """
+        凍結目前的內容，回傳一個共用它的新分支；自己也改寫到新的空白層。
+        本層沒有變動時直接共用上層，連續分支不會疊出一串空白層而拖慢查找。
+        """
+        if self.local:
+            frozen = Overlay(parent=self.parent)
+            frozen.local = self.local
+            self.local = {}
+            self.parent = frozen
+        return Overlay(parent=self.parent)
+
+
+def _assignment_entries(assignments: Dict) -> Dict[Tuple, Tuple]:
+    """把巢狀的規則指派攤平成 {(區段, 名稱): 不可變的值}，讓每個目標可以獨立覆蓋"""
+    entries = {("global",): tuple(assignments.get("global", []))}
+    for level, ids in assignments.get("levels", {}).items():
+        entries[("levels", level)] = tuple(ids)
+    for name, group in assignments.get("groups", {}).items():
+        entries[("groups", name)] = (tuple(group.get("members", [])), tuple(group.get("rules", [])))
+    for emp_id, ids in assignments.get("employees", {}).items():
+        entries[("employees", emp_id)] = tuple(ids)
+    return entries
+
+
+class Scenario:
+    """
+    一個假設情境。根情境由正式資料建立，其餘情境都由 fork() 分支而來。
+    所有修改都只寫進本情境的覆蓋層，不會存檔、也不會影響父情境或正式資料。
+    """
+    _counter = itertools.count(1)
+
+    def __init__(self, name: str, employees: Overlay, rules: Overlay, assignments: Overlay,
+                 parent: Optional["Scenario"] = None, seed: Optional[int] = None):
+        self.name = name
+        self.parent = parent
+        self.employees = employees
+        self.rules = rules
+        self.assignments = assignments
+        self.seed = seed
+        # 班表：{員工 ID: 每天的班別 tuple}，與父情境相同的欄位不重複儲存
+        self.schedule = parent.schedule.branch() if parent is not None else Overlay()
+        self.dates: Optional[List[str]] = parent.dates if parent is not None else None
+        self.stats = None
+
+    @classmethod
+    def from_controllers(cls, emp_controller, rule_controller, assignments: Optional[Dict] = None,
+                         seed: Optional[int] = None, name: str = "正式資料") -> "Scenario":
+        """
+        以目前的正式資料建立根情境。
+        控制器會就地修改員工與規則 (update()、合併外部變動)，所以根情境保存的是建立當下的快照，
+        之後正式資料的修改不會滲入既有的情境與其分支；分支時則不再複製。
+        """
+        employees = emp_controller.get_all_employees()
+        if assignments is None:
+            assignments = new_assignments()
+            assignments["employees"] = {emp.id: [] for emp in employees}
+        return cls(name,
+                   Overlay({emp.id: dataclasses.replace(emp) for emp in employees}),
+                   Overlay({rule.id: dataclasses.replace(rule) for rule in rule_controller.get_all_rules()}),
+                   Overlay(_assignment_entries(assignments)),
+                   seed=seed)
+
+    def fork(self, name: Optional[str] = None) -> "Scenario":
+        """分支出一個子情境；之後雙方的修改互不影響"""
+        return Scenario(name or f"情境 {next(self._counter)}",
+                        self.employees.branch(), self.rules.branch(), self.assignments.branch(),
+                        parent=self, seed=self.seed)
+
+    # --- 員工 ---
+    def add_employee(self, name: str, level: str, rule_ids: Iterable[str] = ()) -> Employee:
+        employee = Employee(name=name, level=level)
+        self.employees[employee.id] = employee
+        self.assignments[("employees", employee.id)] = tuple(rule_ids)
+        return employee
+
+    def update_employee(self, employee_id: str, **changes) -> Employee:
+        """以新物件取代 (共用的原物件不會被修改)"""
+        employee = dataclasses.replace(self.employees[employee_id], **changes)
+        self.employees[employee_id] = employee
+        return employee
+
+    def remove_employee(self, employee_id: str):
+        del self.employees[employee_id]
+        if ("employees", employee_id) in self.assignments:
+            del self.assignments[("employees", employee_id)]
+
+    # --- 規則 ---
+    def add_rule(self, name: str, rule_type: str, params: Dict) -> Rule:
+        rule = Rule(name=name, rule_type=rule_type, params=params)
+        self.rules[rule.id] = rule
+        return rule
+
+    def update_rule(self, rule_id: str, **changes) -> Rule:
+        rule = dataclasses.replace(self.rules[rule_id], **changes)
+        self.rules[rule_id] = rule
+        return rule
+
+    def remove_rule(self, rule_id: str):
+        del self.rules[rule_id]
+
+    def assign(self, rule_ids: Iterable[str], *, employee_ids: Iterable[str] = (),
+               levels: Iterable[str] = (), to_global: bool = False):
+        """與 assignments.bulk_assign 相同的語意，但只覆寫受影響的目標"""
+        rule_ids = list(rule_ids)
+        keys = [("global",)] if to_global else []
+        keys += [("levels", level) for level in levels]
+        keys += [("employees", emp_id) for emp_id in employee_ids]
+        for key in keys:
+            self.assignments[key] = tuple(dict.fromkeys([*self.assignments.get(key, ()), *rule_ids]))
+
+    def take_day_off(self, employee_id: str, date: str, shift_name: str = "休") -> Rule:
+        """便利方法：「某人某天請假」= 新增一條指定休息日規則並指派給他"""
+        employee = self.employees[employee_id]
+        rule = self.add_rule(f"{employee.name} {date} 請假", "ASSIGN_FIXED_OFF_DAYS",
+                             {"dates": [date], "shift_name": shift_name})
+        self.assign([rule.id], employee_ids=[employee_id])
+        return rule
+
+    # --- 組合成排班引擎的輸入 ---
+    def assignments_dict(self) -> Dict:
+        assignments = new_assignments()
+        for key, value in self.assignments.items():
+            if key[0] == "global":
+                assignments["global"] = list(value)
+            elif key[0] == "groups":
+                assignments["groups"][key[1]] = {"members": list(value[0]), "rules": list(value[1])}
+            elif key[0] == "levels":
+                assignments["levels"][key[1]] = list(value)
+            elif key[1] in self.employees:
+                assignments["employees"][key[1]] = list(value)
+        return assignments
+
+    def catalog(self) -> StaticCatalog:
+        return StaticCatalog(list(self.employees.values()), list(self.rules.values()))
+
+    @property
+    def delta_size(self) -> int:
+        """本情境相對於父情境記錄了幾筆變動 (員工、規則、指派、班表欄位)"""
+        return sum(overlay.delta_size for overlay in (self.employees, self.rules, self.assignments, self.schedule))
+
+    # --- 排班與比較 ---
+    def solve(self, year: int, month: int, scheduler_cls=None, record_replay: bool = False) -> Dict:
+        """
+        用排班引擎產生本情境的班表。
+        若父情境已排過同一個月，採增量重排：父情境的每一格只要在本情境仍然合法就沿用，
+        因此比較結果只會顯示真正受設定變動影響的格子 (沿用的班別會記錄在重現紀錄中)。
+        """
+        if scheduler_cls is None:
+            from .scheduler import Scheduler as scheduler_cls
+        catalog = self.catalog()
+        scheduler = scheduler_cls(catalog, catalog, self.assignments_dict(), seed=self.seed,
+                                  record_replay=record_replay)
+        self.seed = scheduler.seed
+        if self.parent is not None and self.parent.dates is not None:
+            days = [datetime.date.fromisoformat(date) for date in self.parent.dates]
+            scheduler.hints = {emp_id: dict(zip(days, shifts)) for emp_id, shifts in self.parent.schedule.items()}
+        result = scheduler.generate_schedule(year, month)
+        self.stats = result["stats"]
+
+        employee_ids, dates, columns = schedule_grid(result)
+        if self.dates != dates:
+            # 日期區間不同就無法共用父情境的欄位，整份重新記錄
+            self.schedule = Overlay()
+            self.dates = dates
+        for emp_id in list(self.schedule):
+            if emp_id not in columns:
+                del self.schedule[emp_id]
+        for emp_id in employee_ids:
+            if self.schedule.get(emp_id) != columns[emp_id]:
+                self.schedule[emp_id] = columns[emp_id]
+        return result
+
+    def schedule_result(self) -> Optional[Dict]:
+        """把本情境的班表組回 {"headers","data","employee_ids","dates"} 格式"""
+        if self.dates is None:
+            return None
+        columns = self.schedule.to_dict()
+        employee_ids = list(columns)
+        names = [self.employees[eid].name if eid in self.employees else eid for eid in employee_ids]
+        data = [[date, *row] for date, row in zip(self.dates, zip(*columns.values()))] \
+            if columns else [[date] for date in self.dates]
+        return {"headers": ["日期"] + names, "data": data, "employee_ids": employee_ids, "dates": self.dates}
+
+    def compare(self, other: "Scenario") -> ScheduleDiff:
+        """以 other 為基準，列出本情境班表的變動、工時增減與新違反的規則"""
+        if self.dates is None or other.dates is None:
+            raise ValueError("兩個情境都必須先 solve() 才能比較")
+        validator = ScheduleValidator.from_assignments(self.employees.values(), self.rules.values(),
+                                                       self.assignments_dict())
+        return diff_schedules(other.schedule_result(), self.schedule_result(), validator=validator)
+
+
+def compare_side_by_side(base: Scenario, scenarios: Iterable[Scenario]) -> List[Dict]:
+    """把多個情境與基準並排比較，回傳每個情境一列的摘要"""
+    rows = []
+    for scenario in scenarios:
+        diff = scenario.compare(base)
+        rows.append({
+            "scenario": scenario.name,
+            "changed_cells": len(diff.changes),
+            "affected_employees": len(diff.affected_employees()),
+            "hour_delta": sum(diff.hour_deltas.values()),
+            "new_violations": len(diff.new_violations),
+            "resolved_violations": len(diff.resolved_violations),
+            "delta_size": scenario.delta_size,
+        })
+    return rows
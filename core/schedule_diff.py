@@ -0,0 +1,114 @@
+"""
+新增檔案：班表差異比較 (Schedule Diff)
+比較同一段期間的兩份排班結果，列出哪些格子改變、每位員工的工時增減，
+以及新版班表「新違反」了哪些規則，讓主管在重新發布前知道誰受到影響。
+
+兩份結果都會先轉成「每位員工一個班別 tuple」的精簡格式；
+整欄相同的員工只做一次 tuple 比較就跳過；規則檢查交給 ScheduleValidator，且只針對有變動的員工與日期。
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from .validator import ScheduleValidator, Violation
+
+
+@dataclass
+class CellChange:
+    """一格班別的變動"""
+    employee_id: str
+    date: str
+    before: Optional[str]
+    after: Optional[str]
+
+
+@dataclass
+class ScheduleDiff:
+    changes: List[CellChange] = field(default_factory=list)
+    hour_deltas: Dict[str, float] = field(default_factory=dict)
+    new_violations: List[Violation] = field(default_factory=list)
+    resolved_violations: List[Violation] = field(default_factory=list)
+    added_employees: List[str] = field(default_factory=list)
+    removed_employees: List[str] = field(default_factory=list)
+
+    def changed_cells(self) -> Set[Tuple[str, str]]:
+        """有變動的 (員工 ID, 日期) 集合，供介面標示"""
+        return {(change.employee_id, change.date) for change in self.changes}
+
+    def affected_employees(self) -> List[str]:
+        return list(dict.fromkeys(change.employee_id for change in self.changes))
+
+    def summary(self, names: Optional[Dict[str, str]] = None) -> str:
+        """給使用者看的多行摘要；names 為 員工 ID -> 姓名"""
+        names = names or {}
+        lines = [f"共 {len(self.changes)} 格變動，影響 {len(self.affected_employees())} 位員工"]
+        for emp_id, delta in self.hour_deltas.items():
+            lines.append(f"• {names.get(emp_id, emp_id)} 工時 {delta:+g} 小時")
+        for emp_id in self.added_employees:
+            lines.append(f"• 新增 {names.get(emp_id, emp_id)}")
+        for emp_id in self.removed_employees:
+            lines.append(f"• 移除 {names.get(emp_id, emp_id)}")
+        if self.new_violations:
+            lines.append(f"新違反 {len(self.new_violations)} 條規則：")
+            lines.extend(f"  - {violation.message}" for violation in self.new_violations)
+        if self.resolved_violations:
+            lines.append(f"已解除 {len(self.resolved_violations)} 條規則違反")
+        return "\n".join(lines)
+
+
+def schedule_grid(result: Dict) -> Tuple[List[str], List[str], Dict[str, Tuple[str, ...]]]:
+    """
+    把排班結果轉成 (員工 ID 列表, ISO 日期列表, {員工 ID: 每天班別的 tuple})。
+    舊版結果沒有 employee_ids/dates 時，改用表頭姓名與第一欄的日期文字。
+    """
+    data = result["data"]
+    employee_ids = result.get("employee_ids") or result["headers"][1:]
+    dates = result.get("dates") or [str(row[0])[:10] for row in data]
+    columns = list(zip(*(row[1:] for row in data))) if data else [() for _ in employee_ids]
+    return list(employee_ids), list(dates), dict(zip(employee_ids, columns))
+
+
+def diff_schedules(before: Dict, after: Dict, scheduler=None,
+                   shift_durations: Optional[Dict[str, float]] = None,
+                   validator: Optional[ScheduleValidator] = None) -> ScheduleDiff:
+    """
+    比較兩份排班結果 (generate_schedule/generate_range 的回傳值)。
+    傳入產生 after 的 scheduler (或直接傳入 validator) 時，以它的規則另外找出新違反與已解除的規則；
+    都沒有時可只傳 shift_durations 來計算工時增減。
+    """
+    if validator is None and scheduler is not None:
+        validator = ScheduleValidator.from_scheduler(scheduler)
+    before_ids, before_dates, before_grid = schedule_grid(before)
+    after_ids, after_dates, after_grid = schedule_grid(after)
+    if before_dates != after_dates:
+        raise ValueError("兩份班表的日期區間不同，無法比較")
+    dates = after_dates
+
+    diff = ScheduleDiff(
+        added_employees=[eid for eid in after_ids if eid not in before_grid],
+        removed_employees=[eid for eid in before_ids if eid not in after_grid],
+    )
+    durations = validator.shift_durations if validator is not None else (shift_durations or {})
+    changed_employees, changed_days = [], set()
+    for emp_id in after_ids:
+        old = before_grid.get(emp_id)
+        new = after_grid[emp_id]
+        if old is None or old == new:
+            continue
+        changed_employees.append(emp_id)
+        for index, (old_shift, new_shift) in enumerate(zip(old, new)):
+            if old_shift != new_shift:
+                diff.changes.append(CellChange(emp_id, dates[index], old_shift, new_shift))
+                changed_days.add(index)
+        if durations:
+            delta = sum(durations.get(s, 0) for s in new) - sum(durations.get(s, 0) for s in old)
+            if delta:
+                diff.hour_deltas[emp_id] = delta
+
+    if validator is not None:
+        checked = changed_employees + diff.added_employees
+        days = sorted(changed_days) if not (diff.added_employees or diff.removed_employees) else None
+        old_violations = validator.validate_grid(before_grid, dates, checked, days)
+        new_violations = validator.validate_grid(after_grid, dates, checked, days)
+        diff.new_violations = [v for key, v in new_violations.items() if key not in old_violations]
+        diff.resolved_violations = [v for key, v in old_violations.items() if key not in new_violations]
+    return diff
@@ -3,12 +3,22 @@
 --- 最終章：智慧排班引擎 ---
 """
 import datetime
+import logging
 from calendar import monthrange
 from typing import List, Dict, Optional
 from collections import defaultdict
+from dataclasses import dataclass, field
+import heapq
 import random
 
 from .models import Employee, Rule, Shift
+from .feasibility import FLOAT_AWAY_SHIFT, Conflict, analyze_feasibility
+from .assignments import compile_assignments
+from .availability import AvailabilityIndex
+from .replay import input_fingerprint, make_record
+from .instrumentation import SchedulerStats, capture_profile, parse_profile_modes, profile_modes_from_env
+
+logger = logging.getLogger(__name__)
 
 # 班別定義
 SHIFTS = [
@@ -24,56 +34,214 @@ SHIFTS = [
     Shift(name="例休", start_time="", end_time="", color="#FFABAB"),
 ]
 
+# 可選用的排班引擎: 名稱 -> 介面上顯示的說明
+ENGINES = {
+    "greedy": "逐格排班",
+    "pattern": "週班型排班",
+}
+
+# 工時補足時不可造成超過 6 天連續上班 (勞基法：每 7 日應有 1 日例假)
+MAX_CONSECUTIVE_WORK_DAYS = 6
+
+def pin_entries(rule: Rule) -> List[tuple]:
+    """指定休息日 / 指定班別規則所釘住的 (日期字串, 班別) 列表；其他規則回傳空列表"""
+    params = rule.params
+    if rule.rule_type == "ASSIGN_FIXED_OFF_DAYS":
+        return [(date_str, params.get("shift_name", "休")) for date_str in params.get("dates", [])]
+    if rule.rule_type == "ASSIGN_SPECIFIC_SHIFT":
+        return [(params.get("date"), params.get("shift_name"))]
+    return []
+
+def calculate_shift_durations(shifts) -> Dict[str, float]:
+    """計算每個上班班別的時數 {班別名稱: 小時}；排班引擎與檢查器共用這份計算"""
+    durations = {}
+    for shift in shifts:
+        try:
+            start = datetime.datetime.strptime(shift.start_time, "%H:%M")
+            end = datetime.datetime.strptime(shift.end_time, "%H:%M")
+            duration = (end - start).total_seconds() / 3600
+            if duration < 0: duration += 24 # 處理跨夜班
+            durations[shift.name] = duration
+        except ValueError:
+            durations[shift.name] = 0
+    return durations
+
+@dataclass
+class CarryOverState:
+    """
+    排班區間結束時的邊界狀態，用來銜接下一段排班。
+    end_date 為區間最後一天，只有緊接在它之後開始的區間才會使用這些資料。
+    """
+    end_date: Optional[datetime.date] = None
+    last_shifts: Dict[str, str] = field(default_factory=dict)  # 最後一天的班別
+    streaks: Dict[str, int] = field(default_factory=dict)      # 連續上班天數
+    hours: Dict[str, float] = field(default_factory=dict)      # 累計工時
+
 class Scheduler:
     """
     智慧排班引擎，能夠理解並執行複雜的排班規則。
     """
-    def __init__(self, emp_controller, rule_controller, assignments):
+    engine = "greedy"
+    # 每次排班都會回報的計數器 (即使為 0)
+    counter_names = ("cells_filled", "dead_ends", "hour_repairs")
+
+    def __init__(self, emp_controller, rule_controller, assignments, profile=None, seed: Optional[int] = None,
+                 record_replay: bool = False):
+        """
+        profile: 要開啟的剖析模式 (例如 ["cprofile"])；未指定時讀取環境變數
+        seed: 亂數種子；未指定時隨機產生一個，並記錄在每次的排班結果中以便重現
+        record_replay: 是否在結果中附上重現紀錄 result["replay"] (需要對整份輸入計算雜湊，預設關閉)
+        """
         self.emp_controller = emp_controller
         self.rule_controller = rule_controller
         self.assignments = assignments
 
         self.all_employees = {emp.id: emp for emp in self.emp_controller.get_all_employees()}
         self.all_rules = {rule.id: rule for rule in self.rule_controller.get_all_rules()}
+        self._compile_employee_rules()
         
         self.shift_map = {s.name: s for s in SHIFTS}
         self.work_shifts = [s for s in SHIFTS if s.name not in ["休", "例休"]]
         self._calculate_shift_durations()
+        # 計算連續上班天數時算作上班的班別 (跨店支援的日子人在他店上班)
+        self.work_day_shifts = frozenset(self.shift_durations) | {FLOAT_AWAY_SHIFT}
+        self.conflicts: List[Conflict] = []
+        self.profile_modes = parse_profile_modes(profile) if profile is not None else profile_modes_from_env()
+        # 是否逐條統計規則檢查次數 (會在最內層迴圈計數，預設關閉)
+        self.count_checks = "counters" in self.profile_modes
+        self.stats = SchedulerStats()
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        # 優先沿用的既有班別 {員工 ID: {日期: 班別}}：只要仍然合法就不改動，用於情境比較時的增量重排
+        self.hints: Dict[str, Dict[datetime.date, str]] = {}
+        self.record_replay = record_replay
+        # 輸入在建立引擎時就已編譯固定，雜湊只需計算一次 (滾動排班的每個月共用)
+        self._input_fingerprint: Optional[str] = None
 
-        print("\n--- 🧠 智慧排班引擎已啟動 ---")
+        logger.debug("智慧排班引擎已啟動 (%d 位員工, %d 條規則)", len(self.all_employees), len(self.all_rules))
 
     def _calculate_shift_durations(self):
-        self.shift_durations = {}
-        for shift in self.work_shifts:
-            try:
-                start = datetime.datetime.strptime(shift.start_time, "%H:%M")
-                end = datetime.datetime.strptime(shift.end_time, "%H:%M")
-                duration = (end - start).total_seconds() / 3600
-                if duration < 0: duration += 24 # 處理跨夜班
-                self.shift_durations[shift.name] = duration
-            except ValueError:
-                self.shift_durations[shift.name] = 0
+        self.shift_durations = calculate_shift_durations(self.work_shifts)
+
+    def _compile_employee_rules(self):
+        """
+        將全域、級別、群組與個人指派一次展開成每位員工的規則列表。
+        排班迴圈中每一格都直接取用，不再重複組合與去重。
+        """
+        compiled = compile_assignments(self.assignments, self.all_employees)
+        self.employee_rules: Dict[str, List[Rule]] = {
+            emp_id: [self.all_rules[rid] for rid in rule_ids if rid in self.all_rules]
+            for emp_id, rule_ids in compiled.items()
+        }
+        self._build_pin_index()
+        # 可上班時段與班別偏好編譯成區間索引，排班時以位元遮罩直接刪去不可上的班別
+        self.availability = AvailabilityIndex(self.employee_rules, [s.name for s in SHIFTS])
+
+    def _build_pin_index(self):
+        """
+        把指定休息日與指定班別的日期只解析一次，建成依月份分組的索引:
+        {(年, 月): {日序數: [(員工 ID, 班別), ...]}}。
+        每次排班只需取出涵蓋月份的項目，規則庫裡多年的假日不會拖慢單月排班。
+        同一格被多條規則指定時，保留規則順序，後面的規則覆蓋前面的。
+        """
+        self.pin_index: Dict[tuple, Dict[int, List[tuple]]] = defaultdict(lambda: defaultdict(list))
+        for emp_id, rules in self.employee_rules.items():
+            for rule in rules:
+                for date_str, shift_name in pin_entries(rule):
+                    if shift_name is None:
+                        continue
+                    try:
+                        day = datetime.date.fromisoformat(date_str)
+                    except (TypeError, ValueError):
+                        continue  # 可行性分析會回報為 INVALID_RULE
+                    self.pin_index[(day.year, day.month)][day.toordinal()].append((emp_id, shift_name))
 
     def _get_employee_rules(self, emp_id: str) -> List[Rule]:
-        """獲取應用於某位員工的所有規則（個人規則 + 全域規則）"""
-        rule_ids = self.assignments["global"] + self.assignments["employees"].get(emp_id, [])
-        return [self.all_rules[rid] for rid in set(rule_ids) if rid in self.all_rules]
+        """獲取應用於某位員工的所有規則（全域 + 級別 + 群組 + 個人）"""
+        return self.employee_rules.get(emp_id, [])
 
-    def generate_schedule(self, year: int, month: int) -> Dict:
-        print(f"--- 正在為 {year}年 {month:02d}月 生成智慧班表 ---")
-        
+    def check_feasibility(self, year: int, month: int) -> List[Conflict]:
+        """在排班前做靜態可行性分析，回傳所有偵測到的衝突"""
+        return analyze_feasibility(self.all_employees, self.all_rules, self.assignments,
+                                   self.shift_durations, year, month)
+
+    def generate_schedule(self, year: int, month: int, carry_over: Optional[CarryOverState] = None) -> Dict:
+        """產生單一月份的班表；可傳入上個月留下的邊界狀態"""
         num_days = monthrange(year, month)[1]
-        dates = [datetime.date(year, month, day) for day in range(1, num_days + 1)]
-        
-        employee_ids = list(self.assignments["employees"].keys())
-        
-        # 1. 初始化班表
-        schedule = {emp_id: {day: None for day in dates} for emp_id in employee_ids}
-        
-        # 2. 應用「硬規則」(預先排定)
-        self._apply_hard_constraints(schedule, dates)
+        return self.generate_range(datetime.date(year, month, 1), datetime.date(year, month, num_days), carry_over)
+
+    def generate_range(self, start_date: datetime.date, end_date: datetime.date,
+                       carry_over: Optional[CarryOverState] = None) -> Dict:
+        """
+        一次排定任意日期區間 (例如一整季)。
+        carry_over 是區間開始前一天的狀態，讓跨月的晚接早等規則能看見「昨天」。
+        """
+        logger.info("正在為 %s ~ %s 生成智慧班表", start_date, end_date)
+        self.stats = stats = SchedulerStats()
+        stats.counters.update(dict.fromkeys(self.counter_names, 0))
+
+        with capture_profile(stats, self.profile_modes):
+            # 0. 靜態可行性分析：先把不可能滿足的設定找出來
+            with stats.phase("feasibility"):
+                self.conflicts = self.check_feasibility_range(start_date, end_date)
+            for conflict in self.conflicts:
+                logger.warning("排班設定衝突: %s", conflict.message)
+
+            num_days = (end_date - start_date).days + 1
+            dates = [start_date + datetime.timedelta(days=offset) for offset in range(num_days)]
+
+            employee_ids = list(self.assignments["employees"].keys())
+            initial_carry_over = carry_over
+            carry_over = carry_over or CarryOverState()
+            # 每個區間都從 (種子, 區間) 衍生自己的亂數序列，與之前排過哪些區間無關，確保可單獨重現
+            self.rng = random.Random(f"{self.seed}:{start_date.isoformat()}:{end_date.isoformat()}")
+
+            # 1. 初始化班表 + 2. 應用「硬規則」(預先排定)
+            with stats.phase("hard_constraints"):
+                schedule = {emp_id: {day: None for day in dates} for emp_id in employee_ids}
+                pinned = self._apply_hard_constraints(schedule, dates)
+
+            # 3. 主排班迴圈
+            with stats.phase("daily_loop"):
+                self._fill_schedule(schedule, dates, employee_ids, carry_over)
+
+            # 4. 工時補足：替未達每月最低工時的員工調整班別
+            with stats.phase("hour_balancing"):
+                self._balance_hours(schedule, dates, employee_ids, carry_over, pinned)
 
-        # 3. 主排班迴圈
+            # 5. 記錄區間結束時的邊界狀態，供下一段接續使用
+            with stats.phase("carry_over"):
+                self.carry_over = self._compute_carry_over(schedule, dates, employee_ids, carry_over)
+
+            # 6. 格式化輸出
+            with stats.phase("formatting"):
+                result = self._format_schedule_for_gui(schedule, dates, employee_ids)
+
+            # 7. 重現紀錄 (選用)
+            replay_record = None
+            if self.record_replay:
+                with stats.phase("replay"):
+                    if self._input_fingerprint is None:
+                        self._input_fingerprint = input_fingerprint(self)
+                    replay_record = make_record(self, start_date, end_date, initial_carry_over, result,
+                                                self._input_fingerprint)
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("排班完成: %s", stats.summary(),
+                        extra={"duration_ms": round(stats.total_seconds * 1000, 3), "counters": dict(stats.counters)})
+        if stats.profile_text:
+            logger.info("cProfile 剖析結果:\n%s", stats.profile_text)
+        result["employee_ids"] = employee_ids
+        result["dates"] = [day.isoformat() for day in dates]
+        result["carry_over"] = self.carry_over
+        result["stats"] = stats
+        result["seed"] = self.seed
+        result["replay"] = replay_record
+        return result
+
+    def _fill_schedule(self, schedule, dates, employee_ids, carry_over):
+        """逐日逐人填入班別 (排班主迴圈)"""
+        counters = self.stats.counters
         for day in dates:
             # 規則 6: 處理班別連動
             count_13_21_5 = sum(1 for emp_id in employee_ids if schedule[emp_id][day] == "13-21.5")
@@ -84,66 +252,316 @@ class Scheduler:
 
                 employee = self.all_employees[emp_id]
                 rules = self._get_employee_rules(emp_id)
+                previous_shift = self._get_previous_shift(emp_id, day, schedule, carry_over)
                 
                 # 獲取今天所有合法的班別選項
                 valid_shifts = self._get_valid_shifts_for_employee_on_day(
-                    employee, day, schedule, rules, count_13_21_5
+                    employee, day, previous_shift, rules, count_13_21_5
                 )
 
-                # 選擇一個班別
+                counters["cells_filled"] += 1
+
+                # 選擇一個班別 (有沿用提示且仍合法時直接沿用)
                 if valid_shifts:
-                    # 簡單策略：從合法選項中隨機選一個
-                    # TODO: 未來可優化為基於工時平衡等更複雜的策略
-                    chosen_shift = random.choice(valid_shifts)
+                    hint = self.hints.get(emp_id, {}).get(day) if self.hints else None
+                    chosen_shift = next((s for s in valid_shifts if s.name == hint), None) if hint else None
+                    if chosen_shift is None:
+                        chosen_shift = self._choose_shift(valid_shifts, previous_shift, rules)
+                        chosen_shift = self._apply_preference(emp_id, day, chosen_shift, valid_shifts)
                     schedule[emp_id][day] = chosen_shift.name
                 else:
                     # 如果沒有任何合法班別，暫時標記為未排定
                     schedule[emp_id][day] = "未排定"
-        
-        # 4. 格式化輸出
-        return self._format_schedule_for_gui(schedule, dates, employee_ids)
+                    counters["dead_ends"] += 1
+
+    def _balance_hours(self, schedule, dates, employee_ids, carry_over, pinned):
+        """
+        工時補足 (規則 4: 每月最低工時)。
+        主迴圈結束後，以優先佇列每次挑出「差最多工時」的員工，
+        把他的一天休假改成上班，或把某天的班換成較長的班。
+        每位員工的候選調整也放在依增加工時排序的堆積中，取出時才重新驗證，
+        總成本約為 O(調整次數 · log n)，不需要重新排班。
+        硬規則排定的格子、級別限制、班別連動與連續上班上限都不會被破壞。
+        """
+        counters = self.stats.counters
+        # 每天上 13-21.5 與 10.5-20.5 的人數，調整時同步更新 (規則 6)
+        late_counts = {day: 0 for day in dates}
+        mid_counts = {day: 0 for day in dates}
+        for emp_id in employee_ids:
+            for day in dates:
+                shift_name = schedule[emp_id][day]
+                if shift_name == "13-21.5":
+                    late_counts[day] += 1
+                elif shift_name == "10.5-20.5":
+                    mid_counts[day] += 1
+        day_index = {day: i for i, day in enumerate(dates)}
 
-    def _apply_hard_constraints(self, schedule, dates):
-        """處理指定休息日和指定班別的規則"""
-        for emp_id, rules_ids in self.assignments["employees"].items():
-            rules = [self.all_rules[rid] for rid in rules_ids if rid in self.all_rules]
+        months = defaultdict(list)
+        for day in dates:
+            months[(day.year, day.month)].append(day)
+
+        for (year, month), month_days in months.items():
+            # 區間只涵蓋部分月份、或有跨店支援的日子 (由他店負責工時) 時，目標工時按本店負責的天數比例折算
+            days_in_month = monthrange(year, month)[1]
+            queue = []
+            for emp_id in employee_ids:
+                targets = [rule.params.get("hours", 0) for rule in self._get_employee_rules(emp_id)
+                           if rule.rule_type == "MIN_MONTHLY_HOURS"]
+                if not targets:
+                    continue
+                row = schedule[emp_id]
+                owned_days = sum(1 for day in month_days if row[day] != FLOAT_AWAY_SHIFT)
+                worked = sum(self.shift_durations.get(row[day], 0) for day in month_days)
+                deficit = max(targets) * (owned_days / days_in_month) - worked
+                if deficit > 0:
+                    queue.append((-deficit, emp_id))
+            heapq.heapify(queue)
+
+            candidates = {}
+            while queue:
+                neg_deficit, emp_id = heapq.heappop(queue)
+                if emp_id not in candidates:
+                    candidates[emp_id] = [
+                        move for move in (self._repair_move(emp_id, day, schedule, dates, day_index, carry_over,
+                                                            late_counts, mid_counts)
+                                          for day in month_days if day not in pinned[emp_id])
+                        if move is not None
+                    ]
+                    heapq.heapify(candidates[emp_id])
+                move = self._pop_repair_move(emp_id, candidates[emp_id], schedule, dates, day_index,
+                                             carry_over, late_counts, mid_counts)
+                if move is None:
+                    logger.info("%s 在 %d-%02d 仍差 %.1f 小時，已無可調整的班別",
+                                self.all_employees[emp_id].name, year, month, -neg_deficit)
+                    continue
+
+                neg_gain, day, shift_name = move
+                old_shift = schedule[emp_id][day]
+                schedule[emp_id][day] = shift_name
+                for name, delta in ((old_shift, -1), (shift_name, 1)):
+                    if name == "13-21.5":
+                        late_counts[day] += delta
+                    elif name == "10.5-20.5":
+                        mid_counts[day] += delta
+                counters["hour_repairs"] += 1
+                logger.debug("工時補足: %s %s %s -> %s", emp_id, day, old_shift, shift_name)
+
+                neg_deficit -= neg_gain
+                if neg_deficit < 0:
+                    heapq.heappush(queue, (neg_deficit, emp_id))
+
+    def _pop_repair_move(self, emp_id, moves, schedule, dates, day_index, carry_over, late_counts, mid_counts):
+        """取出增加工時最多且仍然合法的調整；過期的候選重新計算後放回堆積"""
+        while moves:
+            move = heapq.heappop(moves)
+            current = self._repair_move(emp_id, move[1], schedule, dates, day_index, carry_over,
+                                        late_counts, mid_counts)
+            if current == move:
+                return move
+            if current is not None:
+                heapq.heappush(moves, current)
+        return None
+
+    def _repair_move(self, emp_id, day, schedule, dates, day_index, carry_over, late_counts, mid_counts):
+        """計算某一格最好的調整 (-增加的工時, 日期, 新班別)；沒有能增加工時的合法班別則回傳 None"""
+        current = schedule[emp_id][day]
+        if current == "例休":
+            return None
+        current_hours = self.shift_durations.get(current, 0)
+
+        if current not in self.shift_durations and self._work_streak_through(
+                emp_id, day, schedule, dates, day_index, carry_over) > MAX_CONSECUTIVE_WORK_DAYS:
+            return None
+
+        employee = self.all_employees[emp_id]
+        rules = self._get_employee_rules(emp_id)
+        previous_shift = self._get_previous_shift(emp_id, day, schedule, carry_over)
+        late_count = late_counts[day] - (current == "13-21.5")
+        late_rules = [rule.params for rule in rules if rule.rule_type == "LATE_SHIFT_THEN_EARLY_SHIFT"]
+        next_index = day_index[day] + 1
+        next_shift = schedule[emp_id][dates[next_index]] if next_index < len(dates) else None
+        current_breaks = None
+        best = None
+        for shift in self._get_valid_shifts_for_employee_on_day(employee, day, previous_shift, rules, late_count):
+            hours = self.shift_durations.get(shift.name, 0)
+            if hours <= current_hours or (best is not None and hours <= best[1]):
+                continue
+            # 規則 6: 新增一位 13-21.5 不可讓當天已排的 10.5-20.5 變成違規
+            if shift.name == "13-21.5" and late_count + 1 >= 2 and mid_counts[day] - (current == "10.5-20.5") > 0:
+                continue
+            # 規則 5: 補工時不可多出「晚班隔天不是指定早班」(前一天是晚班，或換成晚班而隔天已排了別的班)
+            if late_rules:
+                if current_breaks is None:
+                    current_breaks = self._late_then_early_breaks(late_rules, previous_shift, current, next_shift)
+                if self._late_then_early_breaks(late_rules, previous_shift, shift.name, next_shift) > current_breaks:
+                    continue
+            best = (shift.name, hours)
+        if best is None:
+            return None
+        return (current_hours - best[1], day, best[0])
+
+    def _late_then_early_breaks(self, late_rules, previous_shift, shift_name, next_shift) -> int:
+        """這一格排 shift_name 時，與前一天、隔天之間違反晚接早的次數 (判定方式與檢核器相同)"""
+        if self.count_checks:
+            self._count_rule_checks("LATE_SHIFT_THEN_EARLY_SHIFT", len(late_rules))
+        breaks = 0
+        for params in late_rules:
+            late_shifts, early_shift = params.get("late_shifts", []), params.get("early_shift")
+            if previous_shift in late_shifts and shift_name != early_shift and shift_name in self.shift_durations:
+                breaks += 1
+            if shift_name in late_shifts and next_shift != early_shift and next_shift in self.shift_durations:
+                breaks += 1
+        return breaks
+
+    def _work_streak_through(self, emp_id, day, schedule, dates, day_index, carry_over) -> int:
+        """若把這天改成上班，包含這天在內的連續上班天數 (跨店支援的日子也算上班)"""
+        row = schedule[emp_id]
+        work_days = self.work_day_shifts
+        index = day_index[day]
+        streak = 1
+        before = index - 1
+        while before >= 0 and row[dates[before]] in work_days:
+            streak += 1
+            before -= 1
+        if before < 0 and carry_over.end_date == dates[0] - datetime.timedelta(days=1):
+            streak += carry_over.streaks.get(emp_id, 0)
+        after = index + 1
+        while after < len(dates) and row[dates[after]] in work_days:
+            streak += 1
+            after += 1
+        return streak
+
+    def generate_rolling(self, year: int, month: int, months: int,
+                         carry_over: Optional[CarryOverState] = None) -> List[Dict]:
+        """
+        滾動排班：從指定月份開始連續排 months 個月，每個月都接續上個月的邊界狀態。
+        整個過程共用同一個引擎，不需要每個月重新載入資料。
+        """
+        results = []
+        for _ in range(months):
+            result = self.generate_schedule(year, month, carry_over)
+            results.append(result)
+            carry_over = result["carry_over"]
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return results
+
+    def check_feasibility_range(self, start_date: datetime.date, end_date: datetime.date) -> List[Conflict]:
+        """對一段日期區間做可行性分析（逐月檢查工時目標）"""
+        conflicts = []
+        year, month = start_date.year, start_date.month
+        while (year, month) <= (end_date.year, end_date.month):
+            conflicts.extend(self.check_feasibility(year, month))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return conflicts
+
+    def _get_previous_shift(self, emp_id, day, schedule, carry_over) -> Optional[str]:
+        """取得前一天的班別；區間第一天則從邊界狀態取得"""
+        yesterday = day - datetime.timedelta(days=1)
+        if yesterday in schedule[emp_id]:
+            return schedule[emp_id][yesterday]
+        if carry_over.end_date == yesterday:
+            return carry_over.last_shifts.get(emp_id)
+        return None
+
+    def _choose_shift(self, valid_shifts, previous_shift, rules) -> Shift:
+        """從合法選項中挑一個班別"""
+        # 規則 5: 前一天上了晚班，隔天優先排指定的早班
+        if previous_shift:
             for rule in rules:
-                params = rule.params
-                if rule.rule_type == "ASSIGN_FIXED_OFF_DAYS":
-                    for date_str in params.get("dates", []):
-                        day = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-                        if day in dates:
-                            schedule[emp_id][day] = params.get("shift_name", "休")
-                
-                elif rule.rule_type == "ASSIGN_SPECIFIC_SHIFT":
-                    date_str = params.get("date")
-                    day = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-                    if day in dates:
-                        schedule[emp_id][day] = params.get("shift_name")
+                if rule.rule_type != "LATE_SHIFT_THEN_EARLY_SHIFT":
+                    continue
+                if self.count_checks:
+                    self._count_rule_checks(rule.rule_type, 1)
+                if previous_shift in rule.params["late_shifts"]:
+                    preferred = next((s for s in valid_shifts if s.name == rule.params["early_shift"]), None)
+                    if preferred:
+                        return preferred
+        # 簡單策略：從合法選項中隨機選一個
+        # TODO: 未來可優化為基於工時平衡等更複雜的策略
+        return self.rng.choice(valid_shifts)
+
+    def _apply_preference(self, emp_id, day, chosen_shift, valid_shifts) -> Shift:
+        """
+        班別偏好 (軟性)：決定要上班時，若挑到的不是偏好班別，改從合法的偏好班別中挑。
+        只影響「上哪一班」，不改變休假的機率。
+        """
+        if chosen_shift.name not in self.shift_durations:
+            return chosen_shift
+        preferred_mask = self.availability.preferred_mask(emp_id, day)
+        bits = self.availability.bits
+        if not preferred_mask or preferred_mask & bits[chosen_shift.name]:
+            return chosen_shift
+        preferred = [s for s in valid_shifts if preferred_mask & bits[s.name]]
+        return self.rng.choice(preferred) if preferred else chosen_shift
+
+    def _compute_carry_over(self, schedule, dates, employee_ids, previous: CarryOverState) -> CarryOverState:
+        """計算區間最後一天的邊界狀態：最後班別、連續上班天數、累計工時"""
+        state = CarryOverState(end_date=dates[-1])
+        for emp_id in employee_ids:
+            shifts = [schedule[emp_id][day] for day in dates]
+            state.last_shifts[emp_id] = shifts[-1]
+
+            streak = 0
+            for shift_name in reversed(shifts):
+                if shift_name not in self.work_day_shifts:
+                    break
+                streak += 1
+            if streak == len(shifts) and previous.end_date == dates[0] - datetime.timedelta(days=1):
+                streak += previous.streaks.get(emp_id, 0)
+            state.streaks[emp_id] = streak
 
-    def _get_valid_shifts_for_employee_on_day(self, employee, day, schedule, rules, count_13_21_5):
+            worked = sum(self.shift_durations.get(shift_name, 0) for shift_name in shifts)
+            state.hours[emp_id] = previous.hours.get(emp_id, 0) + worked
+        return state
+
+    def _apply_hard_constraints(self, schedule, dates) -> Dict[str, set]:
+        """
+        處理指定休息日和指定班別的規則：從日期索引取出區間內的項目，一次線性套用。
+        回傳被硬規則排定的格子 {員工 ID: {日期, ...}}。
+        """
+        pinned = {emp_id: set() for emp_id in schedule}
+        first = dates[0].toordinal()
+        last = dates[-1].toordinal()
+        year, month = dates[0].year, dates[0].month
+        while (year, month) <= (dates[-1].year, dates[-1].month):
+            for ordinal, entries in self.pin_index.get((year, month), {}).items():
+                if first <= ordinal <= last:
+                    day = dates[ordinal - first]
+                    for emp_id, shift_name in entries:
+                        if emp_id in schedule:
+                            schedule[emp_id][day] = shift_name
+                            pinned[emp_id].add(day)
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return pinned
+
+    def _get_valid_shifts_for_employee_on_day(self, employee, day, previous_shift, rules, count_13_21_5):
         """根據所有規則，過濾出某人某天可以上的所有班別"""
         possible_shifts = self.work_shifts + [self.shift_map["休"]]
+        # 可上班時段：先以遮罩刪去當天不可上的班別，之後的規則只需檢查剩下的候選
+        allowed_mask = self.availability.allowed_mask(employee.id, day)
+        if allowed_mask != self.availability.full_mask:
+            bits = self.availability.bits
+            possible_shifts = [shift for shift in possible_shifts if allowed_mask & bits[shift.name]]
         valid_shifts = []
+        level_rules = [rule for rule in rules if rule.rule_type == "REQUIRED_LEVEL_FOR_SHIFT"]
+        level_checks = 0
 
         for shift in possible_shifts:
             is_valid = True
             
             # 規則 3: 檢查級別限制
-            for rule in rules:
-                if rule.rule_type == "REQUIRED_LEVEL_FOR_SHIFT":
-                    if shift.name == rule.params["shift_name"] and employee.level != rule.params["level"]:
-                        is_valid = False; break
+            for rule in level_rules:
+                level_checks += 1
+                if shift.name == rule.params["shift_name"] and employee.level != rule.params["level"]:
+                    is_valid = False; break
             if not is_valid: continue
 
             # 規則 5: 檢查晚班接早班
-            yesterday = day - datetime.timedelta(days=1)
-            if yesterday in schedule[employee.id]:
-                yesterday_shift = schedule[employee.id][yesterday]
+            if previous_shift is not None:
                 for rule in rules:
                     if rule.rule_type == "LATE_SHIFT_THEN_EARLY_SHIFT":
-                        if yesterday_shift in rule.params["late_shifts"] and shift.name != rule.params["early_shift"]:
-                           # 這是一個軟性規則，表示"優先"，暫時不在此做硬性過濾
+                        if previous_shift in rule.params["late_shifts"] and shift.name != rule.params["early_shift"]:
+                           # 這是一個軟性規則，表示"優先"，由 _choose_shift 負責優先挑選早班
                            pass
 
             # 規則 6: 班別連動
@@ -155,13 +573,23 @@ class Scheduler:
                 pass # 軟性規則
 
             # TODO: 增加更多規則檢查...
-            # 例如：最低工時需要在排班結束後統一計算和調整
+            # 最低工時由 _balance_hours 在主迴圈結束後統一計算和調整
 
             if is_valid:
                 valid_shifts.append(shift)
-        
+
+        if self.count_checks:
+            # 只計入可上班時段遮罩刪去後、實際評估過的候選班別
+            self.stats.counters["candidate_shifts_evaluated"] += len(possible_shifts)
+            self._count_rule_checks("REQUIRED_LEVEL_FOR_SHIFT", level_checks)
         return valid_shifts
 
+    def _count_rule_checks(self, rule_type: str, checks: int):
+        """記錄實際執行的規則檢查 (只在開啟 "counters" 模式時呼叫)"""
+        if checks:
+            self.stats.counters["rules_checked"] += checks
+            self.stats.rule_checks[rule_type] += checks
+
     def _format_schedule_for_gui(self, schedule, dates, employee_ids):
         """將內部班表格式轉換為 GUI 表格需要的格式"""
         employee_names = [self.all_employees[eid].name for eid in employee_ids]
@@ -177,3 +605,12 @@ class Scheduler:
             
         return {"headers": headers, "data": data}
 
+
+def get_scheduler_class(engine: Optional[str] = None):
+    """依名稱取得排班引擎類別；未指定時使用預設的逐格引擎"""
+    if engine in (None, "", Scheduler.engine):
+        return Scheduler
+    if engine == "pattern":
+        from .pattern_scheduler import PatternScheduler
+        return PatternScheduler
+    raise ValueError(f"未知的排班引擎: {engine}")
@@ -0,0 +1,323 @@
+"""
+新增檔案：排班服務 (Scheduling Service)
+一個只用標準函式庫 (asyncio) 實作的本機 HTTP 服務，讓店長的平板不必執行 PyQt 程式也能取得班表。
+
+    python -m core.service --port 8765 --data-dir data --workers 2
+
+API (JSON):
+    POST /jobs               送出排班工作 {"year": 2025, "month": 10, "store_id": 選填, "seed": 選填,
+                             "engine": 選填 ("greedy" 或 "pattern"), "assignments": 選填}，回傳 202 與工作 ID
+    GET  /jobs/<id>          查詢工作狀態
+    GET  /jobs/<id>/result   取得排班結果 (尚未完成時回傳 409)
+    GET  /health             服務狀態
+
+員工、規則庫與分店資料只在服務啟動時載入一次並常駐記憶體，之後每個請求只以 stat 檢查資料檔，
+被其他人修改過才增量合併；排班本身交給工作行程池執行，不會卡住接收請求的事件迴圈。
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from http import HTTPStatus
+from typing import Dict, Optional, Tuple
+
+from .employee_controller import EmployeeController
+from .logging_config import configure_logging
+from .replay import carry_over_to_dict
+from .scheduler import ENGINES
+from .store_manager import StoreManager, _schedule_store_payload
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1024 * 1024
+MAX_FINISHED_JOBS = 500  # 保留最近完成的工作結果，避免記憶體無限成長
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class BadRequest(Exception):
+    """請求內容不正確，回傳 400"""
+
+
+def _run_job(payload: Dict) -> Dict:
+    """工作行程的進入點：排班並轉成可直接輸出成 JSON 的結果"""
+    store_id, result = _schedule_store_payload(payload)
+    return {
+        "store_id": store_id,
+        "headers": result["headers"],
+        "data": result["data"],
+        "employee_ids": result["employee_ids"],
+        "dates": result["dates"],
+        "seed": result["seed"],
+        "replay": result["replay"],
+        "carry_over": carry_over_to_dict(result["carry_over"]),
+        "stats": result["stats"].to_dict(),
+    }
+
+
+@dataclass
+class Job:
+    id: str
+    payload: Dict
+    status: str = QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+
+    def describe(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "store_id": self.payload["store_id"],
+            "year": self.payload["year"],
+            "month": self.payload["month"],
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class SchedulingService:
+    """
+    工作佇列 + 工作行程池。
+    控制器在建立服務時載入一次，之後每個請求只需要把記憶體中的資料打包成 payload。
+    """
+    def __init__(self, data_dir: str = "data", workers: Optional[int] = None):
+        self.data_dir = data_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.store_manager = StoreManager(data_dir)
+        self.rule_controller = self.store_manager.rule_controller
+        self.employee_controller = EmployeeController(os.path.join(data_dir, "employees.json"))
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.queue: Optional[asyncio.Queue] = None
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._dispatchers = []
+        self._running = 0
+        logger.info("排班服務已載入 %d 位員工、%d 條規則、%d 間分店",
+                    len(self.employee_controller.get_all_employees()),
+                    len(self.rule_controller.get_all_rules()), len(self.store_manager.get_all_stores()))
+
+    # --- 工作管理 ---
+    def build_payload(self, request: Dict) -> Dict:
+        """驗證請求內容，並從常駐記憶體的目錄組出工作行程的輸入"""
+        if not isinstance(request, dict):
+            raise BadRequest("請求內容必須是 JSON 物件")
+        year, month = request.get("year"), request.get("month")
+        if not isinstance(year, int) or not isinstance(month, int) or not 1 <= month <= 12:
+            raise BadRequest("year 與 month 必須是整數，且 month 介於 1~12")
+        seed = request.get("seed")
+        if seed is not None and (not isinstance(seed, int) or seed < 0):
+            raise BadRequest("seed 必須是非負整數")
+        engine = request.get("engine")
+        if engine is not None and engine not in ENGINES:
+            raise BadRequest(f"engine 必須是 {', '.join(ENGINES)} 其中之一")
+
+        store_id = request.get("store_id")
+        if store_id is not None:
+            self.store_manager.reload_if_changed()
+            if self.store_manager.get_store_by_id(store_id) is None:
+                raise BadRequest(f"找不到分店 '{store_id}'")
+            assignments = request.get("assignments")
+            if assignments is not None:
+                assignments = self._validate_assignments(assignments)
+            payload = self.store_manager.build_payload(store_id, year, month, seed, engine, assignments)
+            payload["record_replay"] = True
+            return payload
+
+        self.rule_controller.reload_if_changed()
+        self.employee_controller.reload_if_changed()
+        employees = self.employee_controller.get_all_employees()
+        assignments = request.get("assignments")
+        if assignments is None:
+            assignments = {"global": [], "employees": {emp.id: [] for emp in employees}}
+        return {
+            "store_id": None,
+            "year": year,
+            "month": month,
+            "employees": [asdict(emp) for emp in employees],
+            "rules": [asdict(rule) for rule in self.rule_controller.get_all_rules()],
+            "assignments": self._validate_assignments(assignments),
+            "seed": seed,
+            "engine": engine,
+            "record_replay": True,  # 結果中附上重現紀錄，平板端可據此要求重現
+        }
+
+    @staticmethod
+    def _validate_assignments(assignments) -> Dict:
+        if not isinstance(assignments, dict) or not isinstance(assignments.get("employees", {}), dict):
+            raise BadRequest("assignments 格式不正確")
+        assignments.setdefault("global", [])
+        assignments.setdefault("employees", {})
+        return assignments
+
+    def submit(self, request: Dict) -> Job:
+        job = Job(id=uuid.uuid4().hex, payload=self.build_payload(request))
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job)
+        logger.info("已排入工作 %s (%s-%02d)", job.id, job.payload["year"], job.payload["month"])
+        return job
+
+    def _prune_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in (DONE, FAILED)]
+        for job_id in itertools.islice(finished, max(0, len(finished) - MAX_FINISHED_JOBS)):
+            del self.jobs[job_id]
+
+    async def _dispatch(self):
+        """從佇列取出工作交給行程池；同時執行的工作數等於工作行程數"""
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job.status, job.started_at = RUNNING, time.time()
+            self._running += 1
+            try:
+                job.result = await loop.run_in_executor(self.executor, _run_job, job.payload)
+                job.status = DONE
+            except Exception as exc:
+                logger.exception("工作 %s 失敗", job.id)
+                job.status, job.error = FAILED, str(exc)
+            finally:
+                self._running -= 1
+                job.finished_at = time.time()
+                job.payload = {key: job.payload[key] for key in ("store_id", "year", "month")}
+                self.queue.task_done()
+                self._prune_jobs()
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        # 工作行程在第一次送出工作時才建立，那時監聽的 socket 已經開啟；
+        # 用 spawn 啟動全新的直譯器，工作行程不會繼承 socket 與事件迴圈
+        self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def health(self) -> Dict:
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "running": self._running,
+            "jobs": len(self.jobs),
+        }
+
+    # --- HTTP ---
+    def route(self, method: str, path: str, body: bytes) -> Tuple[HTTPStatus, Dict]:
+        parts = [part for part in path.split("?", 1)[0].split("/") if part]
+        if method == "GET" and parts == ["health"]:
+            return HTTPStatus.OK, self.health()
+        if parts == ["jobs"] and method == "POST":
+            try:
+                request = json.loads(body.decode("utf-8") or "null")
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                raise BadRequest("請求內容不是有效的 JSON")
+            return HTTPStatus.ACCEPTED, self.submit(request).describe()
+        if method == "GET" and len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return HTTPStatus.NOT_FOUND, {"error": "找不到此工作"}
+            if len(parts) == 2:
+                return HTTPStatus.OK, job.describe()
+            if parts[2] == "result":
+                if job.status == DONE:
+                    return HTTPStatus.OK, job.result
+                if job.status == FAILED:
+                    return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": job.error}
+                return HTTPStatus.CONFLICT, {"error": "工作尚未完成", "status": job.status}
+        return HTTPStatus.NOT_FOUND, {"error": "找不到此路徑"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """處理一個 HTTP/1.1 連線 (每個連線一個請求)"""
+        try:
+            status, response = await self._read_and_route(reader)
+        except BadRequest as exc:
+            status, response = HTTPStatus.BAD_REQUEST, {"error": str(exc)}
+        except Exception:
+            logger.exception("處理請求時發生錯誤")
+            status, response = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "服務內部錯誤"}
+
+        body = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode("ascii") + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _read_and_route(self, reader: asyncio.StreamReader) -> Tuple[HTTPStatus, Dict]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise BadRequest("無效的 HTTP 請求")
+        method, path, _ = request_line
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise BadRequest("Content-Length 不正確")
+        if length > MAX_BODY_BYTES:
+            raise BadRequest("請求內容過大")
+        body = await reader.readexactly(length) if length else b""
+        status, response = self.route(method.upper(), path, body)
+        logger.debug("%s %s -> %d", method, path, status.value)
+        return status, response
+
+
+async def serve(service: SchedulingService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    await service.start()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    logger.info("排班服務已啟動: http://%s:%d", host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="智慧排班本機 HTTP 服務")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="只建議使用本機位址 (預設 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--workers", type=int, default=None, help="工作行程數 (預設為 CPU 核心數)")
+    parser.add_argument("--log-level", help="日誌等級，例如 DEBUG、INFO")
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level)
+
+    service = SchedulingService(args.data_dir, args.workers)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info("排班服務已停止")
+
+
+if __name__ == "__main__":
+    main()
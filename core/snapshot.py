@@ -0,0 +1,177 @@
+"""
+新增檔案：二進位快照 (Binary Snapshot)
+JSON 之外的另一種存檔格式，適合「所有分店 × 多年」的大型封存資料。
+
+格式: 檔頭 (魔術字、版本、未壓縮長度) + zlib 壓縮的內容。
+內容中所有字串 (ID、姓名、班別名稱、日期…) 只在「字串表」出現一次，
+其餘資料都是指向字串表的整數索引，以 array 一次打包/解開。
+讀回時同一個字串只會建立一個物件 (並 intern)，因此班表中數十萬格的班別名稱只佔幾個物件。
+"""
+import json
+import struct
+import sys
+import zlib
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List
+
+from .models import Employee, Rule
+
+MAGIC = b"ASNP"
+VERSION = 1
+_HEADER = struct.Struct("<4sHI")
+_COUNT = struct.Struct("<I")
+
+
+class SnapshotError(Exception):
+    """快照檔案格式不正確或版本不支援"""
+
+
+@dataclass
+class Snapshot:
+    """
+    快照內容。schedules 為 {名稱: 班表}，班表格式與 schedule_diff.schedule_grid 相同：
+    {"employee_ids": [...], "dates": [...], "columns": {員工 ID: (每天的班別, ...)}}
+    """
+    employees: List[Employee] = field(default_factory=list)
+    rules: List[Rule] = field(default_factory=list)
+    assignments: Dict = field(default_factory=dict)  # 任意可轉成 JSON 的指派資料
+    schedules: Dict[str, Dict] = field(default_factory=dict)
+
+
+class _StringTable:
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def __call__(self, text) -> int:
+        text = "" if text is None else str(text)
+        position = self.index.get(text)
+        if position is None:
+            position = self.index[text] = len(self.strings)
+            self.strings.append(text)
+        return position
+
+
+def _uint_array(values: Iterable[int]) -> bytes:
+    packed = array("I", values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return _COUNT.pack(len(packed)) + packed.tobytes()
+
+
+class _Reader:
+    def __init__(self, body: bytes):
+        self.body = memoryview(body)
+        self.offset = 0
+
+    def count(self) -> int:
+        value, = _COUNT.unpack_from(self.body, self.offset)
+        self.offset += _COUNT.size
+        return value
+
+    def uints(self) -> array:
+        length = self.count()
+        values = array("I")
+        end = self.offset + length * values.itemsize
+        values.frombytes(self.body[self.offset:end])
+        if sys.byteorder != "little":
+            values.byteswap()
+        self.offset = end
+        return values
+
+    def blob(self) -> bytes:
+        length = self.count()
+        data = bytes(self.body[self.offset:self.offset + length])
+        self.offset += length
+        return data
+
+
+def dumps_snapshot(snapshot: Snapshot, level: int = 6) -> bytes:
+    """把快照轉成二進位資料"""
+    table = _StringTable()
+    employees = [table(value) for emp in snapshot.employees for value in (emp.id, emp.name, emp.level)]
+    rules = [table(value) for rule in snapshot.rules
+             for value in (rule.id, rule.name, rule.rule_type,
+                           json.dumps(rule.params, ensure_ascii=False, sort_keys=True))]
+    assignments = table(json.dumps(snapshot.assignments, ensure_ascii=False, sort_keys=True))
+
+    sections = [_uint_array(employees), _uint_array(rules), _uint_array([assignments]),
+                _COUNT.pack(len(snapshot.schedules))]
+    for name, grid in snapshot.schedules.items():
+        employee_ids, dates = grid["employee_ids"], grid["dates"]
+        columns = grid["columns"]
+        sections.append(_uint_array([table(name)]))
+        sections.append(_uint_array(table(emp_id) for emp_id in employee_ids))
+        sections.append(_uint_array(table(date) for date in dates))
+        sections.append(_uint_array(table(shift_name) for emp_id in employee_ids for shift_name in columns[emp_id]))
+
+    # 字串表：每個字串的長度 (字元數) + 全部串接後的 UTF-8
+    strings = table.strings
+    text = "".join(strings).encode("utf-8")
+    body = b"".join([_uint_array(len(s) for s in strings), _COUNT.pack(len(text)), text, *sections])
+    return _HEADER.pack(MAGIC, VERSION, len(body)) + zlib.compress(body, level)
+
+
+def loads_snapshot(data: bytes) -> Snapshot:
+    """從二進位資料讀回快照"""
+    if len(data) < _HEADER.size:
+        raise SnapshotError("快照檔案太短")
+    magic, version, length = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("不是排班快照檔案")
+    if version != VERSION:
+        raise SnapshotError(f"不支援的快照版本: {version}")
+    try:
+        body = zlib.decompress(data[_HEADER.size:])
+    except zlib.error as exc:
+        raise SnapshotError(f"快照內容損毀: {exc}")
+    if len(body) != length:
+        raise SnapshotError("快照內容長度不符")
+
+    reader = _Reader(body)
+    lengths = reader.uints()
+    text = reader.blob().decode("utf-8")
+    strings, offset = [], 0
+    for size in lengths:
+        strings.append(sys.intern(text[offset:offset + size]))
+        offset += size
+
+    snapshot = Snapshot()
+    values = reader.uints()
+    snapshot.employees = [Employee(name=strings[values[i + 1]], level=strings[values[i + 2]], id=strings[values[i]])
+                          for i in range(0, len(values), 3)]
+    values = reader.uints()
+    snapshot.rules = [Rule(name=strings[values[i + 1]], rule_type=strings[values[i + 2]],
+                           params=json.loads(strings[values[i + 3]]), id=strings[values[i]])
+                      for i in range(0, len(values), 4)]
+    snapshot.assignments = json.loads(strings[reader.uints()[0]])
+
+    for _ in range(reader.count()):
+        name = strings[reader.uints()[0]]
+        employee_ids = [strings[i] for i in reader.uints()]
+        dates = [strings[i] for i in reader.uints()]
+        cells = reader.uints()
+        num_days = len(dates)
+        lookup = strings.__getitem__
+        columns = {emp_id: tuple(map(lookup, cells[n * num_days:(n + 1) * num_days]))
+                   for n, emp_id in enumerate(employee_ids)}
+        snapshot.schedules[name] = {"employee_ids": employee_ids, "dates": dates, "columns": columns}
+    return snapshot
+
+
+def save_snapshot(path: str, snapshot: Snapshot):
+    with open(path, "wb") as f:
+        f.write(dumps_snapshot(snapshot))
+
+
+def load_snapshot(path: str) -> Snapshot:
+    with open(path, "rb") as f:
+        return loads_snapshot(f.read())
+
+
+def grid_from_result(result: Dict) -> Dict:
+    """把 generate_schedule 的結果轉成快照使用的班表格式"""
+    from .schedule_diff import schedule_grid
+    employee_ids, dates, columns = schedule_grid(result)
+    return {"employee_ids": employee_ids, "dates": dates, "columns": columns}
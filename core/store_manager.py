@@ -0,0 +1,339 @@
+"""
+新增檔案：分店管理器 (Store Manager)
+讓同一個程式同時管理多間分店：
+每間分店有自己的員工與規則指派，但共用同一份規則庫與班別表（只載入一次）。
+另外提供批次 API，可以用多個工作行程平行產生所有分店的月班表。
+"""
+import copy
+import datetime
+import hashlib
+import logging
+import os
+import uuid
+from calendar import monthrange
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+
+from .models import Employee, Rule
+from .assignments import compile_assignments
+from .data_manager import SAVE_ATTEMPTS, ConcurrentModificationError, DataManager, merge_by_id
+from .employee_controller import EmployeeController
+from .feasibility import FLOAT_AWAY_SHIFT, REST_SHIFTS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Store:
+    """定義一間分店的資料模型"""
+    name: str
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+
+
+class StaticCatalog:
+    """
+    唯讀的員工/規則目錄，提供與控制器相同的查詢介面。
+    用在不需要存檔與信號的地方（例如工作行程內的排班）。
+    """
+    def __init__(self, employees: List[Employee] = None, rules: List[Rule] = None):
+        self.employees = list(employees or [])
+        self.rules = list(rules or [])
+
+    def get_all_employees(self) -> List[Employee]:
+        return self.employees
+
+    def get_all_rules(self) -> List[Rule]:
+        return self.rules
+
+
+def _schedule_store_payload(payload: Dict):
+    """
+    工作行程的進入點 (必須是模組層級函式才能被 pickle)。
+    payload 只包含純資料，避免把 QObject 控制器送進子行程。
+    """
+    from .scheduler import get_scheduler_class
+
+    catalog = StaticCatalog(
+        [Employee(**data) for data in payload["employees"]],
+        [Rule(**data) for data in payload["rules"]],
+    )
+    scheduler_cls = get_scheduler_class(payload.get("engine"))
+    scheduler = scheduler_cls(catalog, catalog, payload["assignments"], seed=payload.get("seed"),
+                              record_replay=payload.get("record_replay", False))
+    return payload["store_id"], scheduler.generate_schedule(payload["year"], payload["month"])
+
+
+def _derive_seed(seed: int, store_id: str) -> int:
+    digest = hashlib.sha256(f"{seed}:{store_id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big")
+
+
+@dataclass
+class _PayloadContext:
+    """準備排班輸入時，多間分店之間共用的資料 (規則只轉換一次、每位跨店員工只分配一次)"""
+    rules: List[Dict]
+    rules_by_id: Dict[str, Rule]
+    floating: Dict[str, List[str]]
+    splits: Dict[str, Dict[str, List[str]]] = field(default_factory=dict)
+
+
+class StoreManager:
+    """
+    管理所有分店的員工控制器與規則指派。
+    資料夾結構:
+        data/stores.json                      分店清單
+        data/rules_library.json               共用規則庫
+        data/stores/<store_id>/employees.json 分店員工
+        data/stores/<store_id>/assignments.json 分店規則指派
+    """
+    def __init__(self, data_dir: str = "data", rule_controller=None):
+        self.data_dir = data_dir
+        self.manager = DataManager(os.path.join(data_dir, "stores.json"))
+        self.stores: List[Store] = [Store(**data) for data in self.manager.load_data()]
+
+        if rule_controller is None:
+            from .rule_controller import RuleController
+            rule_controller = RuleController(os.path.join(data_dir, "rules_library.json"))
+        self.rule_controller = rule_controller
+
+        self._employee_controllers: Dict[str, EmployeeController] = {}
+        # 各分店的規則指派常駐記憶體，檔案被修改時才重新讀取
+        self._assignment_managers: Dict[str, DataManager] = {}
+        self._assignments: Dict[str, Dict] = {}
+        logger.debug("已載入 %d 間分店，共用 %d 條規則", len(self.stores), len(self.rule_controller.get_all_rules()))
+
+    def _store_dir(self, store_id: str) -> str:
+        return os.path.join(self.data_dir, "stores", store_id)
+
+    def _save_stores(self, new_store_id: Optional[str] = None):
+        for _ in range(SAVE_ATTEMPTS):
+            try:
+                self.manager.save_data([asdict(store) for store in self.stores])
+                return
+            except ConcurrentModificationError:
+                # 其他電腦同時新增了分店：合併後重存，不覆蓋對方的變動
+                logger.info("分店清單已被其他人修改，合併後重新存檔")
+                merged = merge_by_id([asdict(store) for store in self.stores], self.manager.load_data(),
+                                     keep_ids=(new_store_id,), new_ids=(new_store_id,))
+                self.stores = [Store(**data) for data in merged]
+        self.stores = [Store(**data) for data in self.manager.load_data()]
+        raise ConcurrentModificationError(f"分店清單持續被其他人修改，已放棄本次變更 ({SAVE_ATTEMPTS} 次重試)")
+
+    def add_store(self, name: str) -> Store:
+        """新增一間分店"""
+        new_store = Store(name=name)
+        self.stores.append(new_store)
+        self._save_stores(new_store.id)
+        logger.debug("已新增分店: %s", name)
+        return new_store
+
+    def get_store_by_id(self, store_id: str) -> Optional[Store]:
+        return next((store for store in self.stores if store.id == store_id), None)
+
+    def get_all_stores(self) -> List[Store]:
+        return self.stores
+
+    def get_employee_controller(self, store_id: str) -> EmployeeController:
+        """取得某間分店的員工控制器（第一次使用時才載入）"""
+        if store_id not in self._employee_controllers:
+            path = os.path.join(self._store_dir(store_id), "employees.json")
+            self._employee_controllers[store_id] = EmployeeController(path)
+        return self._employee_controllers[store_id]
+
+    def reload_if_changed(self) -> int:
+        """
+        合併其他人對分店清單、共用規則庫與已載入分店員工的修改 (規則指派在取用時才檢查)。
+        平時每個檔案只花一次 stat。回傳變動的筆數。
+        """
+        changes = 0
+        if self.manager.has_changed():
+            before = {store.id: store for store in self.stores}
+            self.stores = [Store(**data) for data in self.manager.load_data()]
+            changes += sum(1 for store in self.stores if before.get(store.id) != store)
+            changes += len(before.keys() - {store.id for store in self.stores})
+        changes += self.rule_controller.reload_if_changed()
+        for controller in self._employee_controllers.values():
+            changes += controller.reload_if_changed()
+        return changes
+
+    def _cached_assignments(self, store_id: str) -> Dict:
+        """常駐記憶體的規則指派 (呼叫端不可修改)；檔案被修改過才重新讀取，平時只花一次 stat"""
+        manager = self._assignment_managers.get(store_id)
+        if manager is None:
+            manager = DataManager(os.path.join(self._store_dir(store_id), "assignments.json"))
+            self._assignment_managers[store_id] = manager
+        elif store_id in self._assignments and not manager.has_changed():
+            return self._assignments[store_id]
+        data = manager.load_data()
+        if not isinstance(data, dict):
+            data = {}
+        data.setdefault("global", [])
+        data.setdefault("employees", {})
+        self._assignments[store_id] = data
+        return data
+
+    def get_assignments(self, store_id: str) -> Dict:
+        """讀取某間分店的規則指派 (回傳可自由修改的副本)；檔案不存在時回傳空的指派"""
+        return copy.deepcopy(self._cached_assignments(store_id))
+
+    def save_assignments(self, store_id: str, assignments: Dict):
+        self._cached_assignments(store_id)
+        # 指派是一整份文件，無法依 ID 合併，沿用「最後存檔的為準」
+        self._assignment_managers[store_id].save_data(assignments, force=True)
+        self._assignments[store_id] = copy.deepcopy(assignments)
+
+    def export_snapshot(self, path: str, schedules: Optional[Dict[str, Dict]] = None):
+        """
+        把所有分店的員工、共用規則庫與 (選填) 班表存成一個二進位快照。
+        schedules 為 {名稱: 排班結果}；快照的 assignments 欄位為
+        {"stores": [分店], "members": {分店 ID: [員工 ID]}, "assignments": {分店 ID: 規則指派}}。
+        """
+        from .snapshot import Snapshot, grid_from_result, save_snapshot
+        employees: Dict[str, Employee] = {}
+        members = {}
+        for store in self.stores:
+            store_employees = self.get_employee_controller(store.id).get_all_employees()
+            members[store.id] = [emp.id for emp in store_employees]
+            for emp in store_employees:
+                employees.setdefault(emp.id, emp)
+        save_snapshot(path, Snapshot(
+            employees=list(employees.values()),
+            rules=self.rule_controller.get_all_rules(),
+            assignments={
+                "stores": [asdict(store) for store in self.stores],
+                "members": members,
+                "assignments": {store.id: self.get_assignments(store.id) for store in self.stores},
+            },
+            schedules={name: grid_from_result(result) for name, result in (schedules or {}).items()},
+        ))
+
+    def find_floating_employees(self, store_id: Optional[str] = None) -> Dict[str, List[str]]:
+        """找出同時屬於多間分店的員工: {emp_id: [store_id, ...]}；指定 store_id 時只回傳該店的員工"""
+        memberships: Dict[str, List[str]] = {}
+        for store in self.stores:
+            for emp in self.get_employee_controller(store.id).get_all_employees():
+                memberships.setdefault(emp.id, []).append(store.id)
+        return {emp_id: ids for emp_id, ids in memberships.items()
+                if len(ids) > 1 and (store_id is None or store_id in ids)}
+
+    def _employee_rule_ids(self, store_id: str, emp_id: str) -> Tuple[str, ...]:
+        """某位員工在某間分店編譯後的規則 ID (只展開這一位，不編譯整間店)"""
+        assignments = self._cached_assignments(store_id)
+        employee = self.get_employee_controller(store_id).get_employee_by_id(emp_id)
+        single = {**assignments, "employees": {emp_id: assignments["employees"].get(emp_id, [])}}
+        return compile_assignments(single, {emp_id: employee} if employee else {})[emp_id]
+
+    def _split_floating_days(self, emp_id: str, store_ids: List[str], rules: Dict[str, Rule],
+                             year: int, month: int) -> Dict[str, List[str]]:
+        """
+        跨店約束：同一天只能在一間店上班。
+        預設以「週」為單位輪流歸屬各店；若某店的規則 (全域、級別、群組或個人指派皆算)
+        已指定當天的班別或休假，當天歸該店，指定上班優先於指定休假。
+        只會讀取 store_ids (與這位員工有關的分店) 的指派。
+        回傳 {store_id: [不在此店上班的日期, ...]}。
+        """
+        from .scheduler import pin_entries
+        num_days = monthrange(year, month)[1]
+        owner = {}
+        for day in range(1, num_days + 1):
+            owner[datetime.date(year, month, day).isoformat()] = store_ids[((day - 1) // 7) % len(store_ids)]
+
+        claims = {}  # 日期 -> (是否指定上班, 分店 ID)；同等級時先出現的分店優先
+        for store_id in store_ids:
+            for rule_id in self._employee_rule_ids(store_id, emp_id):
+                rule = rules.get(rule_id)
+                if rule is None:
+                    continue
+                for date_str, shift_name in pin_entries(rule):
+                    if date_str not in owner or shift_name is None:
+                        continue
+                    is_work = shift_name not in REST_SHIFTS
+                    if date_str not in claims or is_work > claims[date_str][0]:
+                        claims[date_str] = (is_work, store_id)
+        for date_str, (_, store_id) in claims.items():
+            owner[date_str] = store_id
+
+        away = {store_id: [] for store_id in store_ids}
+        for date_str, owner_id in owner.items():
+            for store_id in store_ids:
+                if store_id != owner_id:
+                    away[store_id].append(date_str)
+        return away
+
+    def _payload_context(self, store_id: Optional[str] = None) -> _PayloadContext:
+        all_rules = self.rule_controller.get_all_rules()
+        return _PayloadContext(
+            rules=[asdict(rule) for rule in all_rules],
+            rules_by_id={rule.id: rule for rule in all_rules},
+            floating=self.find_floating_employees(store_id),
+        )
+
+    def _build_payload(self, store_id: str, year: int, month: int, seed: Optional[int],
+                       engine: Optional[str], context: _PayloadContext, assignments: Optional[Dict] = None) -> Dict:
+        employees = self.get_employee_controller(store_id).get_all_employees()
+        base = self._cached_assignments(store_id) if assignments is None else assignments
+        # 只複製會被加上跨店規則的個人指派，常駐記憶體 (或呼叫端傳入) 的指派保持不變
+        own = dict(base["employees"])
+        for emp in employees:
+            own.setdefault(emp.id, [])
+        extra_rules = []
+        for emp_id, store_ids in context.floating.items():
+            if store_id not in store_ids:
+                continue
+            if emp_id not in context.splits:
+                context.splits[emp_id] = self._split_floating_days(emp_id, store_ids, context.rules_by_id,
+                                                                   year, month)
+            dates = context.splits[emp_id][store_id]
+            if not dates:
+                continue
+            # 規則 ID 由 (分店, 員工, 月份) 決定，相同輸入產生相同的排班輸入，重現紀錄才比對得上
+            rule = Rule(name="跨店支援", rule_type="ASSIGN_FIXED_OFF_DAYS",
+                        params={"dates": dates, "shift_name": FLOAT_AWAY_SHIFT},
+                        id=f"float:{store_id}:{emp_id}:{year}-{month:02d}")
+            extra_rules.append(asdict(rule))
+            own[emp_id] = [*own[emp_id], rule.id]
+        return {
+            "store_id": store_id,
+            "year": year,
+            "month": month,
+            "employees": [asdict(emp) for emp in employees],
+            "rules": context.rules + extra_rules,
+            "assignments": {**base, "employees": own},
+            "seed": None if seed is None else _derive_seed(seed, store_id),
+            "engine": engine,
+        }
+
+    def build_payload(self, store_id: str, year: int, month: int, seed: Optional[int] = None,
+                      engine: Optional[str] = None, assignments: Optional[Dict] = None) -> Dict:
+        """
+        只為一間分店準備排班輸入，全部取自常駐記憶體的員工、規則與指派。
+        跨店支援的員工只會讀取與這間店共用該員工的分店指派；結果與 build_payloads 中該店的項目相同。
+        assignments: 以呼叫端提供的指派取代分店存檔的指派；跨店支援的規則仍會併入其中，
+        同一位員工才不會在同一天被兩間店排班 (哪些日子歸哪間店仍依各店存檔的指派決定)。
+        """
+        return self._build_payload(store_id, year, month, seed, engine, self._payload_context(store_id),
+                                   assignments)
+
+    def build_payloads(self, year: int, month: int, seed: Optional[int] = None,
+                       engine: Optional[str] = None) -> List[Dict]:
+        """
+        為每間分店準備送進工作行程的純資料排班輸入。
+        指定 seed 時，每間分店使用由 (seed, 分店 ID) 衍生的固定種子，結果與工作行程的執行順序無關。
+        engine: 排班引擎名稱 (見 scheduler.ENGINES)，未指定時使用預設引擎。
+        """
+        context = self._payload_context()
+        return [self._build_payload(store.id, year, month, seed, engine, context) for store in self.stores]
+
+    def schedule_all_stores(self, year: int, month: int, max_workers: Optional[int] = None,
+                            seed: Optional[int] = None, engine: Optional[str] = None) -> Dict[str, Dict]:
+        """
+        批次 API：一次產生所有分店某月份的班表。
+        max_workers=1 時直接在目前行程執行，否則交給工作行程池平行處理。
+        回傳 {store_id: 排班結果}。
+        """
+        payloads = self.build_payloads(year, month, seed, engine)
+        if max_workers == 1 or len(payloads) <= 1:
+            return dict(map(_schedule_store_payload, payloads))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return dict(executor.map(_schedule_store_payload, payloads))
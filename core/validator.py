@@ -0,0 +1,276 @@
+"""
+新增檔案：班表檢核器 (Schedule Validator)
+不論班表是引擎產生、手動修改或從外部匯入，都可以拿來對照員工、規則與指派，
+列出所有違反的規則。
+
+規則會先「編譯」成每位員工的檢查資料 (釘住的日期、不允許的班別集合、晚班集合、每月工時目標)，
+檢核時每位員工只走一次自己的班別 tuple，班別連動則對每天的整列做一次計數，
+因此全分店一整年的班表也能在一秒內檢核完畢。
+
+命令列用法:
+    python -m core.validator schedule.json --data-dir data --assignments assignments.json
+    python -m core.validator schedule.json --data-dir data --store <分店 ID> --json
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+from calendar import monthrange
+from dataclasses import asdict, dataclass, field
+from itertools import repeat
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .assignments import compile_assignments
+from .availability import AVAILABILITY, AvailabilityIndex
+from .feasibility import FLOAT_AWAY_SHIFT
+from .models import Employee, Rule
+
+logger = logging.getLogger(__name__)
+
+ERROR = "error"
+WARNING = "warning"  # 軟性規則 (例如晚班隔天「優先」排早班)
+
+
+@dataclass
+class Violation:
+    """
+    一筆規則違反。
+    rule_id 為 None 表示違反的是引擎內建的班別連動；date 可能是日期或 "YYYY-MM" 月份。
+    """
+    rule_id: Optional[str]
+    employee_id: Optional[str]
+    date: Optional[str]
+    message: str
+    rule_type: Optional[str] = None
+    severity: str = ERROR
+
+    @property
+    def key(self) -> Tuple:
+        return (self.rule_id, self.employee_id, self.date)
+
+
+@dataclass
+class _EmployeeChecks:
+    """一位員工編譯後的檢查資料"""
+    employee: Employee
+    pins: List[Tuple[str, str, Rule]] = field(default_factory=list)      # (日期, 應排班別, 規則)
+    forbidden: Dict[str, Rule] = field(default_factory=dict)             # 級別不符、不可上的班別
+    late_early: List[Tuple[frozenset, str, Rule]] = field(default_factory=list)
+    hours: Optional[Tuple[float, Rule]] = None                           # 最嚴格的每月工時目標
+    availability: List[Tuple[AvailabilityIndex, Rule]] = field(default_factory=list)  # 每條可上班時段規則各自的索引
+
+
+def _default_shift_durations() -> Dict[str, float]:
+    from .feasibility import REST_SHIFTS
+    from .scheduler import SHIFTS, calculate_shift_durations
+    return calculate_shift_durations(shift for shift in SHIFTS if shift.name not in REST_SHIFTS)
+
+
+class ScheduleValidator:
+    """
+    依員工、規則與指派編譯出檢查項目，之後可以重複檢核任意多份班表。
+    employee_rules 為 {員工 ID: [Rule, ...]} (已展開全域、級別、群組的指派)。
+    """
+    def __init__(self, employees: Dict[str, Employee], employee_rules: Dict[str, List[Rule]],
+                 shift_durations: Optional[Dict[str, float]] = None):
+        self.employees = employees
+        self.shift_durations = shift_durations if shift_durations is not None else _default_shift_durations()
+        self.checks: Dict[str, _EmployeeChecks] = {}
+        self.interdependence_rule: Optional[Rule] = None
+        for emp_id, rules in employee_rules.items():
+            employee = employees.get(emp_id)
+            if employee is not None:
+                self.checks[emp_id] = self._compile(employee, rules)
+        self._names = {}
+        for emp_id, employee in employees.items():
+            self._names.setdefault(employee.name, emp_id)
+
+    @classmethod
+    def from_assignments(cls, employees: Iterable[Employee], rules: Iterable[Rule], assignments: Dict,
+                         shift_durations: Optional[Dict[str, float]] = None) -> "ScheduleValidator":
+        employees = {emp.id: emp for emp in employees}
+        rules = {rule.id: rule for rule in rules}
+        compiled = compile_assignments(assignments, employees)
+        employee_rules = {emp_id: [rules[rid] for rid in ids if rid in rules] for emp_id, ids in compiled.items()}
+        return cls(employees, employee_rules, shift_durations)
+
+    @classmethod
+    def from_scheduler(cls, scheduler) -> "ScheduleValidator":
+        """直接沿用排班引擎已編譯好的規則"""
+        return cls(scheduler.all_employees, scheduler.employee_rules, scheduler.shift_durations)
+
+    def _compile(self, employee: Employee, rules: List[Rule]) -> _EmployeeChecks:
+        checks = _EmployeeChecks(employee)
+        for rule in rules:
+            params = rule.params if isinstance(rule.params, dict) else {}
+            if rule.rule_type == "ASSIGN_FIXED_OFF_DAYS":
+                wanted = params.get("shift_name", "休")
+                checks.pins.extend((date, wanted, rule) for date in params.get("dates", []))
+            elif rule.rule_type == "ASSIGN_SPECIFIC_SHIFT":
+                if params.get("date") and params.get("shift_name"):
+                    checks.pins.append((params["date"], params["shift_name"], rule))
+            elif rule.rule_type == "REQUIRED_LEVEL_FOR_SHIFT":
+                if employee.level != params.get("level"):
+                    checks.forbidden.setdefault(params.get("shift_name"), rule)
+            elif rule.rule_type == "LATE_SHIFT_THEN_EARLY_SHIFT":
+                checks.late_early.append((frozenset(params.get("late_shifts", [])), params.get("early_shift"), rule))
+            elif rule.rule_type == "MIN_MONTHLY_HOURS":
+                target = params.get("hours", 0)
+                if checks.hours is None or target > checks.hours[0]:
+                    checks.hours = (target, rule)
+            elif rule.rule_type == "SHIFT_INTERDEPENDENCE":
+                self.interdependence_rule = self.interdependence_rule or rule
+            elif rule.rule_type == AVAILABILITY:
+                # 多條規則的可上班別取交集，逐條檢查即可指出是哪一條擋住
+                index = AvailabilityIndex({employee.id: [rule]}, [*self.shift_durations, "休", "例休"])
+                checks.availability.append((index, rule))
+        return checks
+
+    def resolve_employee_id(self, key: str) -> str:
+        """匯入的班表可能只有姓名：ID 找不到時改用姓名對應"""
+        return key if key in self.employees else self._names.get(key, key)
+
+    def validate(self, schedule: Dict) -> List[Violation]:
+        """檢核一份排班結果 ({"headers","data"}，可含 employee_ids/dates)"""
+        from .schedule_diff import schedule_grid
+        employee_ids, dates, columns = schedule_grid(schedule)
+        resolved = [self.resolve_employee_id(key) for key in employee_ids]
+        grid = {emp_id: columns[key] for emp_id, key in zip(resolved, employee_ids)}
+        return list(self.validate_grid(grid, dates).values())
+
+    def validate_grid(self, grid: Dict[str, Tuple[str, ...]], dates: List[str],
+                      employee_ids: Optional[Iterable[str]] = None,
+                      day_indexes: Optional[Iterable[int]] = None) -> Dict[Tuple, Violation]:
+        """
+        檢核精簡格式的班表 {員工 ID: 每天班別的 tuple}，回傳 {違反的鍵: Violation}。
+        employee_ids / day_indexes 可限定只檢查部分員工與部分日期的班別連動 (供差異比較使用)。
+        """
+        violations: Dict[Tuple, Violation] = {}
+        date_index = {date: i for i, date in enumerate(dates)}
+        months = self._month_slices(dates)
+
+        for emp_id in (grid if employee_ids is None else employee_ids):
+            shifts = grid.get(emp_id)
+            checks = self.checks.get(emp_id)
+            if shifts is None or checks is None:
+                continue
+            self._check_employee(emp_id, checks, shifts, dates, date_index, months, violations)
+
+        # 班別連動：當天已有兩位 13-21.5 時，不應再有人上 10.5-20.5
+        rule = self.interdependence_rule
+        rows = list(zip(*grid.values())) if grid else []
+        for index in (range(len(rows)) if day_indexes is None else day_indexes):
+            row = rows[index]
+            if "10.5-20.5" in row and row.count("13-21.5") >= 2:
+                violation = Violation(rule.id if rule else None, None, dates[index],
+                                      f"{dates[index]} 已有兩位 13-21.5，卻仍排了 10.5-20.5【班別連動】",
+                                      "SHIFT_INTERDEPENDENCE")
+                violations[violation.key] = violation
+        return violations
+
+    @staticmethod
+    def _month_slices(dates: List[str]) -> List[Tuple[str, int, int, float]]:
+        """把日期切成月份區段: (YYYY-MM, 起, 迄, 涵蓋比例)；區間只含部分月份時工時目標按比例折算"""
+        slices, start = [], 0
+        for index in range(1, len(dates) + 1):
+            if index == len(dates) or dates[index][:7] != dates[start][:7]:
+                month = dates[start][:7]
+                days_in_month = monthrange(int(month[:4]), int(month[5:7]))[1]
+                slices.append((month, start, index, (index - start) / days_in_month))
+                start = index
+        return slices
+
+    def _check_employee(self, emp_id, checks: _EmployeeChecks, shifts, dates, date_index, months, violations):
+        name = checks.employee.name
+
+        def add(rule: Rule, date: str, message: str, severity: str = ERROR):
+            violation = Violation(rule.id, emp_id, date, f"{message}【{rule.name}】", rule.rule_type, severity)
+            violations[violation.key] = violation
+
+        for date, wanted, rule in checks.pins:
+            index = date_index.get(date)
+            if index is not None and shifts[index] != wanted:
+                add(rule, date, f"{name} 在 {date} 應為 '{wanted}'，卻排了 '{shifts[index]}'")
+
+        if checks.forbidden and not checks.forbidden.keys().isdisjoint(shifts):
+            for index, shift_name in enumerate(shifts):
+                rule = checks.forbidden.get(shift_name)
+                if rule is not None:
+                    add(rule, dates[index], f"{name} ({checks.employee.level}) 在 {dates[index]} 上了 "
+                                            f"'{shift_name}'，該班別須由 '{rule.params.get('level')}' 擔任")
+
+        for late_shifts, early_shift, rule in checks.late_early:
+            if late_shifts.isdisjoint(shifts[:-1]):
+                continue
+            for index in range(1, len(shifts)):
+                today = shifts[index]
+                if shifts[index - 1] in late_shifts and today != early_shift and today in self.shift_durations:
+                    add(rule, dates[index], f"{name} 在 {dates[index - 1]} 上了 '{shifts[index - 1]}'，"
+                                            f"隔天應優先排 '{early_shift}' 卻排了 '{today}'", WARNING)
+
+        for index, rule in checks.availability:
+            for position, shift_name in enumerate(shifts):
+                if shift_name in self.shift_durations:
+                    day = datetime.date.fromisoformat(dates[position])
+                    if not index.can_work(emp_id, shift_name, day):
+                        add(rule, dates[position], f"{name} 在 {dates[position]} 不可上 '{shift_name}'")
+
+        if checks.hours is not None:
+            target, rule = checks.hours
+            get = self.shift_durations.get
+            for month, start, end, ratio in months:
+                worked = sum(map(get, shifts[start:end], repeat(0)))
+                # 跨店支援的日子由他店負責工時，目標只按本店負責的天數折算 (與排班引擎相同)
+                away = shifts[start:end].count(FLOAT_AWAY_SHIFT)
+                expected = target * ratio * (end - start - away) / (end - start)
+                if worked < expected:
+                    add(rule, month, f"{name} {month} 只排了 {worked:g} 小時，未達 {expected:g} 小時")
+
+
+def _load_schedule(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("result", data) if isinstance(data, dict) else {"headers": data[0], "data": data[1:]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="檢核班表是否違反排班規則")
+    parser.add_argument("schedule", help="班表 JSON 檔 (排班結果，含 headers 與 data)")
+    parser.add_argument("--data-dir", default="data", help="資料夾 (員工與規則庫)")
+    parser.add_argument("--assignments", help="規則指派 JSON 檔")
+    parser.add_argument("--store", help="分店 ID：使用該分店的員工與規則指派")
+    parser.add_argument("--json", action="store_true", help="以 JSON 輸出違反列表")
+    args = parser.parse_args(argv)
+
+    from .data_manager import DataManager
+    rules = [Rule(**data) for data in DataManager(os.path.join(args.data_dir, "rules_library.json")).load_data()]
+    if args.store:
+        store_dir = os.path.join(args.data_dir, "stores", args.store)
+        employees_path = os.path.join(store_dir, "employees.json")
+        assignments = DataManager(os.path.join(store_dir, "assignments.json")).load_data() or {}
+    else:
+        employees_path = os.path.join(args.data_dir, "employees.json")
+        assignments = {}
+    if args.assignments:
+        with open(args.assignments, "r", encoding="utf-8") as f:
+            assignments = json.load(f)
+    employees = [Employee(**data) for data in DataManager(employees_path).load_data()]
+    if not assignments.get("employees"):
+        assignments = dict(assignments, employees={emp.id: [] for emp in employees})
+
+    validator = ScheduleValidator.from_assignments(employees, rules, assignments)
+    violations = validator.validate(_load_schedule(args.schedule))
+    if args.json:
+        json.dump([asdict(v) for v in violations], sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        for violation in violations:
+            print(f"[{violation.severity}] {violation.message}")
+        print(f"共 {len(violations)} 筆違反")
+    return 1 if any(v.severity == ERROR for v in violations) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
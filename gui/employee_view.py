@@ -6,9 +6,10 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                              QTableView, QAbstractItemView, QMessageBox,
                              QDialog, QLineEdit, QComboBox, QFormLayout,
                              QDialogButtonBox, QHeaderView)
-from PyQt6.QtCore import Qt, QAbstractTableModel
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
 from typing import List
 from core.models import Employee
+from core.data_manager import ConcurrentModificationError
 from core.employee_controller import EmployeeController
 
 class EmployeeTableModel(QAbstractTableModel):
@@ -39,9 +40,33 @@ class EmployeeTableModel(QAbstractTableModel):
     
     def refreshData(self, new_data: List[Employee]):
         self.beginResetModel()
-        self._data = new_data
+        self._data = list(new_data)
         self.endResetModel()
 
+    def _row_of(self, employee_id: str) -> int:
+        return next((row for row, emp in enumerate(self._data) if emp.id == employee_id), -1)
+
+    def insertEmployee(self, employee: Employee):
+        """只插入一列，不重設整個模型"""
+        row = len(self._data)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._data.append(employee)
+        self.endInsertRows()
+
+    def updateEmployee(self, employee_id: str):
+        """通知畫面重繪某一列"""
+        row = self._row_of(employee_id)
+        if row >= 0:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.headers) - 1))
+
+    def removeEmployee(self, employee_id: str):
+        """只移除一列"""
+        row = self._row_of(employee_id)
+        if row >= 0:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._data[row]
+            self.endRemoveRows()
+
 class EmployeeDialog(QDialog):
     def __init__(self, employee: Employee = None, parent=None):
         super().__init__(parent)
@@ -110,13 +135,20 @@ class EmployeeView(QWidget):
     def refresh_view(self):
         self.model.refreshData(self.controller.get_all_employees())
 
+    def on_employee_added(self, employee_id: str):
+        employee = self.controller.get_employee_by_id(employee_id)
+        if employee:
+            self.model.insertEmployee(employee)
+
     def add_employee(self):
         dialog = EmployeeDialog(parent=self)
         if dialog.exec():
             data = dialog.get_data()
             if data["name"]:
-                self.controller.add_employee(data["name"], data["level"])
-                self.refresh_view()
+                try:
+                    self.controller.add_employee(data["name"], data["level"])
+                except ConcurrentModificationError as error:
+                    self._save_failed(error)
             else:
                 QMessageBox.warning(self, "輸入錯誤", "員工姓名不能為空。")
 
@@ -133,8 +165,10 @@ class EmployeeView(QWidget):
         if dialog.exec():
             data = dialog.get_data()
             if data["name"]:
-                self.controller.update_employee(employee_to_edit.id, data["name"], data["level"])
-                self.refresh_view()
+                try:
+                    self.controller.update_employee(employee_to_edit.id, data["name"], data["level"])
+                except ConcurrentModificationError as error:
+                    self._save_failed(error)
             else:
                 QMessageBox.warning(self, "輸入錯誤", "員工姓名不能為空。")
 
@@ -153,6 +187,12 @@ class EmployeeView(QWidget):
             QMessageBox.StandardButton.No)
 
         if reply == QMessageBox.StandardButton.Yes:
-            self.controller.delete_employee(employee_to_delete.id)
-            self.refresh_view()
+            try:
+                self.controller.delete_employee(employee_to_delete.id)
+            except ConcurrentModificationError as error:
+                self._save_failed(error)
+
+    def _save_failed(self, error: ConcurrentModificationError):
+        """其他電腦一直搶先存檔，本次變更已放棄，畫面已與檔案同步"""
+        QMessageBox.warning(self, "存檔失敗", f"{error}\n請稍後再試一次。")
 
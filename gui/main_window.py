@@ -1,13 +1,33 @@
 """
 主視窗框架 (Main Window Frame)
 這是整個應用程式最外層的視窗容器。
+各頁籤採用延遲建立：第一次切換到該頁籤時才匯入並建立對應的畫面，
+讓低階電腦的啟動時間只需負擔第一個頁籤。
 """
-from PyQt6.QtWidgets import QMainWindow, QTabWidget
-from .employee_view import EmployeeView
-from .rule_editor_view import RuleEditorView
-from .schedule_view import ScheduleView
+import logging
+from PyQt6.QtWidgets import QMainWindow, QTabWidget, QWidget, QVBoxLayout
 from core.employee_controller import EmployeeController
 from core.rule_controller import RuleController
+from core.file_watcher import DataFileWatcher
+
+logger = logging.getLogger(__name__)
+
+
+class LazyTab(QWidget):
+    """頁籤的佔位容器，第一次需要時才呼叫 factory 建立真正的內容"""
+    def __init__(self, factory, parent=None):
+        super().__init__(parent)
+        self._factory = factory
+        self.content = None
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+    def ensure_built(self) -> QWidget:
+        if self.content is None:
+            self.content = self._factory()
+            self.layout().addWidget(self.content)
+        return self.content
+
 
 class MainWindow(QMainWindow):
     """
@@ -20,24 +40,58 @@ class MainWindow(QMainWindow):
 
         self.employee_controller = EmployeeController()
         self.rule_controller = RuleController()
+        # 資料夾可能在共用磁碟上：其他人存檔後依 ID 增量合併，不整份重新載入
+        self.data_watcher = DataFileWatcher([self.employee_controller, self.rule_controller], parent=self)
+        self.data_watcher.external_changes_applied.connect(
+            lambda count: self.statusBar().showMessage(f"已同步其他人修改的 {count} 筆資料", 5000))
 
         self.tabs = QTabWidget()
         self.setCentralWidget(self.tabs)
 
-        # --- 建立各個頁籤 ---
+        # --- 建立各個頁籤 (延遲建立) ---
+        self.tabs.addTab(LazyTab(self._create_employee_tab), "🧑‍🤝‍🧑 員工管理")
+        self.tabs.addTab(LazyTab(self._create_rule_editor_tab), "📚 規則庫管理")
+        self.tabs.addTab(LazyTab(self._create_schedule_tab), "📅 班表生成與編輯")
+        self.tabs.currentChanged.connect(self.get_tab)
+        self.get_tab(self.tabs.currentIndex())
+
+        logger.debug("主視窗 MainWindow 初始化完畢，已啟用頁籤介面")
+
+    def get_tab(self, index: int) -> QWidget:
+        """取得某個頁籤的內容，必要時才建立"""
+        return self.tabs.widget(index).ensure_built()
+
+    def _create_employee_tab(self):
+        from .employee_view import EmployeeView
         employee_tab = EmployeeView(self.employee_controller)
-        rule_editor_tab = RuleEditorView(self.rule_controller)
-        schedule_tab = ScheduleView(self.employee_controller, self.rule_controller)
+        # 員工的增刪改只更新表格中受影響的那一列
+        self.employee_controller.employee_added.connect(employee_tab.on_employee_added)
+        self.employee_controller.employee_updated.connect(employee_tab.model.updateEmployee)
+        self.employee_controller.employee_removed.connect(employee_tab.model.removeEmployee)
+        return employee_tab
 
-        self.tabs.addTab(employee_tab, "🧑‍🤝‍🧑 員工管理")
-        self.tabs.addTab(rule_editor_tab, "📚 規則庫管理")
-        self.tabs.addTab(schedule_tab, "📅 班表生成與編輯")
-        
-        # --- 修正點: 建立信號與槽的連接 ---
-        # 當 rule_controller 發出 rules_changed 信號時，
-        # 會自動觸發另外兩個頁籤的 refresh/populate 方法。
-        self.rule_controller.rules_changed.connect(rule_editor_tab.refresh_view)
-        self.rule_controller.rules_changed.connect(schedule_tab.rule_list_widget.populate_rules)
-        
-        print("🎨 主視窗 MainWindow 初始化完畢，已啟用頁籤介面並建立資料同步信號。")
+    def _create_rule_editor_tab(self):
+        from .rule_editor_view import RuleEditorView
+        rule_editor_tab = RuleEditorView(self.rule_controller)
+        # 規則庫的細粒度信號只更新受影響的那一列
+        self.rule_controller.rule_added.connect(rule_editor_tab.on_rule_added)
+        self.rule_controller.rule_updated.connect(rule_editor_tab.on_rule_updated)
+        self.rule_controller.rule_removed.connect(rule_editor_tab.on_rule_removed)
+        logger.debug("已建立『規則庫管理』頁籤並連接資料同步信號")
+        return rule_editor_tab
 
+    def _create_schedule_tab(self):
+        from .schedule_view import ScheduleView
+        schedule_tab = ScheduleView(self.employee_controller, self.rule_controller)
+        rule_list = schedule_tab.rule_list_widget
+        self.rule_controller.rule_added.connect(rule_list.on_rule_added)
+        self.rule_controller.rule_updated.connect(rule_list.on_rule_updated)
+        self.rule_controller.rule_removed.connect(rule_list.on_rule_removed)
+        assignment_tree = schedule_tab.assignment_tree
+        self.rule_controller.rule_updated.connect(assignment_tree.on_rule_updated)
+        self.rule_controller.rule_removed.connect(assignment_tree.on_rule_removed)
+        self.employee_controller.employee_added.connect(assignment_tree.on_employee_added)
+        self.employee_controller.employee_updated.connect(assignment_tree.on_employee_updated)
+        self.employee_controller.employee_removed.connect(assignment_tree.on_employee_removed)
+        logger.debug("已建立『班表生成與編輯』頁籤並連接資料同步信號")
+        return schedule_tab
@@ -3,16 +3,18 @@
 使用者在這裡建立和管理可重複使用的排班規則。
 """
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-                             QListWidget, QListWidgetItem, QMessageBox,
+                             QListWidget, QMessageBox,
                              QDialog, QLineEdit, QComboBox, QFormLayout,
                              QDialogButtonBox, QLabel, QStackedLayout,
                              QSpinBox, QGroupBox, QCalendarWidget, 
-                             QAbstractItemView)
+                             QAbstractItemView, QCheckBox, QDateEdit)
 from PyQt6.QtCore import Qt, QDate
+from core.availability import WEEKDAY_NAMES
+from core.data_manager import ConcurrentModificationError
 from core.models import Rule
 from core.rule_controller import RuleController
-from core.rule_engine import RULE_DEFINITIONS, get_rule_display_text
-from core.scheduler import SHIFTS
+from core.rule_engine import RULE_DEFINITIONS
+from .rule_library_widget import RuleLibraryWidget
 
 
 class MultiDateSelectionWidget(QWidget):
@@ -49,6 +51,46 @@ class MultiDateSelectionWidget(QWidget):
     def get_selected_dates(self):
         return [d.toString("yyyy-MM-dd") for d in sorted(list(self.selected_dates))]
 
+class WeekdaySelectionWidget(QListWidget):
+    """星期多選；存成 0 (週一) ~ 6 (週日) 的整數列表"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection)
+        self.setFlow(QListWidget.Flow.LeftToRight)
+        self.setMaximumHeight(40)
+        self.addItems(WEEKDAY_NAMES)
+
+    def set_weekdays(self, weekdays):
+        for weekday in weekdays:
+            if 0 <= int(weekday) < self.count():
+                self.item(int(weekday)).setSelected(True)
+
+    def get_weekdays(self):
+        return sorted(self.row(item) for item in self.selectedItems())
+
+class OptionalDateWidget(QWidget):
+    """可留空的日期；未勾選時代表不限"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.enabled_box = QCheckBox("指定")
+        self.date_edit = QDateEdit(QDate.currentDate())
+        self.date_edit.setCalendarPopup(True)
+        self.date_edit.setDisplayFormat("yyyy-MM-dd")
+        self.date_edit.setEnabled(False)
+        self.enabled_box.toggled.connect(self.date_edit.setEnabled)
+        layout.addWidget(self.enabled_box)
+        layout.addWidget(self.date_edit, 1)
+
+    def set_value(self, value):
+        self.enabled_box.setChecked(bool(value))
+        if value:
+            self.date_edit.setDate(QDate.fromString(value, "yyyy-MM-dd"))
+
+    def get_value(self):
+        return self.date_edit.date().toString("yyyy-MM-dd") if self.enabled_box.isChecked() else ""
+
 class RuleDialog(QDialog):
     def __init__(self, rule: Rule = None, parent=None):
         super().__init__(parent)
@@ -56,6 +98,7 @@ class RuleDialog(QDialog):
         self.setMinimumWidth(600)
         
         self.param_widgets = {}
+        self.param_pages = {}
 
         self.name_input = QLineEdit(rule.name if rule else "")
         self.type_input = QComboBox()
@@ -86,46 +129,67 @@ class RuleDialog(QDialog):
             self.initialize_for_editing(rule)
 
     def setup_param_layouts(self):
+        """
+        先為每種規則類型放一個空白頁面；頁面內容 (例如月曆元件)
+        要等到該類型第一次被選到時才由 ensure_param_page 建立。
+        """
+        for display_name in RULE_DEFINITIONS:
+            container_widget = QWidget()
+            container_widget.setLayout(QFormLayout())
+            self.param_pages[display_name] = container_widget
+            self.param_stack.addWidget(container_widget)
+        self.ensure_param_page(self.type_input.currentText())
+
+    def ensure_param_page(self, display_name: str):
+        """建立某個規則類型的參數頁面（只會建立一次）"""
+        if display_name in self.param_widgets or display_name not in RULE_DEFINITIONS:
+            return
+        from core.scheduler import SHIFTS
         work_shifts = [s.name for s in SHIFTS if s.name not in ["休", "例休"]]
         late_shifts = ["10.5-19", "10.5-20.5", "13-21.5", "14-22"]
 
-        for display_name, definition in RULE_DEFINITIONS.items():
-            param_form = QFormLayout()
-            container_widget = QWidget()
-            container_widget.setLayout(param_form)
-            self.param_widgets[display_name] = {}
-
-            if not definition["params"]:
-                param_form.addRow(QLabel("此規則為系統內建邏輯，無需額外參數。"))
-
-            for param_key, (label, param_type) in definition["params"].items():
-                widget = None
-                if param_type == "number":
-                    widget = QSpinBox()
-                    widget.setRange(0, 200)
-                elif param_type == "date":
-                    widget = QCalendarWidget()
-                    widget.setGridVisible(True)
-                elif param_type == "dates":
-                    widget = MultiDateSelectionWidget()
-                elif param_type == "shift_options":
-                    widget = QComboBox()
-                    widget.addItems(work_shifts)
-                elif param_type == "multi_shift_options":
-                    widget = QListWidget()
-                    widget.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection)
-                    widget.addItems(late_shifts)
-                elif isinstance(param_type, list):
-                    widget = QComboBox()
-                    widget.addItems(param_type)
-                
-                if widget:
-                    param_form.addRow(f"{label}:", widget)
-                    self.param_widgets[display_name][param_key] = widget
+        definition = RULE_DEFINITIONS[display_name]
+        param_form = self.param_pages[display_name].layout()
+        self.param_widgets[display_name] = {}
+
+        if not definition["params"]:
+            param_form.addRow(QLabel("此規則為系統內建邏輯，無需額外參數。"))
+
+        for param_key, (label, param_type) in definition["params"].items():
+            widget = None
+            if param_type == "number":
+                widget = QSpinBox()
+                widget.setRange(0, 200)
+            elif param_type == "date":
+                widget = QCalendarWidget()
+                widget.setGridVisible(True)
+            elif param_type == "dates":
+                widget = MultiDateSelectionWidget()
+            elif param_type == "shift_options":
+                widget = QComboBox()
+                widget.addItems(work_shifts)
+            elif param_type == "multi_shift_options":
+                widget = QListWidget()
+                widget.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection)
+                widget.addItems(late_shifts)
+            elif param_type == "multi_work_shift_options":
+                widget = QListWidget()
+                widget.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection)
+                widget.addItems(work_shifts)
+            elif param_type == "weekdays":
+                widget = WeekdaySelectionWidget()
+            elif param_type == "optional_date":
+                widget = OptionalDateWidget()
+            elif isinstance(param_type, list):
+                widget = QComboBox()
+                widget.addItems(param_type)
             
-            self.param_stack.addWidget(container_widget)
+            if widget:
+                param_form.addRow(f"{label}:", widget)
+                self.param_widgets[display_name][param_key] = widget
 
     def on_type_changed(self, text):
+        self.ensure_param_page(text)
         index = self.type_input.findText(text)
         self.param_stack.setCurrentIndex(index)
 
@@ -134,6 +198,7 @@ class RuleDialog(QDialog):
         
         if display_name_to_set:
             self.type_input.setCurrentText(display_name_to_set)
+            self.ensure_param_page(display_name_to_set)
             params = rule.params if isinstance(rule.params, dict) else {}
             for param_key, widget in self.param_widgets[display_name_to_set].items():
                 value = params.get(param_key)
@@ -145,6 +210,8 @@ class RuleDialog(QDialog):
                 elif isinstance(widget, MultiDateSelectionWidget):
                     widget.selected_dates = set(QDate.fromString(d, "yyyy-MM-dd") for d in value)
                     widget.refresh_list()
+                elif isinstance(widget, WeekdaySelectionWidget): widget.set_weekdays(value)
+                elif isinstance(widget, OptionalDateWidget): widget.set_value(value)
                 elif isinstance(widget, QListWidget):
                     for i in range(widget.count()):
                         if widget.item(i).text() in value:
@@ -168,6 +235,10 @@ class RuleDialog(QDialog):
                 params[param_key] = widget.selectedDate().toString("yyyy-MM-dd")
             elif isinstance(widget, MultiDateSelectionWidget):
                 params[param_key] = widget.get_selected_dates()
+            elif isinstance(widget, WeekdaySelectionWidget):
+                params[param_key] = widget.get_weekdays()
+            elif isinstance(widget, OptionalDateWidget):
+                params[param_key] = widget.get_value()
             elif isinstance(widget, QListWidget):
                 params[param_key] = [item.text() for item in widget.selectedItems()]
 
@@ -181,7 +252,7 @@ class RuleEditorView(QWidget):
         self.refresh_view()
 
     def init_ui(self):
-        self.rule_list = QListWidget()
+        self.rule_list = RuleLibraryWidget(self.controller)
         self.add_button = QPushButton("➕ 新增規則")
         self.edit_button = QPushButton("✏️ 編輯規則")
         self.delete_button = QPushButton("🗑️ 刪除規則")
@@ -199,49 +270,58 @@ class RuleEditorView(QWidget):
         self.add_button.clicked.connect(self.add_rule)
         self.edit_button.clicked.connect(self.edit_rule)
         self.delete_button.clicked.connect(self.delete_rule)
-        self.rule_list.itemDoubleClicked.connect(self.edit_rule)
+        self.rule_list.list_view.doubleClicked.connect(self.edit_rule)
 
     def refresh_view(self):
-        self.rule_list.clear()
-        for rule in self.controller.get_all_rules():
-            display_text = get_rule_display_text(rule)
-            item = QListWidgetItem(display_text)
-            item.setData(Qt.ItemDataRole.UserRole, rule.id)
-            self.rule_list.addItem(item)
+        """重新載入整個列表（只在初次載入時使用，之後由細粒度信號逐列更新）"""
+        self.rule_list.populate_rules()
+
+    def on_rule_added(self, rule_id: str):
+        self.rule_list.on_rule_added(rule_id)
+
+    def on_rule_updated(self, rule_id: str):
+        self.rule_list.on_rule_updated(rule_id)
+
+    def on_rule_removed(self, rule_id: str):
+        self.rule_list.on_rule_removed(rule_id)
 
     def add_rule(self):
         dialog = RuleDialog(parent=self)
         if dialog.exec():
             data = dialog.get_data()
             if data:
-                self.controller.add_rule(data["name"], data["rule_type"], data["params"])
+                try:
+                    self.controller.add_rule(data["name"], data["rule_type"], data["params"])
+                except ConcurrentModificationError as error:
+                    self._save_failed(error)
             else:
                 QMessageBox.warning(self, "輸入錯誤", "規則名稱不能為空。")
 
     def edit_rule(self):
-        selected_item = self.rule_list.currentItem()
-        if not selected_item:
+        rule_id = self.rule_list.current_rule_id()
+        if not rule_id:
             QMessageBox.warning(self, "提示", "請先選擇一條要編輯的規則。")
             return
         
-        rule_id = selected_item.data(Qt.ItemDataRole.UserRole)
         rule_to_edit = self.controller.get_rule_by_id(rule_id)
 
         dialog = RuleDialog(rule=rule_to_edit, parent=self)
         if dialog.exec():
             data = dialog.get_data()
             if data:
-                self.controller.update_rule(rule_id, data["name"], data["rule_type"], data["params"])
+                try:
+                    self.controller.update_rule(rule_id, data["name"], data["rule_type"], data["params"])
+                except ConcurrentModificationError as error:
+                    self._save_failed(error)
             else:
                 QMessageBox.warning(self, "輸入錯誤", "規則名稱不能為空。")
                 
     def delete_rule(self):
-        selected_item = self.rule_list.currentItem()
-        if not selected_item:
+        rule_id = self.rule_list.current_rule_id()
+        if not rule_id:
             QMessageBox.warning(self, "提示", "請先選擇一條要刪除的規則。")
             return
             
-        rule_id = selected_item.data(Qt.ItemDataRole.UserRole)
         rule_to_delete = self.controller.get_rule_by_id(rule_id)
 
         reply = QMessageBox.question(self, "確認刪除", 
@@ -250,5 +330,12 @@ class RuleEditorView(QWidget):
             QMessageBox.StandardButton.No)
 
         if reply == QMessageBox.StandardButton.Yes:
-            self.controller.delete_rule(rule_id)
+            try:
+                self.controller.delete_rule(rule_id)
+            except ConcurrentModificationError as error:
+                self._save_failed(error)
+
+    def _save_failed(self, error: ConcurrentModificationError):
+        """其他電腦一直搶先存檔，本次變更已放棄，畫面已與檔案同步"""
+        QMessageBox.warning(self, "存檔失敗", f"{error}\n請稍後再試一次。")
 
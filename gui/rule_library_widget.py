@@ -0,0 +1,141 @@
+"""
+規則庫列表元件 (Rule Library Widget)
+以 Model/View 架構顯示規則庫：列表只繪製畫面上看得到的列，
+搭配上方的搜尋框與規則控制器的倒排索引，即使有數千條規則也能即時過濾。
+"""
+from typing import List
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QListView, QAbstractItemView
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QMimeData
+from core.rule_controller import RuleController
+
+
+class RuleListModel(QAbstractListModel):
+    """只保存「目前符合搜尋條件的規則 ID」，顯示文字由控制器依版本快取"""
+    def __init__(self, rule_controller: RuleController, parent=None):
+        super().__init__(parent)
+        self.rule_controller = rule_controller
+        self._query = ""
+        self._ids: List[str] = rule_controller.search_rules("")
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        rule_id = self._ids[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.rule_controller.get_display_text(rule_id)
+        if role == Qt.ItemDataRole.UserRole:
+            return rule_id
+        return None
+
+    def flags(self, index):
+        default = super().flags(index)
+        if index.isValid():
+            return default | Qt.ItemFlag.ItemIsDragEnabled
+        return default
+
+    def mimeTypes(self):
+        return ["text/plain"]
+
+    def mimeData(self, indexes):
+        # 拖曳內容就是規則 ID，與 AssignmentTreeWidget.dropEvent 的約定相同
+        mime_data = QMimeData()
+        if indexes:
+            mime_data.setText(self._ids[indexes[0].row()])
+        return mime_data
+
+    def supportedDragActions(self):
+        return Qt.DropAction.CopyAction
+
+    def rule_id_at(self, row: int) -> str:
+        return self._ids[row]
+
+    def set_query(self, query: str):
+        """更新搜尋條件；若新查詢只是在舊查詢後面多打字，直接從目前結果繼續過濾"""
+        query = query.strip()
+        narrowing = bool(self._query) and query.startswith(self._query) \
+            and len(query.split()) == len(self._query.split())
+        within = self._ids if narrowing else None
+        self.beginResetModel()
+        self._ids = self.rule_controller.search_rules(query, within)
+        self._query = query
+        self.endResetModel()
+
+    def reload(self):
+        self.beginResetModel()
+        self._ids = self.rule_controller.search_rules(self._query)
+        self.endResetModel()
+
+    # --- 細粒度更新 ---
+    def on_rule_added(self, rule_id: str):
+        if self.rule_controller.search_index.matches(rule_id, self._query):
+            row = len(self._ids)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._ids.append(rule_id)
+            self.endInsertRows()
+
+    def on_rule_updated(self, rule_id: str):
+        matches = self.rule_controller.search_index.matches(rule_id, self._query)
+        if rule_id in self._ids:
+            row = self._ids.index(rule_id)
+            if matches:
+                self.dataChanged.emit(self.index(row), self.index(row))
+            else:
+                self.on_rule_removed(rule_id)
+        elif matches:
+            # 更新後才符合條件：依規則庫順序插回正確位置
+            self.reload()
+
+    def on_rule_removed(self, rule_id: str):
+        if rule_id in self._ids:
+            row = self._ids.index(rule_id)
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._ids[row]
+            self.endRemoveRows()
+
+
+class RuleLibraryWidget(QWidget):
+    """搜尋框 + 虛擬化規則列表"""
+    def __init__(self, rule_controller: RuleController, draggable: bool = False, parent=None):
+        super().__init__(parent)
+        self.rule_controller = rule_controller
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("🔍 搜尋規則名稱、類型、日期、班別、級別…")
+        self.search_input.setClearButtonEnabled(True)
+
+        self.model = RuleListModel(rule_controller, self)
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setUniformItemSizes(True)  # 所有列等高，捲動時不必逐列量測
+        self.list_view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.list_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        if draggable:
+            self.list_view.setDragEnabled(True)
+            self.list_view.setDragDropMode(QAbstractItemView.DragDropMode.DragOnly)
+            self.list_view.setDefaultDropAction(Qt.DropAction.CopyAction)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.search_input)
+        layout.addWidget(self.list_view)
+
+        self.search_input.textChanged.connect(self.model.set_query)
+
+    def current_rule_id(self):
+        index = self.list_view.currentIndex()
+        return self.model.rule_id_at(index.row()) if index.isValid() else None
+
+    def populate_rules(self):
+        self.model.reload()
+
+    def on_rule_added(self, rule_id: str):
+        self.model.on_rule_added(rule_id)
+
+    def on_rule_updated(self, rule_id: str):
+        self.model.on_rule_updated(rule_id)
+
+    def on_rule_removed(self, rule_id: str):
+        self.model.on_rule_removed(rule_id)
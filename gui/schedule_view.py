@@ -1,51 +1,35 @@
 """
 互動式班表顯示與編輯介面 (Schedule View)
 """
+import logging
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QDateEdit,
                              QTableWidget, QAbstractItemView, QSplitter, QGroupBox,
-                             QTreeWidget, QTreeWidgetItem, QHeaderView, QLabel,
-                             QTableWidgetItem)
-from PyQt6.QtCore import Qt, QDate, QMimeData
-from PyQt6.QtGui import QDrag, QColor
+                             QTreeWidget, QTreeWidgetItem, QLabel,
+                             QTableWidgetItem, QMessageBox, QLineEdit, QComboBox)
+from PyQt6.QtCore import Qt, QDate
+from PyQt6.QtGui import QColor
 from core.employee_controller import EmployeeController
 from core.rule_controller import RuleController
-from core.rule_engine import get_rule_display_text
-from core.scheduler import Scheduler
+from core.assignments import EMPLOYEE_LEVELS, bulk_assign, new_assignments
+from .rule_library_widget import RuleLibraryWidget
 
-class RuleListWidget(QTreeWidget):
-    """可供拖曳的規則庫列表"""
+logger = logging.getLogger(__name__)
+
+class RuleListWidget(RuleLibraryWidget):
+    """可供拖曳的規則庫列表 (含即時搜尋)"""
     def __init__(self, rule_controller: RuleController, parent=None):
-        super().__init__(parent)
-        self.rule_controller = rule_controller
-        self.setDragEnabled(True)
-        self.setHeaderHidden(True)
-        self.populate_rules() # 第一次手動載入
-
-    def populate_rules(self):
-        """
-        這現在是一個「槽 (Slot)」，可以被信號觸發來自動更新。
-        """
-        print("🔄️ 偵測到規則庫變動，正在同步『班表頁籤』的規則列表...")
-        self.clear()
-        for rule in self.rule_controller.get_all_rules():
-            display_text = get_rule_display_text(rule)
-            item = QTreeWidgetItem(self, [display_text])
-            item.setData(0, Qt.ItemDataRole.UserRole, rule.id)
-
-    def startDrag(self, supportedActions):
-        item = self.currentItem()
-        if not item: return
-        
-        rule_id = item.data(0, Qt.ItemDataRole.UserRole)
-        mime_data = QMimeData()
-        mime_data.setText(rule_id)
-        
-        drag = QDrag(self)
-        drag.setMimeData(mime_data)
-        drag.exec(Qt.DropAction.CopyAction)
+        super().__init__(rule_controller, draggable=True, parent=parent)
+
+# 樹狀結構中非員工節點的識別資料
+GLOBAL_ROLE = "GLOBAL_RULES"
+LEVEL_ROLE_PREFIX = "LEVEL:"
 
 class AssignmentTreeWidget(QTreeWidget):
-    """可接收拖曳的員工規則設定樹 (拼圖區)"""
+    """
+    可接收拖曳的員工規則設定樹 (拼圖區)。
+    除了個人，也可以把規則拖到「全域」或「級別」節點上，一次套用到整群人；
+    若放下的位置是已選取的節點之一，規則會套用到所有選取的節點。
+    """
     def __init__(self, emp_controller: EmployeeController, rule_controller: RuleController, parent=None):
         super().__init__(parent)
         self.emp_controller = emp_controller
@@ -58,14 +42,80 @@ class AssignmentTreeWidget(QTreeWidget):
     def populate_employees(self):
         self.clear()
         global_item = QTreeWidgetItem(self, ["🌐 全域規則"])
-        global_item.setData(0, Qt.ItemDataRole.UserRole, "GLOBAL_RULES")
+        global_item.setData(0, Qt.ItemDataRole.UserRole, GLOBAL_ROLE)
         global_item.setExpanded(True)
         global_item.setBackground(0, QColor("#E0E0E0"))
 
+        for level in EMPLOYEE_LEVELS:
+            level_item = QTreeWidgetItem(self, [f"🏷️ 所有{level}"])
+            level_item.setData(0, Qt.ItemDataRole.UserRole, LEVEL_ROLE_PREFIX + level)
+            level_item.setExpanded(True)
+            level_item.setBackground(0, QColor("#F0F0F0"))
+
         for emp in self.emp_controller.get_all_employees():
-            emp_item = QTreeWidgetItem(self, [emp.name])
-            emp_item.setData(0, Qt.ItemDataRole.UserRole, emp.id)
-            emp_item.setExpanded(True)
+            self.on_employee_added(emp.id)
+
+    def _employee_item(self, employee_id: str):
+        root = self.invisibleRootItem()
+        return next((root.child(i) for i in range(root.childCount())
+                     if root.child(i).data(0, Qt.ItemDataRole.UserRole) == employee_id), None)
+
+    def get_assignments(self):
+        """把樹狀結構轉成規則指派 (全域 / 級別 / 個人)"""
+        assignments = new_assignments()
+        root = self.invisibleRootItem()
+        for i in range(root.childCount()):
+            target_item = root.child(i)
+            target = target_item.data(0, Qt.ItemDataRole.UserRole)
+            if target is None: continue
+            rule_ids = [target_item.child(j).data(0, Qt.ItemDataRole.UserRole)
+                        for j in range(target_item.childCount())]
+            rule_ids = [rid for rid in rule_ids if rid]
+
+            if target == GLOBAL_ROLE:
+                bulk_assign(assignments, rule_ids, to_global=True)
+            elif target.startswith(LEVEL_ROLE_PREFIX):
+                bulk_assign(assignments, rule_ids, levels=[target[len(LEVEL_ROLE_PREFIX):]])
+            else:
+                assignments["employees"][target] = []
+                bulk_assign(assignments, rule_ids, employee_ids=[target])
+        return assignments
+
+    def _rule_items(self, rule_id: str):
+        """找出所有已指派此規則的項目"""
+        root = self.invisibleRootItem()
+        for i in range(root.childCount()):
+            parent = root.child(i)
+            for j in range(parent.childCount()):
+                if parent.child(j).data(0, Qt.ItemDataRole.UserRole) == rule_id:
+                    yield parent.child(j)
+
+    def on_employee_added(self, employee_id: str):
+        emp = self.emp_controller.get_employee_by_id(employee_id)
+        if emp is None: return
+        emp_item = QTreeWidgetItem(self, [emp.name])
+        emp_item.setData(0, Qt.ItemDataRole.UserRole, emp.id)
+        emp_item.setExpanded(True)
+
+    def on_employee_updated(self, employee_id: str):
+        emp = self.emp_controller.get_employee_by_id(employee_id)
+        item = self._employee_item(employee_id)
+        if emp and item:
+            item.setText(0, emp.name)
+
+    def on_employee_removed(self, employee_id: str):
+        item = self._employee_item(employee_id)
+        if item:
+            self.takeTopLevelItem(self.indexOfTopLevelItem(item))
+
+    def on_rule_updated(self, rule_id: str):
+        text = self.rule_controller.get_display_text(rule_id)
+        for item in self._rule_items(rule_id):
+            item.setText(0, text)
+
+    def on_rule_removed(self, rule_id: str):
+        for item in list(self._rule_items(rule_id)):
+            item.parent().removeChild(item)
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasText():
@@ -83,10 +133,17 @@ class AssignmentTreeWidget(QTreeWidget):
         if not rule: return
 
         parent_item = item_at_drop.parent() if item_at_drop.parent() else item_at_drop
+        targets = [parent_item]
+        if parent_item.isSelected():
+            targets = [item for item in self.selectedItems() if item.parent() is None]
         
-        display_text = get_rule_display_text(rule)
-        new_rule_item = QTreeWidgetItem(parent_item, [display_text])
-        new_rule_item.setData(0, Qt.ItemDataRole.UserRole, rule_id)
+        display_text = self.rule_controller.get_display_text(rule_id)
+        for target in targets:
+            already = any(target.child(j).data(0, Qt.ItemDataRole.UserRole) == rule_id
+                          for j in range(target.childCount()))
+            if already: continue
+            new_rule_item = QTreeWidgetItem(target, [display_text])
+            new_rule_item.setData(0, Qt.ItemDataRole.UserRole, rule_id)
         event.acceptProposedAction()
 
     def keyPressEvent(self, event):
@@ -105,6 +162,7 @@ class ScheduleView(QWidget):
         super().__init__(parent)
         self.emp_controller = emp_controller
         self.rule_controller = rule_controller
+        self.last_result = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -119,6 +177,22 @@ class ScheduleView(QWidget):
         self.date_edit.setDisplayFormat("yyyy-MM")
         date_layout.addWidget(QLabel("選擇月份:"))
         date_layout.addWidget(self.date_edit)
+
+        seed_layout = QHBoxLayout()
+        self.seed_input = QLineEdit()
+        self.seed_input.setPlaceholderText("留空為隨機")
+        self.seed_label = QLabel("")
+        seed_layout.addWidget(QLabel("亂數種子:"))
+        seed_layout.addWidget(self.seed_input)
+        seed_layout.addWidget(self.seed_label)
+
+        engine_layout = QHBoxLayout()
+        self.engine_input = QComboBox()
+        # 與 core.scheduler.ENGINES 相同；另列一份以免程式啟動時就載入排班引擎
+        for engine, label in (("greedy", "逐格排班"), ("pattern", "週班型排班")):
+            self.engine_input.addItem(label, engine)
+        engine_layout.addWidget(QLabel("排班引擎:"))
+        engine_layout.addWidget(self.engine_input, 1)
         
         assignment_group = QGroupBox("排班設定 (可將右側規則拖曳至此)")
         assignment_layout = QVBoxLayout(assignment_group)
@@ -135,14 +209,22 @@ class ScheduleView(QWidget):
         right_panel = QWidget()
         right_layout = QVBoxLayout(right_panel)
         self.schedule_table = QTableWidget()
+        self.diff_label = QLabel("")
+        self.diff_label.setWordWrap(True)
 
         left_layout.addLayout(date_layout)
+        left_layout.addLayout(seed_layout)
+        left_layout.addLayout(engine_layout)
         left_layout.addWidget(assignment_group)
         generate_button = QPushButton("🚀 一鍵生成班表")
         generate_button.clicked.connect(self.generate_schedule)
         left_layout.addWidget(generate_button)
+        validate_button = QPushButton("🔎 檢核班表")
+        validate_button.clicked.connect(self.validate_schedule)
+        left_layout.addWidget(validate_button)
         
         right_layout.addWidget(self.schedule_table)
+        right_layout.addWidget(self.diff_label)
 
         splitter.addWidget(left_panel)
         splitter.addWidget(rule_lib_group)
@@ -154,31 +236,48 @@ class ScheduleView(QWidget):
         year = self.date_edit.date().year()
         month = self.date_edit.date().month()
         
-        assignments = {"global": [], "employees": {}}
-        root = self.assignment_tree.invisibleRootItem()
-        
-        global_item = root.child(0)
-        for i in range(global_item.childCount()):
-            rule_item = global_item.child(i)
-            assignments["global"].append(rule_item.data(0, Qt.ItemDataRole.UserRole))
-            
-        for i in range(1, root.childCount()):
-            emp_item = root.child(i)
-            emp_id = emp_item.data(0, Qt.ItemDataRole.UserRole)
-            if emp_id is None: continue
-            
-            assignments["employees"][emp_id] = []
-            for j in range(emp_item.childCount()):
-                rule_item = emp_item.child(j)
-                rule_id = rule_item.data(0, Qt.ItemDataRole.UserRole)
-                if rule_id:
-                    assignments["employees"][emp_id].append(rule_id)
-
-        scheduler = Scheduler(self.emp_controller, self.rule_controller, assignments)
+        assignments = self.assignment_tree.get_assignments()
+
+        seed_text = self.seed_input.text().strip()
+        if seed_text and not seed_text.isdigit():
+            QMessageBox.warning(self, "輸入錯誤", "亂數種子必須是非負整數。")
+            return
+        seed = int(seed_text) if seed_text else None
+
+        # 排班引擎只在真正生成班表時才載入，縮短程式啟動時間
+        from core.scheduler import get_scheduler_class
+        from core.feasibility import format_conflicts
+
+        scheduler_cls = get_scheduler_class(self.engine_input.currentData())
+        scheduler = scheduler_cls(self.emp_controller, self.rule_controller, assignments, seed=seed)
+
+        # 先做可行性分析，有衝突就讓使用者決定是否仍要生成
+        conflicts = scheduler.check_feasibility(year, month)
+        if conflicts:
+            reply = QMessageBox.question(self, "排班設定有衝突",
+                f"偵測到 {len(conflicts)} 個無法滿足的設定：\n\n"
+                f"{format_conflicts(conflicts, scheduler.all_rules)}\n\n仍要繼續生成班表嗎？",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.No)
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+
         schedule_result = scheduler.generate_schedule(year, month)
 
+        # 記錄本次使用的種子，輸入同一個種子即可重現同一份班表
+        self.seed_label.setText(f"本次種子: {schedule_result['seed']}")
+
+        # 與上一次生成的同月班表比較，讓主管在重新發布前知道誰受到影響
+        diff = None
+        if self.last_result is not None and self.last_result["dates"] == schedule_result["dates"]:
+            from core.schedule_diff import diff_schedules
+            diff = diff_schedules(self.last_result, schedule_result, scheduler)
+        self.last_result = schedule_result
+
         headers = schedule_result["headers"]
         data = schedule_result["data"]
+        # 先清掉上一版的格子 (連同變動與檢核的底色、提示)，之後只標示這一版的差異
+        self.schedule_table.clearContents()
         self.schedule_table.setColumnCount(len(headers))
         self.schedule_table.setHorizontalHeaderLabels(headers)
         self.schedule_table.setRowCount(len(data))
@@ -186,4 +285,57 @@ class ScheduleView(QWidget):
             for col_idx, cell_data in enumerate(row_data):
                 self.schedule_table.setItem(row_idx, col_idx, QTableWidgetItem(str(cell_data)))
         self.schedule_table.resizeColumnsToContents()
+        self.show_diff(diff, schedule_result)
+
+    def show_diff(self, diff, schedule_result):
+        """以底色標示與上一版不同的格子，並在表格下方顯示影響摘要"""
+        if diff is None:
+            self.diff_label.setText("")
+            self.diff_label.setToolTip("")
+            return
+        rows = {date: row for row, date in enumerate(schedule_result["dates"])}
+        columns = {emp_id: col for col, emp_id in enumerate(schedule_result["employee_ids"], start=1)}
+        for change in diff.changes:
+            item = self.schedule_table.item(rows[change.date], columns[change.employee_id])
+            item.setBackground(QColor("#FFE066"))
+            item.setToolTip(f"原為 {change.before}")
+
+        summary = diff.summary({emp.id: emp.name for emp in self.emp_controller.get_all_employees()})
+        text = f"與上一版相比：{len(diff.changes)} 格變動、影響 {len(diff.affected_employees())} 位員工"
+        if diff.new_violations:
+            text += f"、新違反 {len(diff.new_violations)} 條規則"
+        self.diff_label.setText(text + "（滑鼠移到此處查看明細）")
+        self.diff_label.setToolTip(summary)
+
+    def validate_schedule(self):
+        """依目前的規則指派檢核表格中的班表 (包含手動修改過的格子)，並標示違反的格子"""
+        if self.last_result is None:
+            QMessageBox.information(self, "檢核班表", "請先生成班表。")
+            return
+        from core.validator import ScheduleValidator, ERROR
+
+        dates = self.last_result["dates"]
+        employee_ids = self.last_result["employee_ids"]
+        grid = {emp_id: tuple(self.schedule_table.item(row, col).text() for row in range(len(dates)))
+                for col, emp_id in enumerate(employee_ids, start=1)}
+        validator = ScheduleValidator.from_assignments(
+            self.emp_controller.get_all_employees(), self.rule_controller.get_all_rules(),
+            self.assignment_tree.get_assignments())
+        violations = list(validator.validate_grid(grid, dates).values())
+
+        rows = {date: row for row, date in enumerate(dates)}
+        columns = {emp_id: col for col, emp_id in enumerate(employee_ids, start=1)}
+        for violation in violations:
+            if violation.employee_id in columns and violation.date in rows:
+                item = self.schedule_table.item(rows[violation.date], columns[violation.employee_id])
+                item.setBackground(QColor("#FFADAD" if violation.severity == ERROR else "#FFD6A5"))
+                item.setToolTip(violation.message)
 
+        if not violations:
+            QMessageBox.information(self, "檢核班表", "✅ 班表沒有違反任何規則。")
+            return
+        errors = sum(1 for v in violations if v.severity == ERROR)
+        shown = "\n".join(f"• {v.message}" for v in violations[:20])
+        more = f"\n…另有 {len(violations) - 20} 筆" if len(violations) > 20 else ""
+        QMessageBox.warning(self, "檢核班表",
+                            f"共 {len(violations)} 筆違反 (錯誤 {errors} 筆，其餘為軟性規則)：\n\n{shown}{more}")
@@ -1,27 +1,65 @@
 """
 應用程式主進入點 (Main Entry Point)
 執行此檔案即可啟動整個應用程式。
+加上 --measure-startup 參數時，會量測各啟動階段耗時並在第一次畫面繪製後結束。
 """
+import time
+_START_TIME = time.perf_counter()
+
+import argparse
+import logging
+import os
 import sys
+from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QApplication
-from gui.main_window import MainWindow
+from core.instrumentation import PROFILE_ENV_VAR
+from core.logging_config import configure_logging, parse_module_levels
+
+logger = logging.getLogger(__name__)
 
 def main():
     """
     主函式，用於初始化並執行 PyQt6 應用程式。
     """
-    print("="*50)
-    print("🚀 應用程式啟動中...")
-    print("="*50)
+    parser = argparse.ArgumentParser(description="智慧排班小幫手")
+    parser.add_argument("--profile", help="排班時開啟規則檢查計數或剖析，例如 counters、cprofile、tracemalloc 或 all")
+    parser.add_argument("--log-level", help="日誌等級，例如 DEBUG、INFO、WARNING")
+    parser.add_argument("--log-modules", default="", help='各模組日誌等級，例如 "core.scheduler=DEBUG"')
+    parser.add_argument("--log-json", action="store_true", default=None, help="以 JSON 格式輸出日誌")
+    parser.add_argument("--measure-startup", action="store_true", help="量測啟動時間後自動結束")
+    args, qt_args = parser.parse_known_args()
+    configure_logging(args.log_level, args.log_json, parse_module_levels(args.log_modules))
+    if args.profile:
+        os.environ[PROFILE_ENV_VAR] = args.profile
+
+    logger.info("應用程式啟動中...")
+    marks = {"imports": time.perf_counter()}
 
     # --- GUI 啟動代碼 ---
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
+    marks["qapplication"] = time.perf_counter()
+
+    from gui.main_window import MainWindow
     window = MainWindow()
+    marks["main_window"] = time.perf_counter()
     window.show()
-    
-    print("\n✅ 應用程式已準備就緒！")
+
+    if args.measure_startup:
+        def report_startup():
+            marks["first_paint"] = time.perf_counter()
+            previous = _START_TIME
+            for name, moment in marks.items():
+                logger.info("啟動階段 %-12s %8.1f ms", name, (moment - previous) * 1000,
+                            extra={"phase": name, "duration_ms": round((moment - previous) * 1000, 3)})
+                previous = moment
+            logger.info("冷啟動總計 %.1f ms", (previous - _START_TIME) * 1000,
+                        extra={"duration_ms": round((previous - _START_TIME) * 1000, 3)})
+            app.quit()
+        # 事件迴圈處理完第一批繪製事件後才會執行
+        QTimer.singleShot(0, report_startup)
+
+    logger.info("應用程式已準備就緒")
     sys.exit(app.exec())
 
 if __name__ == "__main__":
     main()
-